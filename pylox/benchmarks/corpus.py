@@ -0,0 +1,20 @@
+"""
+Source shared by the front end benchmarks.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+
+SCRIPTS = Path(__file__).parent.parent / "lox_scripts"
+TARGET_SIZE = 2_000_000
+
+
+def load_source(paths: list[str]) -> str:
+    """
+    The given scripts, or every script in lox_scripts repeated until the
+    source is about TARGET_SIZE characters.
+    """
+    if paths:
+        return "\n".join(Path(path).read_text() for path in paths)
+    corpus = "\n".join(path.read_text() for path in sorted(SCRIPTS.glob("*.lox")))
+    return corpus * (TARGET_SIZE // len(corpus) + 1)
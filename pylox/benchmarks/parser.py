@@ -0,0 +1,40 @@
+"""
+Parse throughput of the recursive descent Parser and the PrattParser.
+
+    python benchmarks/parser.py [script.lox ...]
+
+Without arguments the scripts in lox_scripts are concatenated and repeated
+until the source is a couple of megabytes. Tokens are scanned once up front so
+only parsing is timed.
+"""
+
+from __future__ import annotations
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pylox.error_handling  # noqa: E402,F401 (imported first to settle the import cycle)
+from pylox.benchmark import measure  # noqa: E402
+from pylox.lox_parser import Parser, PrattParser  # noqa: E402
+from pylox.lox_scanner import RegexScanner  # noqa: E402
+from corpus import load_source  # noqa: E402
+
+
+def bench(parser: type[Parser], tokens: list, repeat: int = 3) -> float:
+    return min(measure(lambda: parser(tokens).parse(), repeat, warmup=0))
+
+
+def main(paths: list[str]):
+    tokens = RegexScanner(load_source(paths)).scan_tokens()
+    print(f"{len(tokens):,} tokens")
+    for parser in (Parser, PrattParser):
+        seconds = bench(parser, tokens)
+        print(
+            f"{parser.__name__:<12} {seconds:8.3f}s"
+            f" {len(tokens) / seconds:>14,.0f} tokens/s"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,45 @@
+"""
+Tokens per second for the character at a time Scanner and the RegexScanner.
+
+    python benchmarks/scanner.py [script.lox ...]
+
+Without arguments the scripts in lox_scripts are concatenated and repeated
+until the source is a couple of megabytes.
+"""
+
+from __future__ import annotations
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pylox.error_handling  # noqa: E402,F401 (imported first to settle the import cycle)
+from pylox.benchmark import measure  # noqa: E402
+from pylox.lox_scanner import RegexScanner, Scanner  # noqa: E402
+from corpus import load_source  # noqa: E402
+
+
+def bench(scanner: type[Scanner], source: str, repeat: int = 3) -> tuple[int, float]:
+    count = 0
+
+    def scan():
+        nonlocal count
+        count = len(scanner(source).scan_tokens())
+
+    best = min(measure(scan, repeat, warmup=0))
+    return count, best
+
+
+def main(paths: list[str]):
+    source = load_source(paths)
+    print(f"{len(source):,} characters")
+    for scanner in (Scanner, RegexScanner):
+        count, seconds = bench(scanner, source)
+        print(
+            f"{scanner.__name__:<14} {count:>10,} tokens {seconds:8.3f}s"
+            f" {count / seconds:>14,.0f} tokens/s"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,6 +2,8 @@ from __future__ import annotations
 from pylox.tokens import Token
 import typing
 class Expr(typing.Protocol):
+   __slots__ = ()
+   kind: typing.ClassVar[int]
    def accept[T](self, visitor: Visitor[T]) -> T:...
 
 class Visitor[T]:
@@ -30,18 +32,33 @@ class Visitor[T]:
    def visit_VariableExpr(self, expr:Variable) -> T:...
 
 class Assign(Expr):
+   __slots__ = ('name', 'value', 'depth', 'slot')
+   __match_args__ = ('name', 'value')
+   kind: typing.ClassVar[int] = 0
+   depth: int | None
+   slot: int | None
    def __init__(self, name: Token, value: Expr):
       self.name = name
       self.value = value
+      self.depth = None
+      self.slot = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_AssignExpr(self)
 class Get(Expr):
+   __slots__ = ('obj', 'name', 'cache')
+   __match_args__ = ('obj', 'name')
+   kind: typing.ClassVar[int] = 1
+   cache: typing.Any
    def __init__(self, obj: Expr, name: Token):
       self.obj = obj
       self.name = name
+      self.cache = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_GetExpr(self)
 class Binary(Expr):
+   __slots__ = ('left', 'operator', 'right')
+   __match_args__ = ('left', 'operator', 'right')
+   kind: typing.ClassVar[int] = 2
    def __init__(self, left: Expr , operator: Token , right: Expr):
       self.left = left
       self.operator = operator
@@ -49,6 +66,9 @@ class Binary(Expr):
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_BinaryExpr(self)
 class Call(Expr):
+   __slots__ = ('callee', 'paren', 'arguments')
+   __match_args__ = ('callee', 'paren', 'arguments')
+   kind: typing.ClassVar[int] = 3
    def __init__(self, callee: Expr, paren: Token, arguments: list[Expr]):
       self.callee = callee
       self.paren = paren
@@ -56,16 +76,25 @@ class Call(Expr):
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_CallExpr(self)
 class Grouping(Expr):
+   __slots__ = ('expression',)
+   __match_args__ = ('expression',)
+   kind: typing.ClassVar[int] = 4
    def __init__(self, expression: Expr):
       self.expression = expression
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_GroupingExpr(self)
 class Literal(Expr):
+   __slots__ = ('value',)
+   __match_args__ = ('value',)
+   kind: typing.ClassVar[int] = 5
    def __init__(self, value: object):
       self.value = value
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_LiteralExpr(self)
 class Logical(Expr):
+   __slots__ = ('left', 'operator', 'right')
+   __match_args__ = ('left', 'operator', 'right')
+   kind: typing.ClassVar[int] = 6
    def __init__(self, left: Expr, operator: Token, right: Expr):
       self.left = left
       self.operator = operator
@@ -73,31 +102,60 @@ class Logical(Expr):
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_LogicalExpr(self)
 class Set(Expr):
+   __slots__ = ('obj', 'name', 'value', 'cache')
+   __match_args__ = ('obj', 'name', 'value')
+   kind: typing.ClassVar[int] = 7
+   cache: typing.Any
    def __init__(self, obj: Expr, name: Token, value: Expr):
       self.obj = obj
       self.name = name
       self.value = value
+      self.cache = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_SetExpr(self)
 class Super(Expr):
+   __slots__ = ('keyword', 'method', 'depth', 'slot')
+   __match_args__ = ('keyword', 'method')
+   kind: typing.ClassVar[int] = 8
+   depth: int | None
+   slot: int | None
    def __init__(self, keyword: Token, method: Token):
       self.keyword = keyword
       self.method = method
+      self.depth = None
+      self.slot = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_SuperExpr(self)
 class This(Expr):
+   __slots__ = ('keyword', 'depth', 'slot')
+   __match_args__ = ('keyword',)
+   kind: typing.ClassVar[int] = 9
+   depth: int | None
+   slot: int | None
    def __init__(self, keyword: Token):
       self.keyword = keyword
+      self.depth = None
+      self.slot = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_ThisExpr(self)
 class Unary(Expr):
+   __slots__ = ('operator', 'right')
+   __match_args__ = ('operator', 'right')
+   kind: typing.ClassVar[int] = 10
    def __init__(self, operator: Token, right: Expr):
       self.operator = operator
       self.right = right
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_UnaryExpr(self)
 class Variable(Expr):
+   __slots__ = ('name', 'depth', 'slot')
+   __match_args__ = ('name',)
+   kind: typing.ClassVar[int] = 11
+   depth: int | None
+   slot: int | None
    def __init__(self, name: Token):
       self.name = name
+      self.depth = None
+      self.slot = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_VariableExpr(self)
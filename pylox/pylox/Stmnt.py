@@ -3,6 +3,8 @@ from pylox.Expr import Expr, Variable
 from pylox.tokens import Token
 import typing
 class Stmnt(typing.Protocol):
+   __slots__ = ()
+   kind: typing.ClassVar[int]
    def accept[T](self, visitor: Visitor[T]) -> T:...
 
 class Visitor[T]:
@@ -25,56 +27,111 @@ class Visitor[T]:
    def visit_WhileStmnt(self, stmnt:While) -> T:...
 
 class Block(Stmnt):
+   __slots__ = ('statements', 'slot_count', 'line')
+   __match_args__ = ('statements',)
+   kind: typing.ClassVar[int] = 0
+   slot_count: int | None
+   line: int | None
    def __init__(self, statements: list[Stmnt]):
       self.statements = statements
+      self.slot_count = None
+      self.line = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_BlockStmnt(self)
 class Class(Stmnt):
+   __slots__ = ('name', 'methods', 'superclass', 'slot', 'line')
+   __match_args__ = ('name', 'methods', 'superclass')
+   kind: typing.ClassVar[int] = 1
+   slot: int | None
+   line: int | None
    def __init__(self, name: Token, methods: list[Function], superclass: Variable | None):
       self.name = name
       self.methods = methods
       self.superclass = superclass
+      self.slot = None
+      self.line = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_ClassStmnt(self)
 class Expression(Stmnt):
+   __slots__ = ('expression', 'line')
+   __match_args__ = ('expression',)
+   kind: typing.ClassVar[int] = 2
+   line: int | None
    def __init__(self, expression: Expr):
       self.expression = expression
+      self.line = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_ExpressionStmnt(self)
 class Function(Stmnt):
+   __slots__ = ('name', 'params', 'body', 'slot', 'slot_count', 'line')
+   __match_args__ = ('name', 'params', 'body')
+   kind: typing.ClassVar[int] = 3
+   slot: int | None
+   slot_count: int | None
+   line: int | None
    def __init__(self, name: Token, params: list[Token], body: list[Stmnt]):
       self.name = name
       self.params = params
       self.body = body
+      self.slot = None
+      self.slot_count = None
+      self.line = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_FunctionStmnt(self)
 class If(Stmnt):
+   __slots__ = ('condition', 'then_branch', 'else_branch', 'line')
+   __match_args__ = ('condition', 'then_branch', 'else_branch')
+   kind: typing.ClassVar[int] = 4
+   line: int | None
    def __init__(self, condition: Expr, then_branch: Stmnt, else_branch: Stmnt | None):
       self.condition = condition
       self.then_branch = then_branch
       self.else_branch = else_branch
+      self.line = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_IfStmnt(self)
 class Print(Stmnt):
+   __slots__ = ('expression', 'line')
+   __match_args__ = ('expression',)
+   kind: typing.ClassVar[int] = 5
+   line: int | None
    def __init__(self, expression: Expr):
       self.expression = expression
+      self.line = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_PrintStmnt(self)
 class Return(Stmnt):
+   __slots__ = ('keyword', 'value', 'line')
+   __match_args__ = ('keyword', 'value')
+   kind: typing.ClassVar[int] = 6
+   line: int | None
    def __init__(self, keyword: Token, value: Expr | None):
       self.keyword = keyword
       self.value = value
+      self.line = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_ReturnStmnt(self)
 class Var(Stmnt):
+   __slots__ = ('name', 'initializer', 'slot', 'line')
+   __match_args__ = ('name', 'initializer')
+   kind: typing.ClassVar[int] = 7
+   slot: int | None
+   line: int | None
    def __init__(self, name: Token, initializer: Expr):
       self.name = name
       self.initializer = initializer
+      self.slot = None
+      self.line = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_VarStmnt(self)
 class While(Stmnt):
+   __slots__ = ('condition', 'body', 'line')
+   __match_args__ = ('condition', 'body')
+   kind: typing.ClassVar[int] = 8
+   line: int | None
    def __init__(self, condition: Expr, body: Stmnt):
       self.condition = condition
       self.body = body
+      self.line = None
    def accept[T](self, visitor: Visitor[T]):
       return visitor.visit_WhileStmnt(self)
@@ -1,19 +1,31 @@
 from __future__ import annotations
+import contextlib
+import io
 import sys
 import typing
 from pathlib import Path
-import pylox.tokens as tokens
 import pylox.error_handling as errors
-import enum
 import pylox.lox_scanner as scan
 import logging.config
+import mmap
 import os
+import signal
 import pylox.Expr as Expr
-import pylox.Stmnt as stmnt
 import pylox.code_gen
 import pylox.lox_parser as parser_mod
+import pylox.lox_compiler as lox_compiler
+import pylox.lox_vm as lox_vm
+import pylox.optimizer as optimizer
+import pylox.output as lox_output
+import pylox.ast_cache as ast_cache
+import pylox.tracing as tracing
+import pylox.profiler as profiler
+import pylox.sampling as sampling
+import pylox.benchmark as benchmark
+from pylox.interpreter import Interpreter, Resolver
+from pylox.closure_compiler import ClosureEngine
+from pylox.python_compiler import PythonEngine
 import click
-import time
 
 
 if typing.TYPE_CHECKING:
@@ -36,723 +48,6 @@ logging.config.dictConfig({
 LOGGER: typing.Final[logging.Logger] = logging.getLogger(__name__)
 
 
-class Environment:
-    """
-    Holds variable declarations
-    """
-
-    values: dict[str, object]
-    enclosing: Environment | None
-
-    def __init__(self, enclosing: Environment | None = None):
-        self.enclosing = enclosing
-        self.values = {}
-
-    def define(self, name: str, value: object):
-        LOGGER.debug(f"defined {name} = {value}")
-        self.values[name] = value
-        LOGGER.debug(f"env after assignment: {self.values}")
-
-    def get_variable(self, name: tokens.Token):
-        LOGGER.debug(f"attempting to read '{name.lexeme}' from env:")
-        LOGGER.debug(f"env: {self.values}")
-
-        if name.lexeme in self.values:
-            return self.values[name.lexeme]
-
-        if self.enclosing is not None:
-            return self.enclosing.get_variable(name)
-
-        raise errors.LoxRuntimeError(name, msg=f"Undefined variable '{name.lexeme}'")
-
-    def assign(self, name: tokens.Token, value: object):
-        if name.lexeme in self.values:
-            self.values[name.lexeme] = value
-            return
-
-        if self.enclosing is not None:
-            self.enclosing.assign(name, value)
-            return
-
-        raise errors.LoxRuntimeError(name, f"Undefined variable {name.lexeme}.")
-
-    def get_at(self, distance: int, name: str):
-        return self.ancestor(distance).values.get(name)
-
-    def ancestor(self, distance: int):
-        environment = self
-        for _ in range(distance):
-            environment = environment.enclosing
-
-        return environment
-
-    def assign_at(self, distance: int, name: tokens.Token, value: object):
-        self.ancestor(distance).values[name.lexeme] = value
-
-
-@typing.runtime_checkable
-class LoxCallable(typing.Protocol):
-    # I guess you have to take self?
-    def call(
-        self, interpreter: Interpreter, arguments: list[object]
-    ) -> None | object: ...
-    def arity(self) -> int: ...
-
-
-class LoxClass(LoxCallable):
-    name: str
-    methods: dict[str, LoxFunction]
-    superclass: LoxClass
-
-    def __init__(
-        self, name, methods: dict[str, LoxFunction], superclass: LoxClass
-    ) -> None:
-        self.name = name
-        self.methods = methods
-        self.superclass = superclass
-
-    def __repr__(self) -> str:
-        return self.name
-
-    def find_method(self, name: str):
-        if name in self.methods:
-            return self.methods.get(name, None)
-
-        if self.superclass is not None:
-            return self.superclass.find_method(name)
-
-    def call(self, interpreter: Interpreter, arguments: list[object]) -> None | object:
-        initializer = self.find_method("init")
-        instance = LoxInstance(self)
-
-        if initializer is not None:
-            initializer.bind(instance).call(interpreter, arguments)
-        return instance
-
-    def arity(self) -> int:
-        initializer = self.find_method("init")
-        if initializer is None:
-            return 0
-        return initializer.arity()
-
-
-class LoxInstance:
-    klass: LoxClass
-    fields: dict[str, object]
-
-    def __init__(self, klass: LoxClass):
-        self.klass = klass
-        self.fields = {}
-
-    def __repr__(self):
-        return self.klass.name + " instance"
-
-    def get(self, name: tokens.Token):
-        if name.lexeme in self.fields:
-            return self.fields.get(name.lexeme, None)
-
-        method = self.klass.find_method(name.lexeme)
-        if method is not None:
-            return method.bind(self)
-
-        if method is not None:
-            return method
-
-        raise errors.LoxRuntimeError(name, f"Undefined property {name.lexeme}.")
-
-    def set(self, name: tokens.Token, value: object):
-        self.fields[name.lexeme] = value
-
-
-class LoxFunction(LoxCallable):
-    declaration: stmnt.Function
-    closure: Environment | None
-    is_initializer: bool
-
-    def __init__(
-        self, declaration: stmnt.Function, closure: Environment, is_initializer: bool
-    ):
-        self.declaration = declaration
-        self.closure = closure
-        self.is_initializer = is_initializer
-
-    def bind(self, instance: LoxInstance):
-        environment = Environment(self.closure)
-
-        environment.define("this", instance)
-
-        return LoxFunction(self.declaration, environment, self.is_initializer)
-
-    def call(self, interpreter: Interpreter, arguments: list[object]) -> None | object:
-        environment = Environment(self.closure)
-        for ind in range(len(self.declaration.params)):
-            environment.define(self.declaration.params[ind].lexeme, arguments[ind])
-
-        try:
-            interpreter.execute_block(self.declaration.body, environment)
-        except errors.ReturnException as return_value:
-            if self.is_initializer:
-                return self.closure.get_at(0, "this")
-
-            return return_value.value
-
-        if self.is_initializer:
-            return self.closure.get_at(0, "this")
-
-    def arity(self) -> int:
-        return len(self.declaration.params)
-
-    def __repr__(self) -> str:
-        return f"<fn {self.declaration.name.lexeme} >"
-
-
-class FunctionType(enum.Enum):
-    NONE = 1
-    FUNCTION = 2
-    METHOD = 3
-    INITIALIZER = 4
-
-
-class ClassType(enum.Enum):
-    NONE = 1
-    CLASS = 2
-    SUBCLASS = 3
-
-
-class Resolver(Expr.Visitor[None], stmnt.Visitor[None]):
-    interpreter: Interpreter
-    scopes: list[dict[str, bool]]
-    current_function: FunctionType
-    current_class: ClassType
-
-    def __init__(self, interpreter: Interpreter):
-        self.interpreter = interpreter
-        self.scopes = []
-        self.current_function = FunctionType.NONE
-        self.current_class = ClassType.NONE
-
-    def visit_ThisExpr(self, expr: Expr.This) -> None:
-        if self.current_class == ClassType.NONE:
-            errors.error_from_token(
-                expr.keyword, "Can't use 'this' outside of a class."
-            )
-            return None
-        self.resolve_local(expr, expr.keyword)
-
-    def visit_SuperExpr(self, expr: Expr.Super) -> None:
-        if self.current_class == ClassType.NONE:
-            errors.error_from_token(
-                expr.keyword, "Can't use 'super' outside of a class"
-            )
-        elif self.current_class is not ClassType.SUBCLASS:
-            errors.error_from_token(
-                expr.keyword, "Can't use 'super' in a class with no superclass"
-            )
-        self.resolve_local(expr, expr.keyword)
-
-    def visit_SetExpr(self, expr: Expr.Set) -> None:
-        self.resolve_expr(expr.value)
-        self.resolve_expr(expr.obj)
-
-    def visit_GetExpr(self, expr: Expr.Get) -> None:
-        self.resolve_expr(expr.obj)
-
-    def visit_ClassStmnt(self, stmnt: stmnt.Class) -> None:
-        enclosing_class = self.current_class
-        self.current_class = ClassType.CLASS
-        self.declare(stmnt.name)
-        self.define(stmnt.name)
-
-        if (
-            stmnt.superclass is not None
-            and stmnt.name.lexeme == stmnt.superclass.name.lexeme
-        ):
-            errors.error_from_token(
-                stmnt.superclass.name, "A class can't inherit from itself."
-            )
-
-        if stmnt.superclass is not None:
-            self.current_class = ClassType.SUBCLASS
-            self.resolve_expr(stmnt.superclass)
-
-        if stmnt.superclass is not None:
-            self.begin_scope()
-            self.scopes[-1]["super"] = True
-
-        self.begin_scope()
-        self.scopes[-1]["this"] = True
-
-        for method in stmnt.methods:
-            declaration = FunctionType.METHOD
-            if method.name.lexeme == "init":
-                declaration = FunctionType.INITIALIZER
-            self.resolve_function(method, declaration)
-
-        self.end_scope()
-        if stmnt.superclass is not None:
-            self.end_scope()
-        self.current_class = enclosing_class
-        return None
-
-    def visit_ExpressionStmnt(self, stmnt: stmnt.Expression) -> None:
-        self.resolve_expr(stmnt.expression)
-
-    def visit_IfStmnt(self, stmnt: stmnt.If) -> None:
-        self.resolve_expr(stmnt.condition)
-        self.resolve_stmnt(stmnt.then_branch)
-        if stmnt.else_branch is not None:
-            self.resolve_stmnt(stmnt.else_branch)
-
-    def visit_PrintStmnt(self, stmnt: stmnt.Print) -> None:
-        self.resolve_expr(stmnt.expression)
-
-    def visit_ReturnStmnt(self, stmnt: stmnt.Return) -> None:
-        if self.current_function == FunctionType.NONE:
-            errors.error_from_token(stmnt.keyword, "Can't return from top-level code.")
-
-        if stmnt.value is not None:
-            if self.current_function == FunctionType.INITIALIZER:
-                errors.error_from_token(
-                    stmnt.keyword, "Can't return a value from an initializer."
-                )
-            self.resolve_expr(stmnt.value)
-
-    def visit_WhileStmnt(self, stmnt: stmnt.While) -> None:
-        self.resolve_expr(stmnt.condition)
-        self.resolve_stmnt(stmnt.body)
-
-    def visit_BinaryExpr(self, expr: Expr.Binary) -> None:
-        self.resolve_expr(expr.left)
-        self.resolve_expr(expr.right)
-
-    def visit_CallExpr(self, expr: Expr.Call) -> None:
-        self.resolve_expr(expr.callee)
-
-        for argument in expr.arguments:
-            self.resolve_expr(argument)
-
-    def visit_GroupingExpr(self, expr: Expr.Grouping) -> None:
-        self.resolve_expr(expr.expression)
-
-    def visit_LiteralExpr(self, expr: Expr.Literal) -> None:
-        return None
-
-    def visit_LogicalExpr(self, expr: Expr.Logical) -> None:
-        self.resolve_expr(expr.left)
-        self.resolve_expr(expr.right)
-
-    def visit_UnaryExpr(self, expr: Expr.Unary) -> None:
-        self.resolve_expr(expr.right)
-
-    def visit_VariableExpr(self, expr: Expr.Variable) -> None:
-        if not len(self.scopes) == 0 and self.scopes[-1].get(expr.name.lexeme) == False:
-            errors.error_from_token(
-                expr.name, "Can't read local variable in its own initializer."
-            )
-
-        self.resolve_local(expr, expr.name)
-
-    def visit_FunctionStmnt(self, stmnt: stmnt.Function) -> None:
-        self.declare(stmnt.name)
-        self.define(stmnt.name)
-
-        self.resolve_function(stmnt, FunctionType.FUNCTION)
-        return None
-
-    def resolve_function(self, function: stmnt.Function, function_type: FunctionType):
-        enclosing_function = self.current_function
-        self.current_function = function_type
-        self.begin_scope()
-        for param in function.params:
-            self.declare(param)
-            self.define(param)
-
-        self.resolve(function.body)
-
-        self.end_scope()
-        self.current_function = enclosing_function
-
-    def visit_AssignExpr(self, expr: Expr.Assign) -> None:
-        self.resolve_expr(expr.value)
-        self.resolve_local(expr, expr.name)
-
-    def resolve_local(self, expr: Expr.Expr, name: tokens.Token):
-        for i in range(len(self.scopes) - 1, -1, -1):
-            if name.lexeme in self.scopes[i]:
-                self.interpreter.resolve(expr, len(self.scopes) - 1 - i)
-                return
-
-    def declare(self, name: tokens.Token):
-        if len(self.scopes) == 0:
-            return
-
-        scope = self.scopes[-1]
-        if name.lexeme in scope:
-            errors.error_from_token(
-                name, "Already a variable with this name in this scope."
-            )
-        scope[name.lexeme] = False
-
-    def define(self, name: tokens.Token):
-        if len(self.scopes) == 0:
-            return
-
-        self.scopes[-1][name.lexeme] = True
-
-    def visit_VarStmnt(self, stmnt: stmnt.Var) -> None:
-        self.declare(stmnt.name)
-        if stmnt.initializer is not None:
-            self.resolve_expr(stmnt.initializer)
-
-        self.define(stmnt.name)
-        return None
-
-    def visit_BlockStmnt(self, stmnt: stmnt.Block) -> None:
-        self.begin_scope()
-        self.resolve(stmnt.statements)
-        self.end_scope()
-        return None
-
-    def resolve(self, statements: list[stmnt.Stmnt]):
-        for statement in statements:
-            self.resolve_stmnt(statement)
-
-    def resolve_stmnt(self, statement: stmnt.Stmnt):
-        statement.accept(self)
-
-    def resolve_expr(self, expr: Expr.Expr):
-        expr.accept(self)
-
-    def begin_scope(self):
-        self.scopes.append({})
-
-    def end_scope(self):
-        self.scopes.pop()
-
-
-class Interpreter(Expr.Visitor[object], stmnt.Visitor[None]):
-    lox_globals: Environment
-    environment: Environment
-    lox_locals: dict[Expr.Expr, int]
-
-    def __init__(self):
-        class Anon(LoxCallable):
-            def arity(self):
-                return 0
-
-            def call(self, interpreter: Interpreter, arguments: list[object]):
-                return float(time.time())
-
-            def __repr__(self):
-                return "<native fn>"
-
-        self.lox_globals = Environment()
-        self.environment = self.lox_globals
-        self.lox_globals.define(
-            "clock",
-            Anon(),
-        )
-        self.lox_locals = {}
-
-    # Statements
-
-    def visit_ClassStmnt(self, stmnt: stmnt.Class) -> None:
-        superclass = None
-        if stmnt.superclass is not None:
-            superclass = self.evaluate(stmnt.superclass)
-            if not isinstance(superclass, LoxClass):
-                raise errors.LoxRuntimeError(
-                    stmnt.superclass.name, "Superclass must be a class"
-                )
-
-        self.environment.define(stmnt.name.lexeme, None)
-
-        if stmnt.superclass is not None:
-            self.environment = Environment(self.environment)
-            self.environment.define("super", superclass)
-
-        methods = {}
-
-        for method in stmnt.methods:
-            function = LoxFunction(
-                method, self.environment, method.name.lexeme == "init"
-            )
-            methods[method.name.lexeme] = function
-
-        klass = LoxClass(stmnt.name.lexeme, methods, typing.cast(LoxClass, superclass))
-
-        if superclass is not None:
-            self.environment = self.environment.enclosing
-
-        self.environment.assign(stmnt.name, klass)
-
-    def visit_ReturnStmnt(self, stmnt: stmnt.Return) -> None:
-        value = None
-        if stmnt.value is not None:
-            value = self.evaluate(stmnt.value)
-
-        raise errors.ReturnException(value)
-
-    def visit_FunctionStmnt(self, stmnt: stmnt.Function) -> None:
-        function = LoxFunction(stmnt, self.environment, False)
-        self.environment.define(stmnt.name.lexeme, function)
-        return None
-
-    def visit_WhileStmnt(self, stmnt: stmnt.While) -> None:
-        while self.is_truthy(self.evaluate(stmnt.condition)):
-            self.execute(stmnt.body)
-
-        return None
-
-    def visit_BlockStmnt(self, stmnt: stmnt.Block) -> None:
-        self.execute_block(stmnt.statements, Environment(self.environment))
-
-    def execute_block(self, statements: list[stmnt.Stmnt], environment: Environment):
-        previous = self.environment
-        try:
-            self.environment = environment
-            for statement in statements:
-                self.execute(statement)
-        finally:
-            self.environment = previous
-
-    def visit_VarStmnt(self, stmnt: stmnt.Var) -> None:
-        value: object | None = None
-        if stmnt.initializer != None:
-            value = self.evaluate(stmnt.initializer)
-
-        self.environment.define(stmnt.name.lexeme, value)
-
-    def visit_ExpressionStmnt(self, stmnt: stmnt.Expression) -> None:
-        self.evaluate(stmnt.expression)
-
-    def visit_PrintStmnt(self, stmnt: stmnt.Print) -> None:
-        value = self.evaluate(stmnt.expression)
-        print(self.stringify(value))
-
-    def visit_IfStmnt(self, stmnt: stmnt.If) -> None:
-        if self.is_truthy(self.evaluate(stmnt.condition)):
-            self.execute(stmnt.then_branch)
-        elif stmnt.else_branch is not None:
-            self.execute(stmnt.else_branch)
-        return None
-
-    # Expressions
-
-    def visit_SuperExpr(self, expr: Expr.Super) -> object:
-        distance = self.lox_locals.get(expr)
-        superclass = typing.cast(LoxClass, self.environment.get_at(distance, "super"))
-
-        obj = typing.cast(LoxInstance, self.environment.get_at(distance - 1, "this"))
-
-        method = superclass.find_method(expr.method.lexeme)
-
-        if method is None:
-            raise errors.LoxRuntimeError(
-                expr.method, f"Undefined property {expr.method.lexeme}."
-            )
-
-        return method.bind(obj)
-
-    def visit_ThisExpr(self, expr: Expr.This) -> object:
-        return self.lookup_variable(expr.keyword, expr)
-
-    def visit_SetExpr(self, expr: Expr.Set) -> object:
-        obj = self.evaluate(expr.obj)
-
-        if not isinstance(obj, LoxInstance):
-            raise errors.LoxRuntimeError(expr.name, "Only instance have fields.")
-
-        value = self.evaluate(expr.value)
-        typing.cast(LoxInstance, obj).set(expr.name, value)
-        return value
-
-    def visit_GetExpr(self, expr: Expr.Get) -> object:
-        obj = self.evaluate(expr.obj)
-        if isinstance(obj, LoxInstance):
-            return obj.get(expr.name)
-        raise errors.LoxRuntimeError(expr.name, "Only instances have properties.")
-
-    def visit_CallExpr(self, expr: Expr.Call) -> object:
-        callee = self.evaluate(expr.callee)
-
-        arguments = []
-        for arg in expr.arguments:
-            arguments.append(self.evaluate(arg))
-
-        function = callee
-
-        # TODO: I think this might break when running. Make sure it works.
-        if not isinstance(function, LoxCallable):
-            raise errors.LoxRuntimeError(
-                expr.paren, "can only call functions and classes."
-            )
-
-        if len(arguments) != function.arity():
-            raise errors.LoxRuntimeError(
-                expr.paren,
-                f"Expected {function.arity()} arguments but got {len(arguments)}.",
-            )
-
-        return function.call(self, arguments)
-
-    def visit_LogicalExpr(self, expr: Expr.Logical) -> object:
-        left = self.evaluate(expr.left)
-
-        if expr.operator.token_type == tokens.TokenType.OR:
-            if self.is_truthy(expr.left):
-                return left
-        else:
-            if not self.is_truthy(expr.left):
-                return left
-
-        return self.evaluate(expr.right)
-
-    def visit_VariableExpr(self, expr: Expr.Variable) -> object:
-        return self.lookup_variable(expr.name, expr)
-
-    def lookup_variable(self, name: tokens.Token, expr: Expr.Expr):
-        distance = self.lox_locals.get(expr, None)
-        if distance is not None:
-            return self.environment.get_at(distance, name.lexeme)
-        else:
-            return self.lox_globals.get_variable(name)
-
-    def visit_AssignExpr(self, expr: Expr.Assign) -> object:
-        value = self.evaluate(expr.value)
-        distance = self.lox_locals.get(expr, None)
-        if distance is not None:
-            self.environment.assign_at(distance, expr.name, value)
-        else:
-            self.lox_globals.assign(expr.name, value)
-        return value
-
-    def visit_LiteralExpr(self, expr: Expr.Literal) -> object:
-        LOGGER.info(f"Interpreting literal: {expr}")
-        return expr.value
-
-    def visit_GroupingExpr(self, expr: Expr.Grouping) -> object:
-        return self.evaluate(expr.expression)
-
-    def visit_UnaryExpr(self, expr: Expr.Unary) -> object:
-        right = self.evaluate(expr.right)
-
-        match expr.operator.token_type:
-            case scan.TokenType.MINUS:
-                self.check_number_operand(expr.operator, right)
-                return -float(right)
-            case scan.TokenType.BANG:
-                return self.is_truthy(right)
-            case _:
-                return None  # unreachable?
-
-    def visit_BinaryExpr(self, expr: Expr.Binary) -> object:
-        LOGGER.info("evaluating BinaryExpression")
-        left = self.evaluate(expr.left)
-        right = self.evaluate(expr.right)
-
-        match expr.operator.token_type:
-            case scan.TokenType.MINUS:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) - float(right)
-            case scan.TokenType.SLASH:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) / float(right)
-            case scan.TokenType.STAR:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) * float(right)
-            case scan.TokenType.PLUS:
-                if isinstance(left, float) and isinstance(right, float):
-                    return float(left) + float(right)
-                if isinstance(left, str) and isinstance(right, str):
-                    return (
-                        str(left) + str(right)
-                    )  # I don't need to technically do this they are already the correct type\
-                raise errors.LoxRuntimeError(
-                    expr.operator, "Operatnds must be two numbers or two strings"
-                )
-            case scan.TokenType.GREATER:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) > float(right)
-            case scan.TokenType.GREATER_EQUAL:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) >= float(right)
-            case scan.TokenType.LESS:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) < float(right)
-            case scan.TokenType.LESS_EQUAL:
-                self.check_number_operands(expr.operator, left, right)
-                return float(left) <= float(right)
-            case scan.TokenType.BANG_EQUAL:
-                return not self.is_equal(left, right)
-            case scan.TokenType.EQUAL_EQUAL:
-                return self.is_equal(left, right)
-            case _:
-                return None  # should never happen
-
-    def execute(self, statement: stmnt.Stmnt):
-        """
-        Executes an Stmnt for side effects
-        """
-        statement.accept(self)
-
-    def evaluate(self, expr: Expr.Expr):
-        """
-        Evaluates an Expr and returns it's value
-        """
-        return expr.accept(self)
-
-    def is_truthy(self, obj: object):
-        if obj == None:
-            return False
-        if isinstance(obj, bool):
-            return bool(obj)
-        return True
-
-    def is_equal(a: object, b: object) -> bool:
-        if a == None and b == None:
-            return True
-        if a == None:
-            return False
-
-        return a == b
-
-    def stringify(self, obj: object):
-        if obj == None:
-            return "nil"
-
-        if isinstance(obj, float):
-            text = str(obj)
-
-            if text.endswith(".0"):
-                text = int(float(text))
-            return text
-
-        return str(obj)
-
-    def check_number_operand(self, operator: scan.Token, operand: object):
-        if isinstance(operand, float):
-            return
-        raise errors.LoxRuntimeError(operator, "Operand must be a number.")
-
-    def check_number_operands(self, operator: scan.Token, left: object, right: object):
-        if isinstance(left, float) and isinstance(right, float):
-            return
-
-        raise errors.LoxRuntimeError(operator, "Operands must be numbers.")
-
-    def interpret(self, statements: list[stmnt.Stmnt]) -> None:
-        try:
-            for statement in statements:
-                self.execute(statement)
-        except errors.LoxRuntimeError as e:
-            errors.runtime_error(e)
-            print("this is an error. I need to fix this message")
-
-    def resolve(self, expr: Expr.Expr, depth: int):
-        self.lox_locals[expr] = depth
-
-
 class AstPrinter(Expr.Visitor[str]):
     def to_string(self, expr: Expr.Expr):
         return expr.accept(self)
@@ -802,29 +97,95 @@ def run_prompt():
         errors.had_error = False
 
 
-def run(lox_program: str) -> str | None:
+ENGINES: typing.Final[tuple[str, ...]] = (
+    "interpreter",
+    "vm",
+    "closure",
+    "python",
+)
+
+# engines that run the resolved AST through an Interpreter subclass
+INTERPRETERS: typing.Final[dict[str, type[Interpreter]]] = {
+    "closure": ClosureEngine,
+    "python": PythonEngine,
+}
+
+
+def run(
+    lox_program: str | bytes | mmap.mmap,
+    engine: str = "interpreter",
+    optimize: bool = False,
+    script: Path | None = None,
+    tracer: tracing.Tracer | None = None,
+    output: lox_output.Output | None = None,
+) -> str | None:
+    """
+    lox_program is source text, or the UTF-8 bytes of a file (run_file maps
+    it) which are scanned and parsed as a stream. script is the file
+    lox_program was read from, when given the resolved statements are cached
+    next to it (see ast_cache). A tracer can only be attached to the tree
+    walking interpreter. What the program prints goes to output, stdout by
+    default.
+    """
     LOGGER.debug("running program: %s", lox_program)
-    scanner = scan.Scanner(lox_program)
-    tokens = scanner.scan_tokens()
+    if output is None:
+        output = lox_output.Output()
+    if tracer is not None and engine != "interpreter":
+        raise ValueError(f"the {engine} engine can't be traced")
+
+    statements = None
+    if script is not None:
+        statements = ast_cache.load(script, lox_program)
 
-    LOGGER.debug("begin parsing")
-    parser = parser_mod.Parser(tokens)
-    statements = parser.parse()
+    if statements is None:
+        scanner = scan.RegexScanner(lox_program)
+        tokens = scanner.iter_tokens()
 
-    if errors.had_error or statements is None:
-        return "there was some error"
+        LOGGER.debug("begin parsing")
+        parser = parser_mod.PrattParser(tokens)
+        statements = parser.parse()
 
-    interp = Interpreter()
-    resolver = Resolver(interp)
-    resolver.resolve(statements)
+        if errors.had_error or statements is None:
+            return "there was some error"
 
-    if errors.had_error:
-        return
+        resolver = Resolver()
+        resolver.resolve(statements)
 
-    interp.interpret(statements)
+        if errors.had_error:
+            return
+
+        if script is not None:
+            ast_cache.store(script, lox_program, statements)
+
+    if optimize:
+        statements = optimizer.optimize(statements)
+
+    match engine:
+        case "vm":
+            function = lox_compiler.compile_program(statements)
+            if LOGGER.isEnabledFor(logging.DEBUG):
+                LOGGER.debug("bytecode:\n%s", lox_compiler.disassemble(function))
+            lox_vm.interpret(function, output)
+        case _:
+            if tracer is not None:
+                interp: Interpreter = tracing.TracingInterpreter(tracer, output)
+            else:
+                interp = INTERPRETERS.get(engine, Interpreter)(output)
+            interp.interpret(statements)
     return ""
 
 
+def map_source(src_file: Path) -> typing.ContextManager[mmap.mmap | bytes]:
+    """
+    Maps src_file read only, run() scans the mapping as a stream.
+    """
+    with src_file.open("rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            # an empty file can't be mapped
+            return contextlib.nullcontext(b"")
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
 def test_ast_printer():
     # test the printer works as expected
     expression = Expr.Binary(
@@ -870,12 +231,212 @@ def parser():
 
 @click.command()
 @click.argument("lox_file")
-def run_file(lox_file):
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default="interpreter",
+    show_default=True,
+    help="tree walking interpreter, bytecode vm (no recursion limit), compiled"
+    " closures or python",
+)
+@click.option(
+    "--optimize/--no-optimize",
+    default=False,
+    show_default=True,
+    help="fold constant expressions and prune constant branches before running",
+)
+@click.option(
+    "--cache/--no-cache",
+    default=True,
+    show_default=True,
+    help=f"reuse the resolved program kept in {ast_cache.CACHE_DIR} while the file"
+    " is unchanged",
+)
+@click.option(
+    "--trace",
+    is_flag=True,
+    default=False,
+    help="write every statement, call, variable access and allocation to stderr"
+    " (interpreter engine only)",
+)
+@click.option(
+    "--sample-profile",
+    default=None,
+    metavar="OUT.folded",
+    help="sample the Lox call stack every millisecond and write the collapsed"
+    " stacks for flamegraph tools to this file (interpreter engine only)",
+)
+@click.option(
+    "--print-to",
+    default=None,
+    metavar="FILE",
+    help="write what the program prints to this file instead of stdout",
+)
+@click.option(
+    "--buffer-size",
+    default=lox_output.BUFFER_SIZE,
+    show_default=True,
+    help="characters of printed output buffered before they are written",
+)
+@click.option(
+    "--flush-lines",
+    default=None,
+    type=click.IntRange(min=1),
+    help="also write printed output every this many lines (every line by"
+    " default when printing to a terminal)",
+)
+def run_file(
+    lox_file,
+    engine,
+    optimize,
+    cache,
+    trace,
+    sample_profile,
+    print_to,
+    buffer_size,
+    flush_lines,
+):
     src_file = Path(lox_file)
     if not src_file.exists():
         raise FileNotFoundError(f"{lox_file} - does not exist")
+    if trace and engine != "interpreter":
+        raise click.UsageError("--trace only works with --engine=interpreter")
+    if sample_profile is not None:
+        if engine != "interpreter":
+            raise click.UsageError(
+                "--sample-profile only works with --engine=interpreter"
+            )
+        if not hasattr(signal, "setitimer"):
+            raise click.UsageError("--sample-profile needs setitimer")
 
-    run(src_file.read_text())
+    sampler = sampling.Sampler(src_file.name) if sample_profile is not None else None
+    printed = (
+        contextlib.nullcontext(sys.stdout) if print_to is None else open(print_to, "w")
+    )
+    with (
+        map_source(src_file) as source,
+        printed as stream,
+        sampler or contextlib.nullcontext(),
+    ):
+        run(
+            source,
+            engine=engine,
+            optimize=optimize,
+            script=src_file if cache else None,
+            tracer=tracing.StreamTracer(sys.stderr) if trace else None,
+            output=lox_output.Output(stream, buffer_size, flush_lines),
+        )
+
+    if sampler is not None:
+        with open(sample_profile, "w") as f:
+            sampler.write(f)
+
+
+@click.command()
+@click.argument("lox_file")
+@click.option(
+    "--output",
+    "-o",
+    default=None,
+    help="also write the profile to this file, as JSON when it ends with .json"
+    " and in the pstats format otherwise",
+)
+@click.option(
+    "--limit",
+    default=20,
+    show_default=True,
+    help="how many functions and lines to show",
+)
+def profile(lox_file, output, limit):
+    """
+    Runs LOX_FILE with the tree walking interpreter and reports the time spent
+    in every Lox function and on every line to stderr.
+    """
+    src_file = Path(lox_file)
+    if not src_file.exists():
+        raise FileNotFoundError(f"{lox_file} - does not exist")
+
+    lox_profiler = profiler.Profiler()
+    with map_source(src_file) as source:
+        run(source, script=src_file, tracer=lox_profiler)
+
+    lox_profiler.report(
+        sys.stderr,
+        limit=limit,
+        source_lines=src_file.read_text().splitlines(),
+    )
+    if output is not None:
+        lox_profiler.dump(output, str(src_file))
+
+
+@click.command()
+@click.argument("names", nargs=-1, type=click.Choice(benchmark.BENCHMARKS))
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default="interpreter",
+    show_default=True,
+)
+@click.option("--optimize/--no-optimize", default=False, show_default=True)
+@click.option("--runs", default=5, show_default=True, help="timed runs of each")
+@click.option(
+    "--warmup", default=1, show_default=True, help="untimed runs before those"
+)
+@click.option("--output", "-o", default=None, help="save the results as JSON")
+@click.option(
+    "--baseline",
+    default=None,
+    type=click.Path(exists=True, dir_okay=False),
+    help="results saved by --output to compare with, regressions fail the run",
+)
+@click.option(
+    "--threshold",
+    default=benchmark.THRESHOLD,
+    show_default=True,
+    help="how much slower than the baseline a median may get, 0.1 is 10%",
+)
+def bench(names, engine, optimize, runs, warmup, output, baseline, threshold):
+    """
+    Runs the standard benchmarks, or only NAMES, and reports their times.
+    """
+    if runs < 1:
+        raise click.UsageError("--runs must be at least 1")
+    baseline_benchmarks = None
+    if baseline is not None:
+        baseline_benchmarks = benchmark.load(baseline)["benchmarks"]
+
+    benchmarks = {}
+    for name in names or benchmark.BENCHMARKS:
+        source = benchmark.source(name)
+
+        def run_once():
+            errors.had_error = False
+            run(
+                source,
+                engine=engine,
+                optimize=optimize,
+                output=lox_output.Output(io.StringIO()),
+            )
+            if errors.had_error:
+                raise click.ClickException(f"the {name} benchmark failed")
+
+        benchmarks[name] = benchmark.summarize(
+            benchmark.measure(run_once, runs, warmup)
+        )
+
+    benchmark.report(sys.stdout, benchmarks, baseline_benchmarks)
+    if output is not None:
+        benchmark.save(
+            output, benchmark.results(benchmarks, engine, optimize, runs, warmup)
+        )
+
+    if baseline_benchmarks is not None:
+        regressed = benchmark.regressions(benchmarks, baseline_benchmarks, threshold)
+        if regressed:
+            raise click.ClickException(
+                f"slower than the baseline by more than {threshold:.0%}: "
+                + ", ".join(regressed)
+            )
 
 
 lox.add_command(scanner)
@@ -883,6 +444,8 @@ lox.add_command(parser)
 lox.add_command(code_gen)
 lox.add_command(repl)
 lox.add_command(run_file)
+lox.add_command(profile)
+lox.add_command(bench)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+"""
+On-disk cache of resolved programs, the Lox counterpart of __pycache__.
+
+`lox run-file script.lox` keeps the statements the Resolver annotated (every
+variable's depth and slot included) in `__loxcache__/script.lox.ast` next to
+the script. The file starts with a hash of the source and of the front end
+that produced it; when both still match the statements are unpickled and the
+scanner, parser and Resolver are skipped entirely.
+
+Entries are written to a temporary file in the cache directory and moved into
+place with os.replace, so concurrent runs of the same script never see a half
+written entry: a reader gets either the old file or the new one. Anything
+unexpected while reading or writing (a read only directory, a truncated or
+stale file) just falls back to the regular front end.
+"""
+
+from __future__ import annotations
+import typing
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import pylox.Stmnt as stmnt
+
+LOGGER: typing.Final[logging.Logger] = logging.getLogger(__name__)
+
+CACHE_DIR: typing.Final[str] = "__loxcache__"
+MAGIC: typing.Final[bytes] = b"LOXAST1\n"
+
+# the cached statements are only valid for the front end that built them
+FRONT_END: typing.Final[tuple[str, ...]] = (
+    "tokens.py",
+    "lox_scanner.py",
+    "lox_parser.py",
+    "Expr.py",
+    "Stmnt.py",
+    "interpreter.py",
+)
+
+_front_end_digest: bytes | None = None
+
+
+def front_end_digest() -> bytes:
+    global _front_end_digest
+    if _front_end_digest is None:
+        digest = hashlib.sha256()
+        package = Path(__file__).parent
+        for name in FRONT_END:
+            digest.update((package / name).read_bytes())
+        _front_end_digest = digest.digest()
+    return _front_end_digest
+
+
+def source_key(source: str | bytes | mmap.mmap) -> bytes:
+    digest = hashlib.sha256(front_end_digest())
+    digest.update(source.encode() if isinstance(source, str) else source)
+    return digest.digest()
+
+
+def cache_path(script: Path) -> Path:
+    return script.parent / CACHE_DIR / (script.name + ".ast")
+
+
+def load(script: Path, source: str | bytes | mmap.mmap) -> list[stmnt.Stmnt] | None:
+    """
+    Returns the resolved statements cached for this exact source, or None on
+    a miss.
+    """
+    path = cache_path(script)
+    header = MAGIC + source_key(source)
+    try:
+        with path.open("rb") as f:
+            if f.read(len(header)) != header:
+                LOGGER.debug("stale cache entry %s", path)
+                return None
+            statements = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        LOGGER.debug("unreadable cache entry %s: %r", path, e)
+        return None
+
+    LOGGER.debug("loaded %s", path)
+    return statements
+
+
+def store(
+    script: Path, source: str | bytes | mmap.mmap, statements: list[stmnt.Stmnt]
+) -> None:
+    path = cache_path(script)
+    try:
+        payload = pickle.dumps(statements, protocol=pickle.HIGHEST_PROTOCOL)
+    except RecursionError:
+        # pickling recurses once per nesting level, very deep trees are
+        # simply not cached
+        LOGGER.debug("not caching %s, the tree is too deep", script)
+        return
+
+    try:
+        path.parent.mkdir(exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC + source_key(source))
+                f.write(payload)
+            # mkstemp creates the file readable by its owner only
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    except OSError as e:
+        LOGGER.debug("could not write %s: %r", path, e)
+        return
+
+    LOGGER.debug("stored %s", path)
@@ -0,0 +1,160 @@
+"""
+The standard benchmark suite, what `lox bench` runs.
+
+The scripts in bench_scripts are the classic Lox interpreter benchmarks
+(fib, binary_trees, equality, ...) scaled down so each one takes a fraction
+of a second on the tree walking interpreter. The `_array` variants keep
+their objects in native Arrays instead of instance fields.
+
+Every benchmark runs the whole program, front end included, `warmup` times
+untimed and then `runs` times. The median and the 10th and 90th percentiles
+of the timed runs are reported.
+
+Results are saved as JSON and a later run can be compared against them: a
+benchmark whose median grew by more than the threshold is a regression.
+
+    lox bench --output before.json
+    lox bench --baseline before.json --threshold 0.05
+"""
+
+from __future__ import annotations
+import typing
+import gc
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+
+SCRIPTS_DIR: typing.Final[Path] = Path(__file__).parent / "bench_scripts"
+
+BENCHMARKS: typing.Final[tuple[str, ...]] = (
+    "binary_trees",
+    "binary_trees_array",
+    "equality",
+    "fib",
+    "instantiation",
+    "invocation",
+    "method_call",
+    "properties",
+    "properties_array",
+    "string_equality",
+    "trees",
+    "trees_array",
+    "zoo",
+)
+
+# fraction the median may grow by before it counts as a regression
+THRESHOLD: typing.Final[float] = 0.10
+
+type Summary = dict[str, typing.Any]
+
+
+def source(name: str) -> str:
+    return (SCRIPTS_DIR / f"{name}.lox").read_text()
+
+
+def measure(
+    run_once: typing.Callable[[], object], runs: int, warmup: int
+) -> list[float]:
+    """
+    Seconds taken by each of the timed calls to run_once. Every timing script
+    uses this, lox bench as well as the front end ones in benchmarks.
+    """
+    for _ in range(warmup):
+        run_once()
+
+    times = []
+    for _ in range(runs):
+        # like timeit, keep collections of earlier runs out of the timing
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        try:
+            run_once()
+        finally:
+            times.append(time.perf_counter() - start)
+            gc.enable()
+    return times
+
+
+def summarize(times: list[float]) -> Summary:
+    if len(times) > 1:
+        deciles = statistics.quantiles(times, n=10, method="inclusive")
+        p10, p90 = deciles[0], deciles[-1]
+    else:
+        p10 = p90 = times[0]
+    return {
+        "times": times,
+        "median": statistics.median(times),
+        "p10": p10,
+        "p90": p90,
+    }
+
+
+def results(
+    benchmarks: dict[str, Summary], engine: str, optimize: bool, runs: int, warmup: int
+) -> dict[str, typing.Any]:
+    """
+    What --output saves and --baseline reads back.
+    """
+    return {
+        "engine": engine,
+        "optimize": optimize,
+        "runs": runs,
+        "warmup": warmup,
+        "python": platform.python_version(),
+        "benchmarks": benchmarks,
+    }
+
+
+def load(path: str) -> dict[str, typing.Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path: str, saved: dict[str, typing.Any]) -> None:
+    with open(path, "w") as f:
+        json.dump(saved, f, indent=2)
+
+
+def change(summary: Summary, baseline: Summary) -> float:
+    """
+    How much the median grew since the baseline, 0.1 is 10% slower.
+    """
+    return summary["median"] / baseline["median"] - 1
+
+
+def regressions(
+    benchmarks: dict[str, Summary],
+    baseline: dict[str, Summary],
+    threshold: float = THRESHOLD,
+) -> list[str]:
+    return [
+        name
+        for name, summary in benchmarks.items()
+        if name in baseline and change(summary, baseline[name]) > threshold
+    ]
+
+
+def report(
+    stream: typing.TextIO,
+    benchmarks: dict[str, Summary],
+    baseline: dict[str, Summary] | None = None,
+) -> None:
+    header = f"{'benchmark':<16} {'median':>9} {'p10':>9} {'p90':>9}"
+    if baseline is not None:
+        header += f" {'baseline':>9} {'change':>8}"
+    stream.write(header + "\n")
+
+    for name, summary in benchmarks.items():
+        line = (
+            f"{name:<16} {summary['median']:>8.3f}s {summary['p10']:>8.3f}s"
+            f" {summary['p90']:>8.3f}s"
+        )
+        if baseline is not None and name in baseline:
+            line += (
+                f" {baseline[name]['median']:>8.3f}s"
+                f" {change(summary, baseline[name]):>+8.1%}"
+            )
+        stream.write(line + "\n")
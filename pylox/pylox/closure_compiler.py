@@ -0,0 +1,764 @@
+"""
+Closure compilation engine, selected with `lox run-file --engine=closure`.
+
+The resolved AST is walked once and every node is turned into a Python closure
+that already knows its operator, its children and its resolved scope depth.
+Running the program then calls those closures directly instead of going
+through accept/visit_* and the TokenType match on every evaluation.
+
+Runtime objects (Environment, LoxFunction, LoxClass, LoxInstance) are shared
+with the tree walking Interpreter.
+"""
+
+from __future__ import annotations
+import typing
+import logging
+
+import pylox.error_handling as errors
+import pylox.Expr as Expr
+import pylox.Stmnt as stmnt
+import pylox.natives as natives
+from pylox.interpreter import (
+    Completion,
+    Environment,
+    Interpreter,
+    LoxCallable,
+    LoxClass,
+    LoxFunction,
+    LoxInstance,
+    PropertyCache,
+    is_addition,
+)
+from pylox.output import Output
+from pylox.tokens import Token, TokenType
+
+LOGGER: typing.Final[logging.Logger] = logging.getLogger(__name__)
+
+type ExprFn = typing.Callable[[Environment], object]
+type StmntFn = typing.Callable[[Environment], Completion | None]
+
+# `return;` carries no value so every one of them can share a Completion
+RETURN_NIL: typing.Final[Completion] = Completion(None)
+
+
+class ClosureEngine(Interpreter):
+    """
+    Interpreter whose statements have been compiled ahead of time. Globals,
+    natives and the Resolver hook are inherited from Interpreter.
+    """
+
+    function_bodies: dict[int, list[StmntFn]]
+
+    def __init__(self, output: Output | None = None):
+        super().__init__(output)
+        self.function_bodies = {}
+
+    def execute_block(
+        self, statements: list[stmnt.Stmnt], environment: Environment
+    ) -> Completion | None:
+        # only reached through LoxFunction.call, plain blocks run their
+        # compiled closures directly
+        for statement in self.function_bodies[id(statements)]:
+            completion = statement(environment)
+            if completion is not None:
+                return completion
+        return None
+
+    def interpret(self, statements: list[stmnt.Stmnt]) -> None:
+        program = ClosureCompiler(self).compile(statements)
+        try:
+            for statement in program:
+                statement(self.lox_globals)
+        except errors.LoxRuntimeError as e:
+            self.output.flush()
+            errors.runtime_error(e)
+        finally:
+            self.output.flush()
+
+
+def ancestor_values(depth: int) -> typing.Callable[[Environment], list[object]]:
+    """
+    Returns a function that finds the values list depth environments up. The
+    common depths are unrolled so they skip the loop in Environment.ancestor.
+    """
+    match depth:
+        case 0:
+            return lambda env: env.values
+        case 1:
+            return lambda env: env.enclosing.values
+        case 2:
+            return lambda env: env.enclosing.enclosing.values
+        case _:
+            return lambda env: env.ancestor(depth).values
+
+
+class ClosureCompiler(Expr.Visitor[ExprFn], stmnt.Visitor[StmntFn]):
+    engine: ClosureEngine
+
+    def __init__(self, engine: ClosureEngine):
+        self.engine = engine
+
+    def compile(self, statements: list[stmnt.Stmnt]) -> list[StmntFn]:
+        return [self.compile_stmnt(statement) for statement in statements]
+
+    def compile_stmnt(self, statement: stmnt.Stmnt) -> StmntFn:
+        return statement.accept(self)
+
+    def compile_expr(self, expr: Expr.Expr) -> ExprFn:
+        return expr.accept(self)
+
+    def compile_function(self, declaration: stmnt.Function):
+        self.engine.function_bodies[id(declaration.body)] = self.compile(
+            declaration.body
+        )
+
+    def lookup(self, expr: Expr.Variable | Expr.This, name: Token) -> ExprFn:
+        depth = expr.depth
+        slot = typing.cast(int, expr.slot)
+        lexeme = name.lexeme
+
+        if depth is None:
+            global_values = self.engine.lox_globals.values
+
+            def global_variable(env: Environment) -> object:
+                try:
+                    return global_values[lexeme]
+                except KeyError:
+                    raise errors.LoxRuntimeError(
+                        name, msg=f"Undefined variable '{lexeme}'"
+                    ) from None
+
+            return global_variable
+
+        match depth:
+            case 0:
+                return lambda env: env.values[slot]
+            case 1:
+                return lambda env: env.enclosing.values[slot]
+            case _:
+                values_at = ancestor_values(depth)
+                return lambda env: values_at(env)[slot]
+
+    def declaration(
+        self, name: Token, slot: int | None
+    ) -> typing.Callable[[Environment, object], None]:
+        """
+        Returns a function that binds a declared name, by slot for locals and
+        by name for globals.
+        """
+        if slot is None:
+            global_values = self.engine.lox_globals.values
+            lexeme = name.lexeme
+
+            def define_global(env: Environment, value: object) -> None:
+                global_values[lexeme] = value
+
+            return define_global
+
+        def define_local(env: Environment, value: object) -> None:
+            env.values[slot] = value
+
+        return define_local
+
+    # Statements
+
+    def visit_BlockStmnt(self, stmnt: stmnt.Block) -> StmntFn:
+        body = self.compile(stmnt.statements)
+        slot_count = stmnt.slot_count
+
+        def block(env: Environment) -> Completion | None:
+            inner = Environment(env, slot_count)
+            for statement in body:
+                completion = statement(inner)
+                if completion is not None:
+                    return completion
+            return None
+
+        return block
+
+    def visit_ClassStmnt(self, stmnt: stmnt.Class) -> StmntFn:
+        name = stmnt.name
+        superclass_fn = (
+            None if stmnt.superclass is None else self.compile_expr(stmnt.superclass)
+        )
+        for method in stmnt.methods:
+            self.compile_function(method)
+        declarations = stmnt.methods
+        superclass_token = stmnt.superclass.name if stmnt.superclass else None
+        define = self.declaration(name, stmnt.slot)
+
+        def class_declaration(env: Environment) -> None:
+            superclass = None
+            if superclass_fn is not None:
+                superclass = superclass_fn(env)
+                if not isinstance(superclass, LoxClass):
+                    raise errors.LoxRuntimeError(
+                        typing.cast(Token, superclass_token),
+                        "Superclass must be a class",
+                    )
+
+            define(env, None)
+            method_env = env
+            if superclass is not None:
+                method_env = Environment(env, 1)
+                method_env.values[0] = superclass
+
+            methods = {
+                method.name.lexeme: LoxFunction(
+                    method, method_env, method.name.lexeme == "init"
+                )
+                for method in declarations
+            }
+            define(
+                env, LoxClass(name.lexeme, methods, typing.cast(LoxClass, superclass))
+            )
+
+        return class_declaration
+
+    def visit_ExpressionStmnt(self, stmnt: stmnt.Expression) -> StmntFn:
+        expression = self.compile_expr(stmnt.expression)
+
+        def expression_statement(env: Environment) -> None:
+            expression(env)
+
+        return expression_statement
+
+    def visit_FunctionStmnt(self, stmnt: stmnt.Function) -> StmntFn:
+        self.compile_function(stmnt)
+        declaration = stmnt
+        define = self.declaration(stmnt.name, stmnt.slot)
+
+        def function_declaration(env: Environment) -> None:
+            define(env, LoxFunction(declaration, env, False))
+
+        return function_declaration
+
+    def visit_IfStmnt(self, stmnt: stmnt.If) -> StmntFn:
+        condition = self.compile_expr(stmnt.condition)
+        then_branch = self.compile_stmnt(stmnt.then_branch)
+        if stmnt.else_branch is None:
+
+            def if_then(env: Environment) -> Completion | None:
+                value = condition(env)
+                if value is not None and value is not False:
+                    return then_branch(env)
+                return None
+
+            return if_then
+
+        else_branch = self.compile_stmnt(stmnt.else_branch)
+
+        def if_then_else(env: Environment) -> Completion | None:
+            value = condition(env)
+            if value is not None and value is not False:
+                return then_branch(env)
+            return else_branch(env)
+
+        return if_then_else
+
+    def visit_PrintStmnt(self, stmnt: stmnt.Print) -> StmntFn:
+        expression = self.compile_expr(stmnt.expression)
+        stringify = self.engine.stringify
+        write_line = self.engine.output.write_line
+
+        def print_statement(env: Environment) -> None:
+            write_line(stringify(expression(env)))
+
+        return print_statement
+
+    def visit_ReturnStmnt(self, stmnt: stmnt.Return) -> StmntFn:
+        if stmnt.value is None:
+            return lambda env: RETURN_NIL
+
+        value = self.compile_expr(stmnt.value)
+
+        def return_value(env: Environment) -> Completion:
+            return Completion(value(env))
+
+        return return_value
+
+    def visit_VarStmnt(self, stmnt: stmnt.Var) -> StmntFn:
+        initializer = None
+        if stmnt.initializer is not None:
+            initializer = self.compile_expr(stmnt.initializer)
+        slot = stmnt.slot
+
+        if slot is None:
+            define = self.declaration(stmnt.name, slot)
+
+            def define_global(env: Environment) -> None:
+                define(env, None if initializer is None else initializer(env))
+
+            return define_global
+
+        if initializer is None:
+            # slots start out as nil
+            return lambda env: None
+
+        def define_local(env: Environment) -> None:
+            env.values[slot] = initializer(env)
+
+        return define_local
+
+    def visit_WhileStmnt(self, stmnt: stmnt.While) -> StmntFn:
+        condition = self.compile_expr(stmnt.condition)
+        body = self.compile_stmnt(stmnt.body)
+
+        def while_loop(env: Environment) -> Completion | None:
+            while True:
+                value = condition(env)
+                if value is None or value is False:
+                    return None
+                completion = body(env)
+                if completion is not None:
+                    return completion
+
+        return while_loop
+
+    # Expressions
+
+    def visit_AssignExpr(self, expr: Expr.Assign) -> ExprFn:
+        value_fn = self.compile_expr(expr.value)
+        name = expr.name
+        lexeme = name.lexeme
+        depth = expr.depth
+        slot = typing.cast(int, expr.slot)
+
+        if depth is None:
+            global_values = self.engine.lox_globals.values
+
+            def assign_global(env: Environment) -> object:
+                value = value_fn(env)
+                if lexeme not in global_values:
+                    raise errors.LoxRuntimeError(name, f"Undefined variable {lexeme}.")
+                global_values[lexeme] = value
+                return value
+
+            return assign_global
+
+        values_at = ancestor_values(depth)
+
+        def assign_local(env: Environment) -> object:
+            value = value_fn(env)
+            values_at(env)[slot] = value
+            return value
+
+        return assign_local
+
+    def visit_BinaryExpr(self, expr: Expr.Binary) -> ExprFn:
+        if expr.operator.token_type is TokenType.PLUS and is_addition(expr.left):
+            return self.add_chain(expr)
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+        operator = expr.operator
+        vector_arithmetic = self.engine.vector_arithmetic
+
+        def numbers_error() -> errors.LoxRuntimeError:
+            return errors.LoxRuntimeError(operator, "Operands must be numbers.")
+
+        match operator.token_type:
+            case TokenType.PLUS:
+
+                def add(env: Environment) -> object:
+                    a = left(env)
+                    b = right(env)
+                    if (type(a) is float and type(b) is float) or (
+                        type(a) is str and type(b) is str
+                    ):
+                        return a + b
+                    return vector_arithmetic(
+                        operator, a, b, "Operatnds must be two numbers or two strings"
+                    )
+
+                return add
+            case TokenType.MINUS:
+
+                def subtract(env: Environment) -> object:
+                    a = left(env)
+                    b = right(env)
+                    if type(a) is float and type(b) is float:
+                        return a - b
+                    return vector_arithmetic(operator, a, b)
+
+                return subtract
+            case TokenType.STAR:
+
+                def multiply(env: Environment) -> object:
+                    a = left(env)
+                    b = right(env)
+                    if type(a) is float and type(b) is float:
+                        return a * b
+                    return vector_arithmetic(operator, a, b)
+
+                return multiply
+            case TokenType.SLASH:
+
+                def divide(env: Environment) -> object:
+                    a = left(env)
+                    b = right(env)
+                    if type(a) is float and type(b) is float:
+                        return a / b
+                    return vector_arithmetic(operator, a, b)
+
+                return divide
+            case TokenType.GREATER:
+
+                def greater(env: Environment) -> object:
+                    a = left(env)
+                    b = right(env)
+                    if type(a) is float and type(b) is float:
+                        return a > b
+                    raise numbers_error()
+
+                return greater
+            case TokenType.GREATER_EQUAL:
+
+                def greater_equal(env: Environment) -> object:
+                    a = left(env)
+                    b = right(env)
+                    if type(a) is float and type(b) is float:
+                        return a >= b
+                    raise numbers_error()
+
+                return greater_equal
+            case TokenType.LESS:
+
+                def less(env: Environment) -> object:
+                    a = left(env)
+                    b = right(env)
+                    if type(a) is float and type(b) is float:
+                        return a < b
+                    raise numbers_error()
+
+                return less
+            case TokenType.LESS_EQUAL:
+
+                def less_equal(env: Environment) -> object:
+                    a = left(env)
+                    b = right(env)
+                    if type(a) is float and type(b) is float:
+                        return a <= b
+                    raise numbers_error()
+
+                return less_equal
+            case TokenType.EQUAL_EQUAL:
+                is_equal = self.engine.is_equal
+                return lambda env: is_equal(left(env), right(env))
+            case TokenType.BANG_EQUAL:
+                is_equal = self.engine.is_equal
+                return lambda env: not is_equal(left(env), right(env))
+            case _:
+                return lambda env: None  # should never happen
+
+    def add_chain(self, expr: Expr.Binary) -> ExprFn:
+        """
+        `a + b + c + d` in one closure, see Interpreter.add_chain.
+        """
+        additions = []
+        operand: Expr.Expr = expr
+        while is_addition(operand):
+            addition = typing.cast(Expr.Binary, operand)
+            additions.append(addition)
+            operand = addition.left
+        first = self.compile_expr(operand)
+        vector_arithmetic = self.engine.vector_arithmetic
+        rest = [
+            (self.compile_expr(addition.right), addition.operator)
+            for addition in reversed(additions)
+        ]
+
+        def add(env: Environment) -> object:
+            total = first(env)
+            parts: list[str] | None = None
+            for right_fn, operator in rest:
+                right = right_fn(env)
+                if parts is not None:
+                    if type(right) is str:
+                        parts.append(right)
+                        continue
+                elif type(total) is float and type(right) is float:
+                    total = total + right
+                    continue
+                elif type(total) is str and type(right) is str:
+                    parts = [total, right]
+                    continue
+                else:
+                    total = vector_arithmetic(
+                        operator,
+                        total,
+                        right,
+                        "Operatnds must be two numbers or two strings",
+                    )
+                    continue
+                raise errors.LoxRuntimeError(
+                    operator, "Operatnds must be two numbers or two strings"
+                )
+            if parts is not None:
+                return "".join(parts)
+            return total
+
+        return add
+
+    def visit_CallExpr(self, expr: Expr.Call) -> ExprFn:
+        argument_fns = [self.compile_expr(argument) for argument in expr.arguments]
+        paren = expr.paren
+        engine = self.engine
+        function_bodies = engine.function_bodies
+
+        def invoke(
+            function: LoxFunction, this: LoxInstance | None, arguments: list[object]
+        ) -> object:
+            # inlined LoxFunction.invoke so calls skip the protocol isinstance
+            # check and execute_block
+            declaration = function.declaration
+            arity = len(declaration.params)
+            if len(arguments) != arity:
+                raise errors.LoxRuntimeError(
+                    paren,
+                    f"Expected {arity} arguments but got {len(arguments)}.",
+                )
+            environment = Environment(function.closure, declaration.slot_count)
+            if this is None:
+                environment.values[:arity] = arguments
+            else:
+                environment.values[0] = this
+                environment.values[1 : arity + 1] = arguments
+            for statement in function_bodies[id(declaration.body)]:
+                completion = statement(environment)
+                if completion is not None:
+                    break
+            else:
+                completion = None
+
+            if function.is_initializer:
+                return this
+            if completion is not None:
+                return completion.value
+            return None
+
+        def call_value(function: object, arguments: list[object]) -> object:
+            if type(function) is LoxFunction:
+                return invoke(function, function.this, arguments)
+
+            if not isinstance(function, LoxCallable):
+                raise errors.LoxRuntimeError(
+                    paren, "can only call functions and classes."
+                )
+
+            if len(arguments) != function.arity():
+                raise errors.LoxRuntimeError(
+                    paren,
+                    f"Expected {function.arity()} arguments but got {len(arguments)}.",
+                )
+
+            try:
+                return function.call(engine, arguments)
+            except natives.NativeError as e:
+                raise errors.LoxRuntimeError(paren, str(e)) from None
+
+        callee = expr.callee
+        if isinstance(callee, Expr.Get):
+            # obj.name(...) hands the receiver straight to the method, a bound
+            # method is only allocated when a method is used as a value
+            obj_fn = self.compile_expr(callee.obj)
+            name = callee.name
+            lookup = PropertyCache().lookup
+
+            def method_call(env: Environment) -> object:
+                obj = obj_fn(env)
+                if type(obj) is not LoxInstance:
+                    if not isinstance(obj, natives.NativeInstance):
+                        raise errors.LoxRuntimeError(
+                            name, "Only instances have properties."
+                        )
+                    native = engine.native_method(obj, name)
+                    arguments = [argument(env) for argument in argument_fns]
+                    if len(arguments) != native.argument_count:
+                        raise errors.LoxRuntimeError(
+                            paren,
+                            f"Expected {native.argument_count} arguments"
+                            f" but got {len(arguments)}.",
+                        )
+                    try:
+                        return native.function(obj, *arguments)
+                    except natives.NativeError as e:
+                        raise errors.LoxRuntimeError(paren, str(e)) from None
+                _, slot, method = lookup(obj, name)
+                arguments = [argument(env) for argument in argument_fns]
+                if slot is None:
+                    return invoke(method, obj, arguments)
+                return call_value(obj.values[slot], arguments)
+
+            return method_call
+
+        if isinstance(callee, Expr.Super):
+            find_super_method = self.super_method(callee)
+
+            def super_call(env: Environment) -> object:
+                method, obj = find_super_method(env)
+                arguments = [argument(env) for argument in argument_fns]
+                return invoke(method, obj, arguments)
+
+            return super_call
+
+        callee_fn = self.compile_expr(callee)
+
+        def call(env: Environment) -> object:
+            function = callee_fn(env)
+            arguments = [argument(env) for argument in argument_fns]
+
+            if type(function) is LoxFunction:
+                # plain function calls are the hot path, keep them inlined
+                # rather than going through invoke
+                declaration = function.declaration
+                arity = len(declaration.params)
+                this = function.this
+                if this is not None or len(arguments) != arity:
+                    return invoke(function, this, arguments)
+                environment = Environment(function.closure, declaration.slot_count)
+                environment.values[:arity] = arguments
+                for statement in function_bodies[id(declaration.body)]:
+                    completion = statement(environment)
+                    if completion is not None:
+                        return completion.value
+                return None
+
+            return call_value(function, arguments)
+
+        return call
+
+    def visit_GetExpr(self, expr: Expr.Get) -> ExprFn:
+        obj_fn = self.compile_expr(expr.obj)
+        name = expr.name
+        cache = PropertyCache()
+        entries = cache.entries
+        cache_get = cache.get
+
+        def get(env: Environment) -> object:
+            obj = obj_fn(env)
+            if type(obj) is LoxInstance:
+                # monomorphic field read inlined, everything else goes
+                # through the cache
+                if entries:
+                    shape, slot, _ = entries[0]
+                    if shape is obj.shape and slot is not None:
+                        return obj.values[slot]
+                return cache_get(obj, name)
+            if isinstance(obj, natives.NativeInstance):
+                return self.engine.native_method(obj, name).bind(obj)
+            raise errors.LoxRuntimeError(name, "Only instances have properties.")
+
+        return get
+
+    def visit_GroupingExpr(self, expr: Expr.Grouping) -> ExprFn:
+        return self.compile_expr(expr.expression)
+
+    def visit_LiteralExpr(self, expr: Expr.Literal) -> ExprFn:
+        value = expr.value
+        return lambda env: value
+
+    def visit_LogicalExpr(self, expr: Expr.Logical) -> ExprFn:
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+
+        if expr.operator.token_type == TokenType.OR:
+
+            def logical_or(env: Environment) -> object:
+                value = left(env)
+                if value is not None and value is not False:
+                    return value
+                return right(env)
+
+            return logical_or
+
+        def logical_and(env: Environment) -> object:
+            value = left(env)
+            if value is None or value is False:
+                return value
+            return right(env)
+
+        return logical_and
+
+    def visit_SetExpr(self, expr: Expr.Set) -> ExprFn:
+        obj_fn = self.compile_expr(expr.obj)
+        value_fn = self.compile_expr(expr.value)
+        name = expr.name
+        cache = PropertyCache()
+        entries = cache.entries
+        cache_set = cache.set
+
+        def set_property(env: Environment) -> object:
+            obj = obj_fn(env)
+            if type(obj) is not LoxInstance:
+                raise errors.LoxRuntimeError(name, "Only instance have fields.")
+            value = value_fn(env)
+            if entries:
+                shape, slot, transition = entries[0]
+                if shape is obj.shape and transition is None:
+                    obj.values[slot] = value
+                    return value
+            cache_set(obj, name, value)
+            return value
+
+        return set_property
+
+    def visit_SuperExpr(self, expr: Expr.Super) -> ExprFn:
+        find_super_method = self.super_method(expr)
+
+        def super_method(env: Environment) -> object:
+            method, obj = find_super_method(env)
+            return method.bind(obj)
+
+        return super_method
+
+    def super_method(
+        self, expr: Expr.Super
+    ) -> typing.Callable[[Environment], tuple[LoxFunction, LoxInstance]]:
+        """
+        Returns a function that finds the unbound superclass method and the
+        "this" to call it with.
+        """
+        distance = typing.cast(int, expr.depth)
+        slot = typing.cast(int, expr.slot)
+        super_values = ancestor_values(distance)
+        # the method scope just inside "super" keeps "this" in slot 0
+        this_values = ancestor_values(distance - 1)
+        method_name = expr.method
+
+        def find_super_method(env: Environment) -> tuple[LoxFunction, LoxInstance]:
+            superclass = typing.cast(LoxClass, super_values(env)[slot])
+            obj = typing.cast(LoxInstance, this_values(env)[0])
+            method = superclass.find_method(method_name.lexeme)
+            if method is None:
+                raise errors.LoxRuntimeError(
+                    method_name, f"Undefined property {method_name.lexeme}."
+                )
+            return method, obj
+
+        return find_super_method
+
+    def visit_ThisExpr(self, expr: Expr.This) -> ExprFn:
+        return self.lookup(expr, expr.keyword)
+
+    def visit_UnaryExpr(self, expr: Expr.Unary) -> ExprFn:
+        right = self.compile_expr(expr.right)
+        operator = expr.operator
+
+        if operator.token_type == TokenType.MINUS:
+
+            def negate(env: Environment) -> object:
+                value = right(env)
+                if type(value) is float:
+                    return -value
+                raise errors.LoxRuntimeError(operator, "Operand must be a number.")
+
+            return negate
+
+        def bang(env: Environment) -> object:
+            value = right(env)
+            return value is None or value is False
+
+        return bang
+
+    def visit_VariableExpr(self, expr: Expr.Variable) -> ExprFn:
+        return self.lookup(expr, expr.name)
@@ -11,15 +11,45 @@ import io
 LOGGER: typing.Final[logging.Logger] = logging.getLogger(__name__)
 
 
-def define_type(f: io.TextIOWrapper, base_name: str, class_name: str, fields: str):
+def define_type(
+    f: io.TextIOWrapper,
+    base_name: str,
+    class_name: str,
+    fields: str,
+    resolved_fields: str = "",
+    kind: int = 0,
+):
     f.write(f"class {class_name}({base_name}):\n")
-    f.write(f"   def __init__(self, {fields}):\n")
 
+    names = []
     for name_type in fields.split(","):
         print(f"name_type: '{name_type}'")
         name = name_type.strip().split(" ")[0][:-1]
         print(f"name: '{name}'")
+        names.append(name)
+
+    # resolved fields are filled in after the node is built (a statement's line
+    # by the parser, slots by the Resolver, inline caches lazily by the
+    # interpreter)
+    resolved = []
+    for name_type in filter(None, resolved_fields.split(",")):
+        name, field_type = name_type.split(":", 1)
+        resolved.append((name.strip(), field_type.strip()))
+
+    # nodes are the bulk of what the parser allocates, slots keep them to a
+    # fixed size instead of carrying a __dict__ each
+    f.write(f"   __slots__ = {tuple(names + [name for name, _ in resolved])!r}\n")
+    f.write(f"   __match_args__ = {tuple(names)!r}\n")
+    f.write(f"   kind: typing.ClassVar[int] = {kind}\n")
+    for name, field_type in resolved:
+        f.write(f"   {name}: {field_type}\n")
+
+    f.write(f"   def __init__(self, {fields}):\n")
+
+    for name in names:
         f.write(f"      self.{name} = {name}\n")
+    for name, _ in resolved:
+        f.write(f"      self.{name} = None\n")
 
     f.write("   def accept[T](self, visitor: Visitor[T]):\n")
     f.write(f"      return {"visitor.visit" + "_" + class_name + base_name}(self)\n")
@@ -64,6 +94,8 @@ def define_ast(
                 "from pylox.tokens import Token\n",
                 "import typing\n",
                 f"class {base_name}(typing.Protocol):\n",
+                "   __slots__ = ()\n",
+                "   kind: typing.ClassVar[int]\n",
                 "   def accept[T](self, visitor: Visitor[T]) -> T:...\n\n",
             ]
         )
@@ -71,11 +103,13 @@ def define_ast(
         f.writelines(lines)
 
         define_visitor(f, base_name, types)
-        for typee in types:
-            class_name, fields = typee.split("@")
+        for kind, typee in enumerate(types):
+            # CLASS_NAME @ fields [@ resolved fields]
+            class_name, fields, *resolved = typee.split("@")
             class_name = class_name.strip()
             fields = fields.strip()
-            define_type(f, base_name, class_name, fields)
+            resolved_fields = resolved[0].strip() if resolved else ""
+            define_type(f, base_name, class_name, fields, resolved_fields, kind)
 
 
 def generate_ast():
@@ -87,18 +121,18 @@ def generate_ast():
         Path(output_dir),
         base_name="Expr",
         types=[
-            "Assign @ name: Token, value: Expr",
-            "Get @ obj: Expr, name: Token",
+            "Assign @ name: Token, value: Expr @ depth: int | None, slot: int | None",
+            "Get @ obj: Expr, name: Token @ cache: typing.Any",
             "Binary @ left: Expr , operator: Token , right: Expr",
             "Call @ callee: Expr, paren: Token, arguments: list[Expr]",
             "Grouping @ expression: Expr",
             "Literal @ value: object",
             "Logical @ left: Expr, operator: Token, right: Expr",
-            "Set @ obj: Expr, name: Token, value: Expr",
-            "Super @ keyword: Token, method: Token",
-            "This @ keyword: Token",
+            "Set @ obj: Expr, name: Token, value: Expr @ cache: typing.Any",
+            "Super @ keyword: Token, method: Token @ depth: int | None, slot: int | None",
+            "This @ keyword: Token @ depth: int | None, slot: int | None",
             "Unary @ operator: Token, right: Expr",
-            "Variable @ name: Token",
+            "Variable @ name: Token @ depth: int | None, slot: int | None",
         ],
     )
 
@@ -106,15 +140,15 @@ def generate_ast():
         Path(output_dir),
         base_name="Stmnt",
         types=[
-            "Block @ statements: list[Stmnt]",
-            "Class @ name: Token, methods: list[Function], superclass: Variable | None",
-            "Expression @ expression: Expr",
-            "Function @ name: Token, params: list[Token], body: list[Stmnt]",
-            "If @ condition: Expr, then_branch: Stmnt, else_branch: Stmnt | None",
-            "Print @ expression: Expr",
-            "Return @ keyword: Token, value: Expr | None",
-            "Var @ name: Token, initializer: Expr",
-            "While @ condition: Expr, body: Stmnt",
+            "Block @ statements: list[Stmnt] @ slot_count: int | None, line: int | None",
+            "Class @ name: Token, methods: list[Function], superclass: Variable | None @ slot: int | None, line: int | None",
+            "Expression @ expression: Expr @ line: int | None",
+            "Function @ name: Token, params: list[Token], body: list[Stmnt] @ slot: int | None, slot_count: int | None, line: int | None",
+            "If @ condition: Expr, then_branch: Stmnt, else_branch: Stmnt | None @ line: int | None",
+            "Print @ expression: Expr @ line: int | None",
+            "Return @ keyword: Token, value: Expr | None @ line: int | None",
+            "Var @ name: Token, initializer: Expr @ slot: int | None, line: int | None",
+            "While @ condition: Expr, body: Stmnt @ line: int | None",
         ],
         additional_imports=["from pylox.Expr import Expr, Variable\n"],
     )
@@ -0,0 +1,1097 @@
+"""
+The tree walking interpreter: runtime objects, the Resolver pass and the
+Interpreter itself. __main__ wires these up behind the click commands.
+"""
+
+from __future__ import annotations
+import typing
+import enum
+import logging
+
+import pylox.tokens as tokens
+import pylox.error_handling as errors
+import pylox.lox_scanner as scan
+import pylox.Expr as Expr
+import pylox.Stmnt as stmnt
+import pylox.natives as natives
+from pylox.output import Output, format_number
+
+LOGGER: typing.Final[logging.Logger] = logging.getLogger(__name__)
+
+
+class GlobalEnvironment:
+    """
+    Holds global variable declarations. Globals are looked up by name at
+    runtime because they can be declared after the code that uses them.
+    """
+
+    values: dict[str, object]
+
+    def __init__(self):
+        self.values = {}
+
+    def define(self, name: str, value: object):
+        self.values[name] = value
+
+    def get_variable(self, name: tokens.Token):
+        if name.lexeme in self.values:
+            return self.values[name.lexeme]
+
+        raise errors.LoxRuntimeError(name, msg=f"Undefined variable '{name.lexeme}'")
+
+    def assign(self, name: tokens.Token, value: object):
+        if name.lexeme in self.values:
+            self.values[name.lexeme] = value
+            return
+
+        raise errors.LoxRuntimeError(name, f"Undefined variable {name.lexeme}.")
+
+
+class Environment:
+    """
+    Holds local variable declarations. The Resolver gives every local a slot in
+    its scope, so values is a fixed size list indexed by that slot instead of a
+    dict keyed by name.
+    """
+
+    __slots__ = ("values", "enclosing")
+
+    values: list[object]
+    enclosing: Environment | GlobalEnvironment | None
+
+    def __init__(
+        self, enclosing: Environment | GlobalEnvironment | None = None, size: int = 0
+    ):
+        self.enclosing = enclosing
+        self.values = [None] * size
+
+    def get_at(self, distance: int, slot: int):
+        return self.ancestor(distance).values[slot]
+
+    def ancestor(self, distance: int) -> Environment:
+        environment = self
+        for _ in range(distance):
+            environment = environment.enclosing
+
+        return environment
+
+    def assign_at(self, distance: int, slot: int, value: object):
+        self.ancestor(distance).values[slot] = value
+
+
+class Completion:
+    """
+    Result of a statement that ended with `return`. Statements that complete
+    normally return None, a Completion is handed back up through blocks, ifs
+    and loops to LoxFunction.call instead of raising an exception.
+    """
+
+    __slots__ = ("value",)
+
+    value: object
+
+    def __init__(self, value: object) -> None:
+        self.value = value
+
+
+@typing.runtime_checkable
+class LoxCallable(typing.Protocol):
+    # I guess you have to take self?
+    def call(
+        self, interpreter: Interpreter, arguments: list[object]
+    ) -> None | object: ...
+    def arity(self) -> int: ...
+
+
+class LoxClass(LoxCallable):
+    """
+    Classes can't change once they are declared, so the methods a class
+    inherits are merged with its own into method_table when the class is
+    created and the initializer is looked up once. Method lookups, `super`
+    lookups and construction never walk the superclass chain.
+    """
+
+    name: str
+    methods: dict[str, LoxFunction]
+    superclass: LoxClass
+    # own methods merged over the inherited ones
+    method_table: dict[str, LoxFunction]
+    initializer: LoxFunction | None
+    initializer_arity: int
+    # shape of a freshly created instance, with no fields
+    shape: Shape
+
+    def __init__(
+        self, name, methods: dict[str, LoxFunction], superclass: LoxClass
+    ) -> None:
+        self.name = name
+        self.methods = methods
+        self.superclass = superclass
+        self.method_table = methods
+        if superclass is not None:
+            self.method_table = superclass.method_table | methods
+        self.initializer = self.method_table.get("init")
+        self.initializer_arity = 0
+        if self.initializer is not None:
+            self.initializer_arity = self.initializer.arity()
+        self.shape = Shape(self, {})
+
+    def __repr__(self) -> str:
+        return self.name
+
+    def find_method(self, name: str) -> LoxFunction | None:
+        return self.method_table.get(name)
+
+    def call(self, interpreter: Interpreter, arguments: list[object]) -> None | object:
+        instance = LoxInstance(self)
+
+        if self.initializer is not None:
+            self.initializer.invoke(interpreter, instance, arguments)
+        return instance
+
+    def arity(self) -> int:
+        return self.initializer_arity
+
+
+class Shape:
+    """
+    Hidden class shared by every instance of a class that had the same fields
+    added in the same order. slots maps a field name to its index in
+    LoxInstance.values, adding a new field moves the instance along a cached
+    transition to the next shape.
+    """
+
+    __slots__ = ("klass", "slots", "transitions")
+
+    klass: LoxClass
+    slots: dict[str, int]
+    transitions: dict[str, Shape]
+
+    def __init__(self, klass: LoxClass, slots: dict[str, int]) -> None:
+        self.klass = klass
+        self.slots = slots
+        self.transitions = {}
+
+    def with_field(self, name: str) -> Shape:
+        shape = self.transitions.get(name)
+        if shape is None:
+            shape = Shape(self.klass, {**self.slots, name: len(self.slots)})
+            self.transitions[name] = shape
+        return shape
+
+
+class LoxInstance:
+    __slots__ = ("shape", "values")
+
+    shape: Shape
+    values: list[object]
+
+    def __init__(self, klass: LoxClass):
+        self.shape = klass.shape
+        self.values = []
+
+    @property
+    def klass(self) -> LoxClass:
+        return self.shape.klass
+
+    @property
+    def fields(self) -> dict[str, object]:
+        return {name: self.values[slot] for name, slot in self.shape.slots.items()}
+
+    def __repr__(self):
+        return self.klass.name + " instance"
+
+    def get(self, name: tokens.Token):
+        slot = self.shape.slots.get(name.lexeme)
+        if slot is not None:
+            return self.values[slot]
+
+        method = self.klass.find_method(name.lexeme)
+        if method is not None:
+            return method.bind(self)
+
+        raise errors.LoxRuntimeError(name, f"Undefined property {name.lexeme}.")
+
+    def set(self, name: tokens.Token, value: object):
+        slot = self.shape.slots.get(name.lexeme)
+        if slot is not None:
+            self.values[slot] = value
+            return
+
+        self.shape = self.shape.with_field(name.lexeme)
+        self.values.append(value)
+
+
+# how many shapes a property access remembers before it gives up caching
+POLYMORPHIC_LIMIT: typing.Final[int] = 4
+
+
+class PropertyCache:
+    """
+    Inline cache kept on an Expr.Get or Expr.Set node. Each entry remembers
+    what the access resolved to for one shape: a field slot, or for Get a
+    method, or for a Set that adds a field the shape it transitions to. A site
+    that only sees one shape is monomorphic and hits on the first entry, up to
+    POLYMORPHIC_LIMIT shapes are cached and past that the site is megamorphic
+    and new shapes are looked up without being cached.
+    """
+
+    __slots__ = ("entries",)
+
+    entries: list[tuple[Shape, int | None, typing.Any]]
+
+    def __init__(self) -> None:
+        self.entries = []
+
+    def lookup(
+        self, instance: LoxInstance, name: tokens.Token
+    ) -> tuple[Shape, int | None, LoxFunction | None]:
+        """
+        Returns the (shape, slot, method) entry for the instance's shape: slot
+        is set for fields and method, still unbound, for methods.
+        """
+        shape = instance.shape
+        for entry in self.entries:
+            if entry[0] is shape:
+                return entry
+
+        slot = shape.slots.get(name.lexeme)
+        method = None
+        if slot is None:
+            method = shape.klass.find_method(name.lexeme)
+            if method is None:
+                raise errors.LoxRuntimeError(name, f"Undefined property {name.lexeme}.")
+        entry = (shape, slot, method)
+        if len(self.entries) < POLYMORPHIC_LIMIT:
+            self.entries.append(entry)
+        return entry
+
+    def get(self, instance: LoxInstance, name: tokens.Token) -> object:
+        _, slot, method = self.lookup(instance, name)
+        if slot is not None:
+            return instance.values[slot]
+        return typing.cast(LoxFunction, method).bind(instance)
+
+    def set(self, instance: LoxInstance, name: tokens.Token, value: object):
+        shape = instance.shape
+        for cached, slot, transition in self.entries:
+            if cached is shape:
+                if transition is None:
+                    instance.values[slot] = value
+                else:
+                    instance.shape = transition
+                    instance.values.append(value)
+                return
+
+        if len(self.entries) == POLYMORPHIC_LIMIT:
+            instance.set(name, value)
+            return
+
+        slot = shape.slots.get(name.lexeme)
+        transition = None
+        if slot is None:
+            slot = len(shape.slots)
+            transition = shape.with_field(name.lexeme)
+        self.entries.append((shape, slot, transition))
+        self.set(instance, name, value)
+
+
+class LoxFunction(LoxCallable):
+    """
+    A function or method. Methods are stored unbound on their LoxClass and
+    called through invoke with the receiver, bind only allocates a bound
+    LoxFunction when a method is used as a value.
+    """
+
+    declaration: stmnt.Function
+    closure: Environment | GlobalEnvironment
+    is_initializer: bool
+    # the receiver of a bound method, None for functions and unbound methods
+    this: LoxInstance | None
+
+    def __init__(
+        self,
+        declaration: stmnt.Function,
+        closure: Environment | GlobalEnvironment,
+        is_initializer: bool,
+        this: LoxInstance | None = None,
+    ):
+        self.declaration = declaration
+        self.closure = closure
+        self.is_initializer = is_initializer
+        self.this = this
+
+    def bind(self, instance: LoxInstance):
+        return type(self)(
+            self.declaration, self.closure, self.is_initializer, instance
+        )
+
+    def call(self, interpreter: Interpreter, arguments: list[object]) -> None | object:
+        return self.invoke(interpreter, self.this, arguments)
+
+    def invoke(
+        self,
+        interpreter: Interpreter,
+        this: LoxInstance | None,
+        arguments: list[object],
+    ) -> None | object:
+        """
+        Runs the function with this in slot 0 when it is a method, the
+        parameters take the slots after it.
+        """
+        environment = Environment(self.closure, self.declaration.slot_count)
+        if this is None:
+            environment.values[: len(arguments)] = arguments
+        else:
+            environment.values[0] = this
+            environment.values[1 : len(arguments) + 1] = arguments
+
+        completion = interpreter.execute_block(self.declaration.body, environment)
+
+        if self.is_initializer:
+            return this
+
+        if completion is not None:
+            return completion.value
+
+    def arity(self) -> int:
+        return len(self.declaration.params)
+
+    def __repr__(self) -> str:
+        return f"<fn {self.declaration.name.lexeme} >"
+
+
+class FunctionType(enum.Enum):
+    NONE = 1
+    FUNCTION = 2
+    METHOD = 3
+    INITIALIZER = 4
+
+
+class ClassType(enum.Enum):
+    NONE = 1
+    CLASS = 2
+    SUBCLASS = 3
+
+
+class Resolver(Expr.Visitor[None], stmnt.Visitor[None]):
+    """
+    Static pass that runs before the program. Every local variable access gets
+    the (depth, slot) of the variable it refers to recorded on its node: depth
+    is how many environments up the variable lives and slot is its index in
+    that environment. Declarations record the slot they write to and scopes
+    record how many slots they need.
+    """
+
+    scopes: list[dict[str, bool]]
+    slots: list[dict[str, int]]
+    current_function: FunctionType
+    current_class: ClassType
+
+    def __init__(self):
+        self.scopes = []
+        self.slots = []
+        self.current_function = FunctionType.NONE
+        self.current_class = ClassType.NONE
+
+    def visit_ThisExpr(self, expr: Expr.This) -> None:
+        if self.current_class == ClassType.NONE:
+            errors.error_from_token(
+                expr.keyword, "Can't use 'this' outside of a class."
+            )
+            return None
+        self.resolve_local(expr, expr.keyword)
+
+    def visit_SuperExpr(self, expr: Expr.Super) -> None:
+        if self.current_class == ClassType.NONE:
+            errors.error_from_token(
+                expr.keyword, "Can't use 'super' outside of a class"
+            )
+        elif self.current_class is not ClassType.SUBCLASS:
+            errors.error_from_token(
+                expr.keyword, "Can't use 'super' in a class with no superclass"
+            )
+        self.resolve_local(expr, expr.keyword)
+
+    def visit_SetExpr(self, expr: Expr.Set) -> None:
+        self.resolve_expr(expr.value)
+        self.resolve_expr(expr.obj)
+
+    def visit_GetExpr(self, expr: Expr.Get) -> None:
+        self.resolve_expr(expr.obj)
+
+    def visit_ClassStmnt(self, stmnt: stmnt.Class) -> None:
+        enclosing_class = self.current_class
+        self.current_class = ClassType.CLASS
+        stmnt.slot = self.declare(stmnt.name)
+        self.define(stmnt.name)
+
+        if (
+            stmnt.superclass is not None
+            and stmnt.name.lexeme == stmnt.superclass.name.lexeme
+        ):
+            errors.error_from_token(
+                stmnt.superclass.name, "A class can't inherit from itself."
+            )
+
+        if stmnt.superclass is not None:
+            self.current_class = ClassType.SUBCLASS
+            self.resolve_expr(stmnt.superclass)
+
+        if stmnt.superclass is not None:
+            self.begin_scope()
+            self.define_implicit("super")
+
+        for method in stmnt.methods:
+            declaration = FunctionType.METHOD
+            if method.name.lexeme == "init":
+                declaration = FunctionType.INITIALIZER
+            self.resolve_function(method, declaration)
+
+        if stmnt.superclass is not None:
+            self.end_scope()
+        self.current_class = enclosing_class
+        return None
+
+    def visit_ExpressionStmnt(self, stmnt: stmnt.Expression) -> None:
+        self.resolve_expr(stmnt.expression)
+
+    def visit_IfStmnt(self, stmnt: stmnt.If) -> None:
+        self.resolve_expr(stmnt.condition)
+        self.resolve_stmnt(stmnt.then_branch)
+        if stmnt.else_branch is not None:
+            self.resolve_stmnt(stmnt.else_branch)
+
+    def visit_PrintStmnt(self, stmnt: stmnt.Print) -> None:
+        self.resolve_expr(stmnt.expression)
+
+    def visit_ReturnStmnt(self, stmnt: stmnt.Return) -> None:
+        if self.current_function == FunctionType.NONE:
+            errors.error_from_token(stmnt.keyword, "Can't return from top-level code.")
+
+        if stmnt.value is not None:
+            if self.current_function == FunctionType.INITIALIZER:
+                errors.error_from_token(
+                    stmnt.keyword, "Can't return a value from an initializer."
+                )
+            self.resolve_expr(stmnt.value)
+
+    def visit_WhileStmnt(self, stmnt: stmnt.While) -> None:
+        self.resolve_expr(stmnt.condition)
+        self.resolve_stmnt(stmnt.body)
+
+    def visit_BinaryExpr(self, expr: Expr.Binary) -> None:
+        self.resolve_expr(expr.left)
+        self.resolve_expr(expr.right)
+
+    def visit_CallExpr(self, expr: Expr.Call) -> None:
+        self.resolve_expr(expr.callee)
+
+        for argument in expr.arguments:
+            self.resolve_expr(argument)
+
+    def visit_GroupingExpr(self, expr: Expr.Grouping) -> None:
+        self.resolve_expr(expr.expression)
+
+    def visit_LiteralExpr(self, expr: Expr.Literal) -> None:
+        return None
+
+    def visit_LogicalExpr(self, expr: Expr.Logical) -> None:
+        self.resolve_expr(expr.left)
+        self.resolve_expr(expr.right)
+
+    def visit_UnaryExpr(self, expr: Expr.Unary) -> None:
+        self.resolve_expr(expr.right)
+
+    def visit_VariableExpr(self, expr: Expr.Variable) -> None:
+        if not len(self.scopes) == 0 and self.scopes[-1].get(expr.name.lexeme) == False:
+            errors.error_from_token(
+                expr.name, "Can't read local variable in its own initializer."
+            )
+
+        self.resolve_local(expr, expr.name)
+
+    def visit_FunctionStmnt(self, stmnt: stmnt.Function) -> None:
+        stmnt.slot = self.declare(stmnt.name)
+        self.define(stmnt.name)
+
+        self.resolve_function(stmnt, FunctionType.FUNCTION)
+        return None
+
+    def resolve_function(self, function: stmnt.Function, function_type: FunctionType):
+        enclosing_function = self.current_function
+        self.current_function = function_type
+        self.begin_scope()
+        if function_type in (FunctionType.METHOD, FunctionType.INITIALIZER):
+            # methods get "this" in slot 0 of their own scope, ahead of the
+            # parameters, so calling one doesn't need an extra environment
+            self.define_implicit("this")
+        for param in function.params:
+            self.declare(param)
+            self.define(param)
+
+        self.resolve(function.body)
+
+        function.slot_count = self.end_scope()
+        self.current_function = enclosing_function
+
+    def visit_AssignExpr(self, expr: Expr.Assign) -> None:
+        self.resolve_expr(expr.value)
+        self.resolve_local(expr, expr.name)
+
+    def resolve_local(
+        self,
+        expr: Expr.Variable | Expr.Assign | Expr.This | Expr.Super,
+        name: tokens.Token,
+    ):
+        for i in range(len(self.scopes) - 1, -1, -1):
+            if name.lexeme in self.scopes[i]:
+                expr.depth = len(self.scopes) - 1 - i
+                expr.slot = self.slots[i][name.lexeme]
+                return
+
+    def declare(self, name: tokens.Token) -> int | None:
+        """
+        Returns the slot the variable gets in the current scope, or None for
+        globals.
+        """
+        if len(self.scopes) == 0:
+            return None
+
+        scope = self.scopes[-1]
+        slots = self.slots[-1]
+        if name.lexeme in scope:
+            errors.error_from_token(
+                name, "Already a variable with this name in this scope."
+            )
+            return slots[name.lexeme]
+        scope[name.lexeme] = False
+        slots[name.lexeme] = len(slots)
+        return slots[name.lexeme]
+
+    def define_implicit(self, name: str):
+        """
+        Binds "this" and "super", which are never declared in the source.
+        """
+        self.scopes[-1][name] = True
+        self.slots[-1][name] = len(self.slots[-1])
+
+    def define(self, name: tokens.Token):
+        if len(self.scopes) == 0:
+            return
+
+        self.scopes[-1][name.lexeme] = True
+
+    def visit_VarStmnt(self, stmnt: stmnt.Var) -> None:
+        stmnt.slot = self.declare(stmnt.name)
+        if stmnt.initializer is not None:
+            self.resolve_expr(stmnt.initializer)
+
+        self.define(stmnt.name)
+        return None
+
+    def visit_BlockStmnt(self, stmnt: stmnt.Block) -> None:
+        self.begin_scope()
+        self.resolve(stmnt.statements)
+        stmnt.slot_count = self.end_scope()
+        return None
+
+    def resolve(self, statements: list[stmnt.Stmnt]):
+        for statement in statements:
+            self.resolve_stmnt(statement)
+
+    def resolve_stmnt(self, statement: stmnt.Stmnt):
+        statement.accept(self)
+
+    def resolve_expr(self, expr: Expr.Expr):
+        expr.accept(self)
+
+    def begin_scope(self):
+        self.scopes.append({})
+        self.slots.append({})
+
+    def end_scope(self) -> int:
+        """
+        Returns how many slots the scope needs at runtime.
+        """
+        self.scopes.pop()
+        return len(self.slots.pop())
+
+
+def is_addition(expr: Expr.Expr) -> bool:
+    return type(expr) is Expr.Binary and expr.operator.token_type is scan.TokenType.PLUS
+
+
+class Interpreter(Expr.Visitor[object], stmnt.Visitor[Completion | None]):
+    output: Output
+    lox_globals: GlobalEnvironment
+    environment: Environment | GlobalEnvironment
+    # what declarations create, tracing.TracingInterpreter swaps in subclasses
+    # that report calls so this class never checks for a tracer
+    lox_function: typing.ClassVar[type[LoxFunction]] = LoxFunction
+    lox_class: typing.ClassVar[type[LoxClass]] = LoxClass
+
+    def __init__(self, output: Output | None = None):
+        self.output = output if output is not None else Output()
+        self.lox_globals = GlobalEnvironment()
+        self.environment = self.lox_globals
+        # clock, Array, Map, ...
+        for name, native in natives.native_globals(self.stringify).items():
+            self.lox_globals.define(name, native)
+
+    # Statements
+
+    def visit_ClassStmnt(self, stmnt: stmnt.Class) -> None:
+        superclass = None
+        if stmnt.superclass is not None:
+            superclass = self.evaluate(stmnt.superclass)
+            if not isinstance(superclass, LoxClass):
+                raise errors.LoxRuntimeError(
+                    stmnt.superclass.name, "Superclass must be a class"
+                )
+
+        self.define(stmnt.name, stmnt.slot, None)
+
+        if stmnt.superclass is not None:
+            self.environment = Environment(self.environment, 1)
+            self.environment.values[0] = superclass
+
+        methods = {}
+
+        for method in stmnt.methods:
+            function = self.lox_function(
+                method, self.environment, method.name.lexeme == "init"
+            )
+            methods[method.name.lexeme] = function
+
+        klass = self.lox_class(
+            stmnt.name.lexeme, methods, typing.cast(LoxClass, superclass)
+        )
+
+        if superclass is not None:
+            self.environment = self.environment.enclosing
+
+        self.define(stmnt.name, stmnt.slot, klass)
+
+    def visit_ReturnStmnt(self, stmnt: stmnt.Return) -> Completion:
+        value = None
+        if stmnt.value is not None:
+            value = self.evaluate(stmnt.value)
+
+        return Completion(value)
+
+    def visit_FunctionStmnt(self, stmnt: stmnt.Function) -> None:
+        function = self.lox_function(stmnt, self.environment, False)
+        self.define(stmnt.name, stmnt.slot, function)
+        return None
+
+    def visit_WhileStmnt(self, stmnt: stmnt.While) -> Completion | None:
+        while self.is_truthy(self.evaluate(stmnt.condition)):
+            completion = self.execute(stmnt.body)
+            if completion is not None:
+                return completion
+
+        return None
+
+    def visit_BlockStmnt(self, stmnt: stmnt.Block) -> Completion | None:
+        return self.execute_block(
+            stmnt.statements, Environment(self.environment, stmnt.slot_count)
+        )
+
+    def execute_block(
+        self, statements: list[stmnt.Stmnt], environment: Environment
+    ) -> Completion | None:
+        previous = self.environment
+        try:
+            self.environment = environment
+            for statement in statements:
+                completion = self.execute(statement)
+                if completion is not None:
+                    return completion
+            return None
+        finally:
+            self.environment = previous
+
+    def visit_VarStmnt(self, stmnt: stmnt.Var) -> None:
+        value: object | None = None
+        if stmnt.initializer != None:
+            value = self.evaluate(stmnt.initializer)
+
+        self.define(stmnt.name, stmnt.slot, value)
+
+    def define(self, name: tokens.Token, slot: int | None, value: object):
+        """
+        Binds a declaration in the current environment: by slot for locals and
+        by name for globals.
+        """
+        if slot is None:
+            self.lox_globals.define(name.lexeme, value)
+        else:
+            self.environment.values[slot] = value
+
+    def visit_ExpressionStmnt(self, stmnt: stmnt.Expression) -> None:
+        self.evaluate(stmnt.expression)
+
+    def visit_PrintStmnt(self, stmnt: stmnt.Print) -> None:
+        value = self.evaluate(stmnt.expression)
+        self.output.write_line(self.stringify(value))
+
+    def visit_IfStmnt(self, stmnt: stmnt.If) -> Completion | None:
+        if self.is_truthy(self.evaluate(stmnt.condition)):
+            return self.execute(stmnt.then_branch)
+        elif stmnt.else_branch is not None:
+            return self.execute(stmnt.else_branch)
+        return None
+
+    # Expressions
+
+    def visit_SuperExpr(self, expr: Expr.Super) -> object:
+        method, obj = self.find_super_method(expr)
+        return method.bind(obj)
+
+    def find_super_method(self, expr: Expr.Super) -> tuple[LoxFunction, LoxInstance]:
+        """
+        Returns the unbound superclass method and the "this" to call it with.
+        """
+        distance = expr.depth
+        superclass = typing.cast(LoxClass, self.environment.get_at(distance, expr.slot))
+
+        # the method scope just inside "super" keeps "this" in slot 0
+        obj = typing.cast(LoxInstance, self.environment.get_at(distance - 1, 0))
+
+        method = superclass.find_method(expr.method.lexeme)
+
+        if method is None:
+            raise errors.LoxRuntimeError(
+                expr.method, f"Undefined property {expr.method.lexeme}."
+            )
+
+        return method, obj
+
+    def visit_ThisExpr(self, expr: Expr.This) -> object:
+        return self.lookup_variable(expr.keyword, expr)
+
+    def visit_SetExpr(self, expr: Expr.Set) -> object:
+        obj = self.evaluate(expr.obj)
+
+        if not isinstance(obj, LoxInstance):
+            raise errors.LoxRuntimeError(expr.name, "Only instance have fields.")
+
+        value = self.evaluate(expr.value)
+        cache = expr.cache
+        if cache is None:
+            cache = expr.cache = PropertyCache()
+        cache.set(obj, expr.name, value)
+        return value
+
+    def visit_GetExpr(self, expr: Expr.Get) -> object:
+        obj = self.evaluate(expr.obj)
+        if isinstance(obj, LoxInstance):
+            cache = expr.cache
+            if cache is None:
+                cache = expr.cache = PropertyCache()
+            return cache.get(obj, expr.name)
+        if isinstance(obj, natives.NativeInstance):
+            return self.native_method(obj, expr.name).bind(obj)
+        raise errors.LoxRuntimeError(expr.name, "Only instances have properties.")
+
+    def native_method(
+        self, obj: natives.NativeInstance, name: tokens.Token
+    ) -> natives.NativeMethod:
+        method = obj.methods.get(name.lexeme)
+        if method is None:
+            raise errors.LoxRuntimeError(name, f"Undefined property {name.lexeme}.")
+        return method
+
+    def find_method(
+        self, expr: Expr.Get
+    ) -> tuple[object, LoxInstance | natives.NativeInstance | None]:
+        """
+        Evaluates the callee of `obj.name(...)`. Methods come back unbound
+        along with the instance to call them on, fields come back with None.
+        """
+        obj = self.evaluate(expr.obj)
+        if not isinstance(obj, LoxInstance):
+            if isinstance(obj, natives.NativeInstance):
+                return self.native_method(obj, expr.name), obj
+            raise errors.LoxRuntimeError(expr.name, "Only instances have properties.")
+
+        cache = expr.cache
+        if cache is None:
+            cache = expr.cache = PropertyCache()
+        _, slot, method = cache.lookup(obj, expr.name)
+        if slot is not None:
+            return obj.values[slot], None
+        return method, obj
+
+    def visit_CallExpr(self, expr: Expr.Call) -> object:
+        # method calls pass the receiver straight to LoxFunction.invoke, a
+        # bound method is only allocated when a method is used as a value
+        this = None
+        if isinstance(expr.callee, Expr.Get):
+            callee, this = self.find_method(expr.callee)
+        elif isinstance(expr.callee, Expr.Super):
+            callee, this = self.find_super_method(expr.callee)
+        else:
+            callee = self.evaluate(expr.callee)
+
+        arguments = []
+        for arg in expr.arguments:
+            arguments.append(self.evaluate(arg))
+
+        function = callee
+
+        if this is not None:
+            method = typing.cast(LoxFunction, function)
+            if len(arguments) != method.arity():
+                raise errors.LoxRuntimeError(
+                    expr.paren,
+                    f"Expected {method.arity()} arguments but got {len(arguments)}.",
+                )
+            try:
+                return method.invoke(self, this, arguments)
+            except natives.NativeError as e:
+                raise errors.LoxRuntimeError(expr.paren, str(e)) from None
+
+        # TODO: I think this might break when running. Make sure it works.
+        if not isinstance(function, LoxCallable):
+            raise errors.LoxRuntimeError(
+                expr.paren, "can only call functions and classes."
+            )
+
+        if len(arguments) != function.arity():
+            raise errors.LoxRuntimeError(
+                expr.paren,
+                f"Expected {function.arity()} arguments but got {len(arguments)}.",
+            )
+
+        try:
+            return function.call(self, arguments)
+        except natives.NativeError as e:
+            raise errors.LoxRuntimeError(expr.paren, str(e)) from None
+
+    def visit_LogicalExpr(self, expr: Expr.Logical) -> object:
+        left = self.evaluate(expr.left)
+
+        if expr.operator.token_type == tokens.TokenType.OR:
+            if self.is_truthy(left):
+                return left
+        else:
+            if not self.is_truthy(left):
+                return left
+
+        return self.evaluate(expr.right)
+
+    def visit_VariableExpr(self, expr: Expr.Variable) -> object:
+        return self.lookup_variable(expr.name, expr)
+
+    def lookup_variable(self, name: tokens.Token, expr: Expr.Variable | Expr.This):
+        distance = expr.depth
+        if distance is not None:
+            return self.environment.get_at(distance, expr.slot)
+        else:
+            return self.lox_globals.get_variable(name)
+
+    def visit_AssignExpr(self, expr: Expr.Assign) -> object:
+        value = self.evaluate(expr.value)
+        distance = expr.depth
+        if distance is not None:
+            self.environment.assign_at(distance, expr.slot, value)
+        else:
+            self.lox_globals.assign(expr.name, value)
+        return value
+
+    def visit_LiteralExpr(self, expr: Expr.Literal) -> object:
+        return expr.value
+
+    def visit_GroupingExpr(self, expr: Expr.Grouping) -> object:
+        return self.evaluate(expr.expression)
+
+    def visit_UnaryExpr(self, expr: Expr.Unary) -> object:
+        right = self.evaluate(expr.right)
+
+        match expr.operator.token_type:
+            case scan.TokenType.MINUS:
+                self.check_number_operand(expr.operator, right)
+                return -float(right)
+            case scan.TokenType.BANG:
+                return not self.is_truthy(right)
+            case _:
+                return None  # unreachable?
+
+    def visit_BinaryExpr(self, expr: Expr.Binary) -> object:
+        if expr.operator.token_type is scan.TokenType.PLUS and is_addition(expr.left):
+            return self.add_chain(expr)
+        left = self.evaluate(expr.left)
+        right = self.evaluate(expr.right)
+
+        match expr.operator.token_type:
+            case scan.TokenType.MINUS:
+                if not (isinstance(left, float) and isinstance(right, float)):
+                    return self.vector_arithmetic(expr.operator, left, right)
+                return float(left) - float(right)
+            case scan.TokenType.SLASH:
+                if not (isinstance(left, float) and isinstance(right, float)):
+                    return self.vector_arithmetic(expr.operator, left, right)
+                return float(left) / float(right)
+            case scan.TokenType.STAR:
+                if not (isinstance(left, float) and isinstance(right, float)):
+                    return self.vector_arithmetic(expr.operator, left, right)
+                return float(left) * float(right)
+            case scan.TokenType.PLUS:
+                if isinstance(left, float) and isinstance(right, float):
+                    return float(left) + float(right)
+                if isinstance(left, str) and isinstance(right, str):
+                    return (
+                        str(left) + str(right)
+                    )  # I don't need to technically do this they are already the correct type\
+                return self.vector_arithmetic(
+                    expr.operator,
+                    left,
+                    right,
+                    "Operatnds must be two numbers or two strings",
+                )
+            case scan.TokenType.GREATER:
+                self.check_number_operands(expr.operator, left, right)
+                return float(left) > float(right)
+            case scan.TokenType.GREATER_EQUAL:
+                self.check_number_operands(expr.operator, left, right)
+                return float(left) >= float(right)
+            case scan.TokenType.LESS:
+                self.check_number_operands(expr.operator, left, right)
+                return float(left) < float(right)
+            case scan.TokenType.LESS_EQUAL:
+                self.check_number_operands(expr.operator, left, right)
+                return float(left) <= float(right)
+            case scan.TokenType.BANG_EQUAL:
+                return not self.is_equal(left, right)
+            case scan.TokenType.EQUAL_EQUAL:
+                return self.is_equal(left, right)
+            case _:
+                return None  # should never happen
+
+    def add_chain(self, expr: Expr.Binary) -> object:
+        """
+        Evaluates a left nested chain of additions, `a + b + c + d`, in one
+        go. Strings are joined once at the end instead of copying every
+        intermediate result. Operands are evaluated and checked in the same
+        order the nested additions would evaluate them.
+        """
+        additions = []
+        operand: Expr.Expr = expr
+        while is_addition(operand):
+            addition = typing.cast(Expr.Binary, operand)
+            additions.append(addition)
+            operand = addition.left
+
+        total = self.evaluate(operand)
+        # the strings added so far, once total is a string
+        parts: list[str] | None = None
+        for addition in reversed(additions):
+            right = self.evaluate(addition.right)
+            if parts is not None:
+                if isinstance(right, str):
+                    parts.append(right)
+                    continue
+            elif isinstance(total, float) and isinstance(right, float):
+                total = total + right
+                continue
+            elif isinstance(total, str) and isinstance(right, str):
+                parts = [total, right]
+                continue
+            else:
+                total = self.vector_arithmetic(
+                    addition.operator,
+                    total,
+                    right,
+                    "Operatnds must be two numbers or two strings",
+                )
+                continue
+            raise errors.LoxRuntimeError(
+                addition.operator, "Operatnds must be two numbers or two strings"
+            )
+
+        if parts is not None:
+            return "".join(parts)
+        return total
+
+    def execute(self, statement: stmnt.Stmnt) -> Completion | None:
+        """
+        Executes an Stmnt for side effects. Returns a Completion when the
+        statement hit a `return`.
+        """
+        return statement.accept(self)
+
+    def evaluate(self, expr: Expr.Expr):
+        """
+        Evaluates an Expr and returns it's value
+        """
+        return expr.accept(self)
+
+    def is_truthy(self, obj: object):
+        if obj == None:
+            return False
+        if isinstance(obj, bool):
+            return bool(obj)
+        return True
+
+    def is_equal(self, a: object, b: object) -> bool:
+        if a == None and b == None:
+            return True
+        if a == None:
+            return False
+
+        return a == b
+
+    def stringify(self, obj: object):
+        if obj == None:
+            return "nil"
+
+        if isinstance(obj, float):
+            return format_number(obj)
+
+        if isinstance(obj, natives.NativeInstance):
+            return obj.text(self.stringify)
+
+        return str(obj)
+
+    def check_number_operand(self, operator: scan.Token, operand: object):
+        if isinstance(operand, float):
+            return
+        raise errors.LoxRuntimeError(operator, "Operand must be a number.")
+
+    def vector_arithmetic(
+        self,
+        operator: scan.Token,
+        left: object,
+        right: object,
+        message: str = "Operands must be numbers.",
+    ) -> object:
+        """
+        The slow path of + - * /, operands that aren't two numbers (or two
+        strings) are only valid when one of them is a Vec.
+        """
+        try:
+            result = natives.vector_arithmetic(operator.lexeme, left, right)
+        except natives.NativeError as e:
+            raise errors.LoxRuntimeError(operator, str(e)) from None
+        if result is None:
+            raise errors.LoxRuntimeError(operator, message)
+        return result
+
+    def check_number_operands(self, operator: scan.Token, left: object, right: object):
+        if isinstance(left, float) and isinstance(right, float):
+            return
+
+        raise errors.LoxRuntimeError(operator, "Operands must be numbers.")
+
+    def interpret(self, statements: list[stmnt.Stmnt]) -> None:
+        try:
+            for statement in statements:
+                self.execute(statement)
+        except errors.LoxRuntimeError as e:
+            # what was printed before the error comes first
+            self.output.flush()
+            errors.runtime_error(e)
+        finally:
+            self.output.flush()
@@ -0,0 +1,617 @@
+"""
+Compiles a resolved Lox AST into bytecode for the stack vm in lox_vm.py.
+
+The design follows clox: every function gets its own Chunk, locals live in
+stack slots relative to the frame, and variables captured by closures are
+reached through upvalues.
+"""
+
+from __future__ import annotations
+import enum
+import typing
+import logging
+
+import pylox.Expr as Expr
+import pylox.Stmnt as stmnt
+from pylox.tokens import Token, TokenType
+
+LOGGER: typing.Final[logging.Logger] = logging.getLogger(__name__)
+
+
+class OpCode(enum.IntEnum):
+    CONSTANT = 0  # const_index
+    NIL = 1
+    TRUE = 2
+    FALSE = 3
+    POP = 4
+    GET_LOCAL = 5  # slot
+    SET_LOCAL = 6  # slot
+    GET_GLOBAL = 7  # const_index (name)
+    DEFINE_GLOBAL = 8  # const_index (name)
+    SET_GLOBAL = 9  # const_index (name)
+    GET_UPVALUE = 10  # upvalue_index
+    SET_UPVALUE = 11  # upvalue_index
+    GET_PROPERTY = 12  # const_index (name)
+    SET_PROPERTY = 13  # const_index (name)
+    GET_SUPER = 14  # const_index (name)
+    EQUAL = 15
+    NOT_EQUAL = 16
+    GREATER = 17
+    GREATER_EQUAL = 18
+    LESS = 19
+    LESS_EQUAL = 20
+    ADD = 21
+    SUBTRACT = 22
+    MULTIPLY = 23
+    DIVIDE = 24
+    NOT = 25
+    NEGATE = 26
+    PRINT = 27
+    JUMP = 28  # offset
+    JUMP_IF_FALSE = 29  # offset
+    LOOP = 30  # offset
+    CALL = 31  # arg_count
+    INVOKE = 32  # const_index (name), arg_count
+    SUPER_INVOKE = 33  # const_index (name), arg_count
+    CLOSURE = 34  # const_index (function), then (is_local, index) per upvalue
+    CLOSE_UPVALUE = 35
+    RETURN = 36
+    CLASS = 37  # const_index (name)
+    INHERIT = 38
+    METHOD = 39  # const_index (name)
+
+
+# number of operands that follow each opcode in the code list. CLOSURE is
+# variable length and handled separately by the disassembler.
+OPERAND_COUNTS: typing.Final[dict[OpCode, int]] = {
+    OpCode.CONSTANT: 1,
+    OpCode.GET_LOCAL: 1,
+    OpCode.SET_LOCAL: 1,
+    OpCode.GET_GLOBAL: 1,
+    OpCode.DEFINE_GLOBAL: 1,
+    OpCode.SET_GLOBAL: 1,
+    OpCode.GET_UPVALUE: 1,
+    OpCode.SET_UPVALUE: 1,
+    OpCode.GET_PROPERTY: 1,
+    OpCode.SET_PROPERTY: 1,
+    OpCode.GET_SUPER: 1,
+    OpCode.JUMP: 1,
+    OpCode.JUMP_IF_FALSE: 1,
+    OpCode.LOOP: 1,
+    OpCode.CALL: 1,
+    OpCode.INVOKE: 2,
+    OpCode.SUPER_INVOKE: 2,
+    OpCode.CLOSURE: 1,
+    OpCode.CLASS: 1,
+    OpCode.METHOD: 1,
+}
+
+
+class Chunk:
+    """
+    A flat list of opcodes and their operands. lines runs parallel to code so
+    runtime errors can be reported against the Lox source line.
+    """
+
+    code: list[int]
+    lines: list[int]
+    constants: list[object]
+    constant_index: dict[tuple[type, object], int]
+
+    def __init__(self) -> None:
+        self.code = []
+        self.lines = []
+        self.constants = []
+        self.constant_index = {}
+
+    def write(self, value: int, line: int):
+        self.code.append(value)
+        self.lines.append(line)
+
+    def add_constant(self, value: object) -> int:
+        # names and literals are interned so a loop that mentions the same
+        # variable a hundred times still only has one constant for it
+        if isinstance(value, (str, float)):
+            key = (type(value), value)
+            index = self.constant_index.get(key)
+            if index is None:
+                index = self.constant_index[key] = len(self.constants)
+                self.constants.append(value)
+            return index
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+
+class FunctionProto:
+    """
+    The compiled form of a Lox function. Closures created at runtime share it.
+    """
+
+    name: str
+    arity: int
+    upvalue_count: int
+    chunk: Chunk
+
+    def __init__(self, name: str, arity: int = 0) -> None:
+        self.name = name
+        self.arity = arity
+        self.upvalue_count = 0
+        self.chunk = Chunk()
+
+    def __repr__(self) -> str:
+        if self.name == "":
+            return "<script>"
+        return f"<fn {self.name} >"
+
+
+class FunctionKind(enum.Enum):
+    SCRIPT = 1
+    FUNCTION = 2
+    METHOD = 3
+    INITIALIZER = 4
+
+
+class Local:
+    name: str
+    depth: int
+    is_captured: bool
+
+    def __init__(self, name: str, depth: int) -> None:
+        self.name = name
+        self.depth = depth
+        self.is_captured = False
+
+
+class FunctionState:
+    """
+    Book keeping for the function currently being compiled. Nested function
+    declarations push a new FunctionState whose enclosing is the outer one.
+    """
+
+    enclosing: FunctionState | None
+    function: FunctionProto
+    kind: FunctionKind
+    locals: list[Local]
+    upvalues: list[tuple[bool, int]]
+    scope_depth: int
+
+    def __init__(
+        self,
+        enclosing: FunctionState | None,
+        function: FunctionProto,
+        kind: FunctionKind,
+    ) -> None:
+        self.enclosing = enclosing
+        self.function = function
+        self.kind = kind
+        self.upvalues = []
+        self.scope_depth = 0
+        # slot zero holds the callee, or the receiver for methods
+        slot_zero = (
+            "this" if kind in (FunctionKind.METHOD, FunctionKind.INITIALIZER) else ""
+        )
+        self.locals = [Local(slot_zero, 0)]
+
+    def resolve_local(self, name: str) -> int:
+        for index in range(len(self.locals) - 1, -1, -1):
+            if self.locals[index].name == name:
+                return index
+        return -1
+
+    def add_upvalue(self, is_local: bool, index: int) -> int:
+        for upvalue_index, upvalue in enumerate(self.upvalues):
+            if upvalue == (is_local, index):
+                return upvalue_index
+        self.upvalues.append((is_local, index))
+        self.function.upvalue_count = len(self.upvalues)
+        return len(self.upvalues) - 1
+
+    def resolve_upvalue(self, name: str) -> int:
+        if self.enclosing is None:
+            return -1
+
+        local = self.enclosing.resolve_local(name)
+        if local != -1:
+            self.enclosing.locals[local].is_captured = True
+            return self.add_upvalue(True, local)
+
+        upvalue = self.enclosing.resolve_upvalue(name)
+        if upvalue != -1:
+            return self.add_upvalue(False, upvalue)
+
+        return -1
+
+
+BINARY_OPS: typing.Final[dict[TokenType, OpCode]] = {
+    TokenType.PLUS: OpCode.ADD,
+    TokenType.MINUS: OpCode.SUBTRACT,
+    TokenType.STAR: OpCode.MULTIPLY,
+    TokenType.SLASH: OpCode.DIVIDE,
+    TokenType.GREATER: OpCode.GREATER,
+    TokenType.GREATER_EQUAL: OpCode.GREATER_EQUAL,
+    TokenType.LESS: OpCode.LESS,
+    TokenType.LESS_EQUAL: OpCode.LESS_EQUAL,
+    TokenType.EQUAL_EQUAL: OpCode.EQUAL,
+    TokenType.BANG_EQUAL: OpCode.NOT_EQUAL,
+}
+
+
+class Compiler(Expr.Visitor[None], stmnt.Visitor[None]):
+    """
+    Walks an AST that already went through the Resolver, so static errors
+    (returning from top level, reading a local in its own initializer...) are
+    assumed to have been reported.
+    """
+
+    state: FunctionState
+    line: int
+
+    def __init__(self) -> None:
+        self.state = FunctionState(None, FunctionProto(""), FunctionKind.SCRIPT)
+        self.line = 0
+
+    def compile(self, statements: list[stmnt.Stmnt]) -> FunctionProto:
+        for statement in statements:
+            self.compile_stmnt(statement)
+        self.emit_return()
+        return self.state.function
+
+    # helpers
+
+    @property
+    def chunk(self) -> Chunk:
+        return self.state.function.chunk
+
+    def mark(self, token: Token):
+        self.line = token.line
+
+    def emit(self, *values: int):
+        for value in values:
+            self.chunk.write(int(value), self.line)
+
+    def emit_constant(self, value: object):
+        self.emit(OpCode.CONSTANT, self.chunk.add_constant(value))
+
+    def emit_jump(self, op: OpCode) -> int:
+        self.emit(op, 0)
+        return len(self.chunk.code) - 1
+
+    def patch_jump(self, operand_index: int):
+        self.chunk.code[operand_index] = len(self.chunk.code) - operand_index - 1
+
+    def emit_loop(self, loop_start: int):
+        # the offset is read after the operand has been consumed
+        self.emit(OpCode.LOOP, 0)
+        self.chunk.code[-1] = len(self.chunk.code) - loop_start
+
+    def emit_return(self):
+        if self.state.kind == FunctionKind.INITIALIZER:
+            self.emit(OpCode.GET_LOCAL, 0)
+        else:
+            self.emit(OpCode.NIL)
+        self.emit(OpCode.RETURN)
+
+    def name_constant(self, name: str) -> int:
+        return self.chunk.add_constant(name)
+
+    def compile_stmnt(self, statement: stmnt.Stmnt):
+        statement.accept(self)
+
+    def compile_expr(self, expr: Expr.Expr):
+        expr.accept(self)
+
+    def begin_scope(self):
+        self.state.scope_depth += 1
+
+    def end_scope(self):
+        state = self.state
+        state.scope_depth -= 1
+        while state.locals and state.locals[-1].depth > state.scope_depth:
+            if state.locals[-1].is_captured:
+                self.emit(OpCode.CLOSE_UPVALUE)
+            else:
+                self.emit(OpCode.POP)
+            state.locals.pop()
+
+    def add_local(self, name: str):
+        self.state.locals.append(Local(name, self.state.scope_depth))
+
+    def define_variable(self, name: Token):
+        """
+        The value to bind is on top of the stack. Locals simply stay where they
+        are, globals are moved into the globals table.
+        """
+        if self.state.scope_depth > 0:
+            self.add_local(name.lexeme)
+            return
+        self.mark(name)
+        self.emit(OpCode.DEFINE_GLOBAL, self.name_constant(name.lexeme))
+
+    def named_variable(self, name: str, assign: Expr.Expr | None = None):
+        slot = self.state.resolve_local(name)
+        if slot != -1:
+            get_op, set_op, operand = OpCode.GET_LOCAL, OpCode.SET_LOCAL, slot
+        else:
+            upvalue = self.state.resolve_upvalue(name)
+            if upvalue != -1:
+                get_op, set_op, operand = (
+                    OpCode.GET_UPVALUE,
+                    OpCode.SET_UPVALUE,
+                    upvalue,
+                )
+            else:
+                get_op, set_op = OpCode.GET_GLOBAL, OpCode.SET_GLOBAL
+                operand = self.name_constant(name)
+
+        if assign is not None:
+            line = self.line
+            self.compile_expr(assign)
+            self.line = line
+            self.emit(set_op, operand)
+        else:
+            self.emit(get_op, operand)
+
+    def function(self, declaration: stmnt.Function, kind: FunctionKind):
+        proto = FunctionProto(declaration.name.lexeme, len(declaration.params))
+        self.state = FunctionState(self.state, proto, kind)
+        self.begin_scope()
+        for param in declaration.params:
+            self.add_local(param.lexeme)
+        for statement in declaration.body:
+            self.compile_stmnt(statement)
+        self.emit_return()
+
+        state = self.state
+        self.state = typing.cast(FunctionState, state.enclosing)
+        self.mark(declaration.name)
+        self.emit(OpCode.CLOSURE, self.chunk.add_constant(proto))
+        for is_local, index in state.upvalues:
+            self.emit(1 if is_local else 0, index)
+
+    # Statements
+
+    def visit_BlockStmnt(self, stmnt: stmnt.Block) -> None:
+        self.begin_scope()
+        for statement in stmnt.statements:
+            self.compile_stmnt(statement)
+        self.end_scope()
+
+    def visit_ClassStmnt(self, stmnt: stmnt.Class) -> None:
+        self.mark(stmnt.name)
+        name_index = self.name_constant(stmnt.name.lexeme)
+        self.emit(OpCode.CLASS, name_index)
+        self.define_variable(stmnt.name)
+
+        if stmnt.superclass is not None:
+            self.mark(stmnt.superclass.name)
+            self.named_variable(stmnt.superclass.name.lexeme)
+            self.begin_scope()
+            self.add_local("super")
+            self.named_variable(stmnt.name.lexeme)
+            self.mark(stmnt.superclass.name)
+            self.emit(OpCode.INHERIT)
+
+        self.named_variable(stmnt.name.lexeme)
+        for method in stmnt.methods:
+            kind = FunctionKind.METHOD
+            if method.name.lexeme == "init":
+                kind = FunctionKind.INITIALIZER
+            self.function(method, kind)
+            self.emit(OpCode.METHOD, self.name_constant(method.name.lexeme))
+        self.emit(OpCode.POP)
+
+        if stmnt.superclass is not None:
+            self.end_scope()
+
+    def visit_ExpressionStmnt(self, stmnt: stmnt.Expression) -> None:
+        self.compile_expr(stmnt.expression)
+        self.emit(OpCode.POP)
+
+    def visit_FunctionStmnt(self, stmnt: stmnt.Function) -> None:
+        # locals are declared first so the function can refer to itself
+        if self.state.scope_depth > 0:
+            self.add_local(stmnt.name.lexeme)
+            self.function(stmnt, FunctionKind.FUNCTION)
+            return
+        self.function(stmnt, FunctionKind.FUNCTION)
+        self.define_variable(stmnt.name)
+
+    def visit_IfStmnt(self, stmnt: stmnt.If) -> None:
+        self.compile_expr(stmnt.condition)
+        then_jump = self.emit_jump(OpCode.JUMP_IF_FALSE)
+        self.emit(OpCode.POP)
+        self.compile_stmnt(stmnt.then_branch)
+        else_jump = self.emit_jump(OpCode.JUMP)
+        self.patch_jump(then_jump)
+        self.emit(OpCode.POP)
+        if stmnt.else_branch is not None:
+            self.compile_stmnt(stmnt.else_branch)
+        self.patch_jump(else_jump)
+
+    def visit_PrintStmnt(self, stmnt: stmnt.Print) -> None:
+        self.compile_expr(stmnt.expression)
+        self.emit(OpCode.PRINT)
+
+    def visit_ReturnStmnt(self, stmnt: stmnt.Return) -> None:
+        self.mark(stmnt.keyword)
+        if stmnt.value is None:
+            self.emit_return()
+            return
+        self.compile_expr(stmnt.value)
+        self.emit(OpCode.RETURN)
+
+    def visit_VarStmnt(self, stmnt: stmnt.Var) -> None:
+        if stmnt.initializer is not None:
+            self.compile_expr(stmnt.initializer)
+        else:
+            self.emit(OpCode.NIL)
+        self.define_variable(stmnt.name)
+
+    def visit_WhileStmnt(self, stmnt: stmnt.While) -> None:
+        loop_start = len(self.chunk.code)
+        self.compile_expr(stmnt.condition)
+        exit_jump = self.emit_jump(OpCode.JUMP_IF_FALSE)
+        self.emit(OpCode.POP)
+        self.compile_stmnt(stmnt.body)
+        self.emit_loop(loop_start)
+        self.patch_jump(exit_jump)
+        self.emit(OpCode.POP)
+
+    # Expressions
+
+    def visit_AssignExpr(self, expr: Expr.Assign) -> None:
+        self.mark(expr.name)
+        self.named_variable(expr.name.lexeme, assign=expr.value)
+
+    def visit_BinaryExpr(self, expr: Expr.Binary) -> None:
+        self.compile_expr(expr.left)
+        self.compile_expr(expr.right)
+        self.mark(expr.operator)
+        self.emit(BINARY_OPS[expr.operator.token_type])
+
+    def visit_CallExpr(self, expr: Expr.Call) -> None:
+        callee = expr.callee
+        if isinstance(callee, Expr.Get):
+            # obj.method(args) skips creating a bound method
+            self.compile_expr(callee.obj)
+            for argument in expr.arguments:
+                self.compile_expr(argument)
+            self.mark(callee.name)
+            self.emit(
+                OpCode.INVOKE,
+                self.name_constant(callee.name.lexeme),
+                len(expr.arguments),
+            )
+            return
+
+        if isinstance(callee, Expr.Super):
+            self.mark(callee.keyword)
+            self.named_variable("this")
+            for argument in expr.arguments:
+                self.compile_expr(argument)
+            self.mark(callee.keyword)
+            self.named_variable("super")
+            self.mark(callee.method)
+            self.emit(
+                OpCode.SUPER_INVOKE,
+                self.name_constant(callee.method.lexeme),
+                len(expr.arguments),
+            )
+            return
+
+        self.compile_expr(callee)
+        for argument in expr.arguments:
+            self.compile_expr(argument)
+        self.mark(expr.paren)
+        self.emit(OpCode.CALL, len(expr.arguments))
+
+    def visit_GetExpr(self, expr: Expr.Get) -> None:
+        self.compile_expr(expr.obj)
+        self.mark(expr.name)
+        self.emit(OpCode.GET_PROPERTY, self.name_constant(expr.name.lexeme))
+
+    def visit_GroupingExpr(self, expr: Expr.Grouping) -> None:
+        self.compile_expr(expr.expression)
+
+    def visit_LiteralExpr(self, expr: Expr.Literal) -> None:
+        match expr.value:
+            case None:
+                self.emit(OpCode.NIL)
+            case True:
+                self.emit(OpCode.TRUE)
+            case False:
+                self.emit(OpCode.FALSE)
+            case _:
+                self.emit_constant(expr.value)
+
+    def visit_LogicalExpr(self, expr: Expr.Logical) -> None:
+        self.compile_expr(expr.left)
+        if expr.operator.token_type == TokenType.AND:
+            end_jump = self.emit_jump(OpCode.JUMP_IF_FALSE)
+            self.emit(OpCode.POP)
+            self.compile_expr(expr.right)
+            self.patch_jump(end_jump)
+            return
+
+        else_jump = self.emit_jump(OpCode.JUMP_IF_FALSE)
+        end_jump = self.emit_jump(OpCode.JUMP)
+        self.patch_jump(else_jump)
+        self.emit(OpCode.POP)
+        self.compile_expr(expr.right)
+        self.patch_jump(end_jump)
+
+    def visit_SetExpr(self, expr: Expr.Set) -> None:
+        self.compile_expr(expr.obj)
+        self.compile_expr(expr.value)
+        self.mark(expr.name)
+        self.emit(OpCode.SET_PROPERTY, self.name_constant(expr.name.lexeme))
+
+    def visit_SuperExpr(self, expr: Expr.Super) -> None:
+        self.mark(expr.keyword)
+        self.named_variable("this")
+        self.named_variable("super")
+        self.mark(expr.method)
+        self.emit(OpCode.GET_SUPER, self.name_constant(expr.method.lexeme))
+
+    def visit_ThisExpr(self, expr: Expr.This) -> None:
+        self.mark(expr.keyword)
+        self.named_variable("this")
+
+    def visit_UnaryExpr(self, expr: Expr.Unary) -> None:
+        self.compile_expr(expr.right)
+        self.mark(expr.operator)
+        if expr.operator.token_type == TokenType.MINUS:
+            self.emit(OpCode.NEGATE)
+        else:
+            self.emit(OpCode.NOT)
+
+    def visit_VariableExpr(self, expr: Expr.Variable) -> None:
+        self.mark(expr.name)
+        self.named_variable(expr.name.lexeme)
+
+
+def compile_program(statements: list[stmnt.Stmnt]) -> FunctionProto:
+    return Compiler().compile(statements)
+
+
+def disassemble(function: FunctionProto) -> str:
+    """
+    Human readable listing of a function and every function nested in it.
+    Handy when debugging the compiler: LOG_LEVEL=DEBUG prints it before running.
+    """
+    out = [f"== {function} =="]
+    chunk = function.chunk
+    nested = []
+    offset = 0
+    while offset < len(chunk.code):
+        op = OpCode(chunk.code[offset])
+        line = chunk.lines[offset]
+        operand_count = OPERAND_COUNTS.get(op, 0)
+        operands = chunk.code[offset + 1 : offset + 1 + operand_count]
+        text = f"{offset:04d} {line:4d} {op.name:<16} {' '.join(map(str, operands))}"
+        if op in (
+            OpCode.CONSTANT,
+            OpCode.GET_GLOBAL,
+            OpCode.DEFINE_GLOBAL,
+            OpCode.SET_GLOBAL,
+            OpCode.GET_PROPERTY,
+            OpCode.SET_PROPERTY,
+            OpCode.GET_SUPER,
+            OpCode.INVOKE,
+            OpCode.SUPER_INVOKE,
+            OpCode.CLOSURE,
+            OpCode.CLASS,
+            OpCode.METHOD,
+        ):
+            text += f" ({chunk.constants[operands[0]]!r})"
+        out.append(text)
+        offset += 1 + operand_count
+
+        if op == OpCode.CLOSURE:
+            proto = typing.cast(FunctionProto, chunk.constants[operands[0]])
+            nested.append(proto)
+            offset += 2 * proto.upvalue_count
+
+    for proto in nested:
+        out.append(disassemble(proto))
+    return "\n".join(out)
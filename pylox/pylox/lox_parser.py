@@ -1,4 +1,6 @@
 from __future__ import annotations
+import enum
+import typing
 import pylox.lox_scanner as lox_scanner
 import pylox.Expr as Expr
 import pylox.error_handling as errors
@@ -16,12 +18,21 @@ class ParseError(Exception):
 
 
 class Parser:
-    tokens: list[lox_scanner.Token]
-    current: int
-
-    def __init__(self, tokens: list[lox_scanner.Token], current: int = 0) -> None:
-        self.tokens = tokens
-        self.current = current
+    """
+    Pulls tokens from any iterable, Lox only ever needs one token of
+    lookahead so just the current and the previous token are kept. Fed by
+    RegexScanner.iter_tokens the token list is never built.
+    """
+
+    tokens: typing.Iterator[lox_scanner.Token]
+    current: lox_scanner.Token
+    previous_token: lox_scanner.Token | None
+
+    def __init__(self, tokens: typing.Iterable[lox_scanner.Token]) -> None:
+        self.tokens = iter(tokens)
+        # every token stream ends with EOF, which is never advanced past
+        self.current = next(self.tokens)
+        self.previous_token = None
 
     def parse(self) -> list[stmnt.Stmnt]:
         statements = []
@@ -30,16 +41,22 @@ class Parser:
         return statements
 
     def declaration(self) -> stmnt.Stmnt | None:
+        line = self.peek().line
         try:
             if self.match(TokenType.VAR):
-                return self.var_declaration()
-            if self.match(TokenType.CLASS):
-                return self.class_declaration()
-            if self.match(TokenType.FUN):
-                return self.function("function")
-            return self.statement()
+                declaration = self.var_declaration()
+            elif self.match(TokenType.CLASS):
+                declaration = self.class_declaration()
+            elif self.match(TokenType.FUN):
+                declaration = self.function("function")
+            else:
+                return self.statement()
         except ParseError:
             self.synchronize()
+            return None
+
+        declaration.line = line
+        return declaration
 
     def class_declaration(self):
         name = self.consume(TokenType.IDENTIFIER, "Expect class name.")
@@ -78,7 +95,10 @@ class Parser:
 
         self.consume(TokenType.LEFT_BRACE, "Expect ')' after parameters.")
         body = self.block()
-        return stmnt.Function(name, parameters, body)
+        function = stmnt.Function(name, parameters, body)
+        # methods never go through declaration()
+        function.line = name.line
+        return function
 
     def var_declaration(self):
         name = self.consume(TokenType.IDENTIFIER, "Expect variable name.")
@@ -92,6 +112,16 @@ class Parser:
         return stmnt.Var(name, initializer)
 
     def statement(self) -> stmnt.Stmnt:
+        """
+        Every statement remembers the line it starts on, which is what
+        profiles and traces report it under.
+        """
+        line = self.peek().line
+        statement = self.statement_node()
+        statement.line = line
+        return statement
+
+    def statement_node(self) -> stmnt.Stmnt:
         if self.match(TokenType.FOR):
             return self.for_statement()
         if self.match(TokenType.IF):
@@ -117,6 +147,7 @@ class Parser:
         return stmnt.Return(keyword, value)
 
     def for_statement(self):
+        line = self.previous().line
         self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'if'")
 
         initializer = None
@@ -141,11 +172,15 @@ class Parser:
 
         body = self.statement()
         if increment is not None:
-            body = stmnt.Block([body, stmnt.Expression(increment)])
+            increment_statement = stmnt.Expression(increment)
+            increment_statement.line = line
+            body = stmnt.Block([body, increment_statement])
+            body.line = line
 
         if condition is None:
             condition = Expr.Literal(True)
         body = stmnt.While(condition, body)
+        body.line = line
 
         if initializer is not None:
             body = stmnt.Block([initializer, body])
@@ -345,7 +380,6 @@ class Parser:
 
         if self.match(lox_scanner.TokenType.LEFT_PAREN):
             expr = self.expression()
-            LOGGER.debug(f"current: {self.peek()}")
             self.consume(
                 lox_scanner.TokenType.RIGHT_PAREN, "Expect ')' after expression."
             )
@@ -408,15 +442,157 @@ class Parser:
 
     def advance(self):
         if not self.is_at_end():
-            self.current += 1
+            self.previous_token = self.current
+            self.current = next(self.tokens)
 
         return self.previous()
 
     def is_at_end(self) -> bool:
-        return self.peek().token_type == lox_scanner.TokenType.EOF
+        return self.current.token_type == lox_scanner.TokenType.EOF
 
     def peek(self) -> lox_scanner.Token:
-        return self.tokens[self.current]
+        return self.current
 
     def previous(self) -> lox_scanner.Token:
-        return self.tokens[self.current - 1]
+        return typing.cast(lox_scanner.Token, self.previous_token)
+
+
+class Precedence(enum.IntEnum):
+    NONE = 0
+    ASSIGNMENT = 1  # =
+    OR = 2  # or
+    AND = 3  # and
+    EQUALITY = 4  # == !=
+    COMPARISON = 5  # < > <= >=
+    TERM = 6  # + -
+    FACTOR = 7  # * /
+    UNARY = 8  # ! -
+    CALL = 9  # . ()
+
+
+class PrattParser(Parser):
+    """
+    Parses statements like Parser but expressions with a precedence climbing
+    loop driven by PREFIX_RULES and INFIX_RULES. The AST and the errors are the
+    same, an expression just costs a couple of Python calls per operand instead
+    of one per level of the assignment -> ... -> primary chain.
+    """
+
+    def expression(self) -> Expr.Expr:
+        return self.parse_precedence(Precedence.ASSIGNMENT)
+
+    def parse_precedence(self, precedence: int) -> Expr.Expr:
+        """
+        Parses an expression made of operators that bind at least as tightly
+        as precedence.
+        """
+        token = self.current
+        prefix = PREFIX_RULES.get(token.token_type)
+        if prefix is None:
+            raise self.error(token, "Expect expression.")
+        self.advance()
+        expr = prefix(self, token)
+
+        while True:
+            token = self.current
+            infix = INFIX_RULES.get(token.token_type)
+            if infix is None or infix[1] < precedence:
+                return expr
+            self.advance()
+            expr = infix[0](self, expr, token)
+
+    # prefix rules, called with the token just consumed
+
+    def literal(self, token: lox_scanner.Token) -> Expr.Expr:
+        match token.token_type:
+            case TokenType.FALSE:
+                return Expr.Literal(False)
+            case TokenType.TRUE:
+                return Expr.Literal(True)
+            case TokenType.NIL:
+                return Expr.Literal(None)
+        return Expr.Literal(token.literal)
+
+    def variable(self, token: lox_scanner.Token) -> Expr.Expr:
+        return Expr.Variable(token)
+
+    def this(self, token: lox_scanner.Token) -> Expr.Expr:
+        return Expr.This(token)
+
+    def super_(self, token: lox_scanner.Token) -> Expr.Expr:
+        self.consume(TokenType.DOT, "Expect '.' after 'super'.")
+        method = self.consume(TokenType.IDENTIFIER, "Expect superclass method name.")
+        return Expr.Super(token, method)
+
+    def grouping(self, token: lox_scanner.Token) -> Expr.Expr:
+        expr = self.expression()
+        self.consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
+        return Expr.Grouping(expr)
+
+    def unary_(self, token: lox_scanner.Token) -> Expr.Expr:
+        return Expr.Unary(token, self.parse_precedence(Precedence.UNARY))
+
+    # infix rules, called with the left operand and the operator just consumed
+
+    def binary(self, left: Expr.Expr, operator: lox_scanner.Token) -> Expr.Expr:
+        precedence = INFIX_RULES[operator.token_type][1]
+        return Expr.Binary(left, operator, self.parse_precedence(precedence + 1))
+
+    def logical(self, left: Expr.Expr, operator: lox_scanner.Token) -> Expr.Expr:
+        precedence = INFIX_RULES[operator.token_type][1]
+        return Expr.Logical(left, operator, self.parse_precedence(precedence + 1))
+
+    def assign(self, target: Expr.Expr, equals: lox_scanner.Token) -> Expr.Expr:
+        # right associative: a = b = c assigns b = c first
+        value = self.parse_precedence(Precedence.ASSIGNMENT)
+
+        if isinstance(target, Expr.Variable):
+            return Expr.Assign(target.name, value)
+        elif isinstance(target, Expr.Get):
+            return Expr.Set(target.obj, target.name, value)
+
+        errors.error_from_token(equals, "Invalid assignment target.")
+        return target
+
+    def call_(self, callee: Expr.Expr, paren: lox_scanner.Token) -> Expr.Expr:
+        return self.finish_call(callee)
+
+    def get(self, obj: Expr.Expr, dot: lox_scanner.Token) -> Expr.Expr:
+        name = self.consume(TokenType.IDENTIFIER, "Expect property name after '.'.")
+        return Expr.Get(obj, name)
+
+
+type PrefixRule = typing.Callable[[PrattParser, lox_scanner.Token], Expr.Expr]
+type InfixRule = typing.Callable[[PrattParser, Expr.Expr, lox_scanner.Token], Expr.Expr]
+
+PREFIX_RULES: typing.Final[dict[TokenType, PrefixRule]] = {
+    TokenType.FALSE: PrattParser.literal,
+    TokenType.TRUE: PrattParser.literal,
+    TokenType.NIL: PrattParser.literal,
+    TokenType.NUMBER: PrattParser.literal,
+    TokenType.STRING: PrattParser.literal,
+    TokenType.IDENTIFIER: PrattParser.variable,
+    TokenType.THIS: PrattParser.this,
+    TokenType.SUPER: PrattParser.super_,
+    TokenType.LEFT_PAREN: PrattParser.grouping,
+    TokenType.BANG: PrattParser.unary_,
+    TokenType.MINUS: PrattParser.unary_,
+}
+
+INFIX_RULES: typing.Final[dict[TokenType, tuple[InfixRule, Precedence]]] = {
+    TokenType.EQUAL: (PrattParser.assign, Precedence.ASSIGNMENT),
+    TokenType.OR: (PrattParser.logical, Precedence.OR),
+    TokenType.AND: (PrattParser.logical, Precedence.AND),
+    TokenType.BANG_EQUAL: (PrattParser.binary, Precedence.EQUALITY),
+    TokenType.EQUAL_EQUAL: (PrattParser.binary, Precedence.EQUALITY),
+    TokenType.GREATER: (PrattParser.binary, Precedence.COMPARISON),
+    TokenType.GREATER_EQUAL: (PrattParser.binary, Precedence.COMPARISON),
+    TokenType.LESS: (PrattParser.binary, Precedence.COMPARISON),
+    TokenType.LESS_EQUAL: (PrattParser.binary, Precedence.COMPARISON),
+    TokenType.MINUS: (PrattParser.binary, Precedence.TERM),
+    TokenType.PLUS: (PrattParser.binary, Precedence.TERM),
+    TokenType.SLASH: (PrattParser.binary, Precedence.FACTOR),
+    TokenType.STAR: (PrattParser.binary, Precedence.FACTOR),
+    TokenType.LEFT_PAREN: (PrattParser.call_, Precedence.CALL),
+    TokenType.DOT: (PrattParser.get, Precedence.CALL),
+}
@@ -1,4 +1,6 @@
 from __future__ import annotations
+import mmap
+import re
 import typing
 import pylox.error_handling as errors
 from pylox.tokens import Token, TokenType
@@ -106,7 +108,7 @@ class Scanner:
                 self.add_token(TokenType.STAR)
             case "!":
                 self.add_token(
-                    TokenType.BANG_EQUAL if self.match("=") else TokenType.STAR
+                    TokenType.BANG_EQUAL if self.match("=") else TokenType.BANG
                 )
             case "=":
                 self.add_token(
@@ -200,3 +202,128 @@ class Scanner:
 
         self.tokens.append(Token(TokenType.EOF, "", None, self.line))
         return self.tokens
+
+
+# every match is one token, along with the whitespace and comment before it so
+# those don't cost a trip around the loop of their own. The alternatives are
+# tried in order, two character operators come before their one character
+# prefixes. Groups are read by number: see the *_GROUP constants below.
+TOKEN_REGEX: typing.Final[str] = r"""
+    [ \r\t]*(?://[^\n]*)?(?:
+      (\n)
+    | ([0-9]+(?:\.[0-9]+)?)
+    | ([A-Za-z_][A-Za-z0-9_]*)
+    | ([!=<>]=|[(){},.\-+;*!=<>/])
+    | ("[^"]*")
+    | ("[^"]*)
+    | (\Z)
+    | (.)
+    )
+    """
+TOKEN_PATTERN: typing.Final[re.Pattern[str]] = re.compile(
+    TOKEN_REGEX, re.VERBOSE | re.DOTALL
+)
+# the same pattern over UTF-8 bytes, an unexpected character is a whole
+# multibyte sequence so it is reported once like it is for str
+BYTES_TOKEN_PATTERN: typing.Final[re.Pattern[bytes]] = re.compile(
+    TOKEN_REGEX.replace("| (.)", r"| ([\xc0-\xff][\x80-\xbf]*|.)").encode(),
+    re.VERBOSE | re.DOTALL,
+)
+
+(
+    NEWLINE_GROUP,
+    NUMBER_GROUP,
+    IDENTIFIER_GROUP,
+    OPERATOR_GROUP,
+    STRING_GROUP,
+    UNTERMINATED_GROUP,
+    END_GROUP,
+    ERROR_GROUP,
+) = range(1, 9)
+
+OPERATORS: typing.Final[dict[str, TokenType]] = {
+    "(": TokenType.LEFT_PAREN,
+    ")": TokenType.RIGHT_PAREN,
+    "{": TokenType.LEFT_BRACE,
+    "}": TokenType.RIGHT_BRACE,
+    ",": TokenType.COMMA,
+    ".": TokenType.DOT,
+    "-": TokenType.MINUS,
+    "+": TokenType.PLUS,
+    ";": TokenType.SEMICOLON,
+    "*": TokenType.STAR,
+    "/": TokenType.SLASH,
+    "!": TokenType.BANG,
+    "!=": TokenType.BANG_EQUAL,
+    "=": TokenType.EQUAL,
+    "==": TokenType.EQUAL_EQUAL,
+    "<": TokenType.LESS,
+    "<=": TokenType.LESS_EQUAL,
+    ">": TokenType.GREATER,
+    ">=": TokenType.GREATER_EQUAL,
+}
+
+
+class RegexScanner(Scanner):
+    """
+    Produces exactly the tokens and errors Scanner does, but matches whole
+    lexemes with TOKEN_PATTERN instead of stepping through the source one
+    character at a time.
+
+    The source can also be UTF-8 bytes or an mmap of a file. iter_tokens then
+    decodes one lexeme at a time, so neither the file's text nor the token
+    list has to be held in memory.
+    """
+
+    source: str | bytes | mmap.mmap
+
+    def scan_tokens(self) -> list[Token]:
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+
+    def iter_tokens(self) -> typing.Iterator[Token]:
+        source = self.source
+        if isinstance(source, str):
+            pattern: re.Pattern = TOKEN_PATTERN
+            decode = None
+        else:
+            pattern = BYTES_TOKEN_PATTERN
+            decode = bytes.decode
+
+        keywords = self.keywords
+        line = self.line
+        # enum members are slow to look up and needed for every token
+        IDENTIFIER = TokenType.IDENTIFIER
+        NUMBER = TokenType.NUMBER
+        STRING = TokenType.STRING
+
+        for match in pattern.finditer(source, self.current):
+            group = match.lastindex
+            if group == NEWLINE_GROUP:
+                line += 1
+                continue
+            if group == END_GROUP:
+                continue
+
+            text = match[group]
+            if decode is not None:
+                text = decode(text)
+
+            if group == IDENTIFIER_GROUP:
+                yield Token(keywords.get(text, IDENTIFIER), text, None, line)
+            elif group == OPERATOR_GROUP:
+                yield Token(OPERATORS[text], text, None, line)
+            elif group == NUMBER_GROUP:
+                yield Token(NUMBER, text, float(text), line)
+            elif group == STRING_GROUP:
+                line += text.count("\n")
+                yield Token(STRING, text, text[1:-1], line)
+            elif group == UNTERMINATED_GROUP:
+                line += text.count("\n")
+                errors.error(line, "Unterminated string.")
+            else:
+                errors.error(line, "Unexpected character.")
+
+        self.current = len(source)
+        self.line = line
+        yield Token(TokenType.EOF, "", None, line)
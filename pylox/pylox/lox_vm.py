@@ -0,0 +1,592 @@
+"""
+Stack based virtual machine that executes the bytecode produced by
+lox_compiler.py. It is an alternative to the tree walking Interpreter and is
+selected with `lox run-file --engine=vm`.
+"""
+
+from __future__ import annotations
+import typing
+import logging
+
+import pylox.error_handling as errors
+import pylox.natives as natives
+from pylox.lox_compiler import FunctionProto, OpCode
+from pylox.natives import NativeFunction, NativeInstance
+from pylox.output import Output, format_number
+from pylox.tokens import Token, TokenType
+
+LOGGER: typing.Final[logging.Logger] = logging.getLogger(__name__)
+
+
+class Upvalue:
+    """
+    A variable captured by a closure. While the variable is still on the stack
+    the upvalue points at its slot, once the slot goes away the value is moved
+    into closed.
+    """
+
+    __slots__ = ("location", "closed", "is_open")
+
+    def __init__(self, location: int) -> None:
+        self.location = location
+        self.closed: object = None
+        self.is_open = True
+
+
+class Closure:
+    __slots__ = ("function", "upvalues")
+
+    def __init__(self, function: FunctionProto, upvalues: list[Upvalue]) -> None:
+        self.function = function
+        self.upvalues = upvalues
+
+    def __repr__(self) -> str:
+        return repr(self.function)
+
+
+class VMClass:
+    __slots__ = ("name", "methods")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.methods: dict[str, Closure] = {}
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+class VMInstance:
+    __slots__ = ("klass", "fields")
+
+    def __init__(self, klass: VMClass) -> None:
+        self.klass = klass
+        self.fields: dict[str, object] = {}
+
+    def __repr__(self) -> str:
+        return self.klass.name + " instance"
+
+
+class BoundMethod:
+    __slots__ = ("receiver", "method")
+
+    def __init__(self, receiver: VMInstance, method: Closure) -> None:
+        self.receiver = receiver
+        self.method = method
+
+    def __repr__(self) -> str:
+        return repr(self.method)
+
+
+class CallFrame:
+    __slots__ = ("closure", "ip", "base")
+
+    def __init__(self, closure: Closure, ip: int, base: int) -> None:
+        self.closure = closure
+        self.ip = ip
+        self.base = base
+
+
+def is_truthy(obj: object) -> bool:
+    if obj is None:
+        return False
+    if isinstance(obj, bool):
+        return obj
+    return True
+
+
+def is_equal(a: object, b: object) -> bool:
+    if a is None and b is None:
+        return True
+    if a is None:
+        return False
+    return a == b
+
+
+def stringify(obj: object) -> str:
+    if obj is None:
+        return "nil"
+
+    if isinstance(obj, float):
+        return format_number(obj)
+
+    if isinstance(obj, NativeInstance):
+        return obj.text(stringify)
+
+    return str(obj)
+
+
+class VM:
+    """
+    Runs a compiled script. Lox calls push a CallFrame instead of recursing in
+    Python so the only limit on Lox recursion is memory. A call that is
+    immediately returned replaces the caller's frame instead of growing the
+    stack.
+    """
+
+    stack: list[object]
+    frames: list[CallFrame]
+    lox_globals: dict[str, object]
+    output: Output
+    open_upvalues: dict[int, Upvalue]
+
+    def __init__(self, output: Output | None = None) -> None:
+        self.output = output if output is not None else Output()
+        self.stack = []
+        self.frames = []
+        self.open_upvalues = {}
+        self.lox_globals = natives.native_globals(stringify)
+
+    def interpret(self, function: FunctionProto) -> None:
+        closure = Closure(function, [])
+        self.stack = [closure]
+        self.frames = [CallFrame(closure, 0, 0)]
+        try:
+            self.run()
+        except errors.LoxRuntimeError as e:
+            self.output.flush()
+            errors.runtime_error(e)
+            self.stack = []
+            self.frames = []
+            self.open_upvalues = {}
+        finally:
+            self.output.flush()
+
+    def error(self, frame: CallFrame, message: str) -> errors.LoxRuntimeError:
+        # frame.ip already moved past the instruction that failed
+        line = frame.closure.function.chunk.lines[frame.ip - 1]
+        return errors.LoxRuntimeError(Token(TokenType.EOF, "", None, line), message)
+
+    def capture_upvalue(self, location: int) -> Upvalue:
+        upvalue = self.open_upvalues.get(location)
+        if upvalue is None:
+            upvalue = self.open_upvalues[location] = Upvalue(location)
+        return upvalue
+
+    def close_upvalues(self, last: int):
+        stack = self.stack
+        for location in [loc for loc in self.open_upvalues if loc >= last]:
+            upvalue = self.open_upvalues.pop(location)
+            upvalue.closed = stack[location]
+            upvalue.is_open = False
+
+    def call_value(self, frame: CallFrame, callee: object, arg_count: int) -> bool:
+        """
+        Sets up a call to callee whose arguments are the top arg_count values on
+        the stack. Returns True when a new frame was pushed and False when the
+        call already completed (natives) and left its result on the stack.
+        """
+        stack = self.stack
+        if type(callee) is Closure:
+            self.push_frame(frame, callee, arg_count)
+            return True
+
+        if type(callee) is BoundMethod:
+            stack[-arg_count - 1] = callee.receiver
+            self.push_frame(frame, callee.method, arg_count)
+            return True
+
+        if type(callee) is VMClass:
+            stack[-arg_count - 1] = VMInstance(callee)
+            initializer = callee.methods.get("init")
+            if initializer is not None:
+                self.push_frame(frame, initializer, arg_count)
+                return True
+            if arg_count != 0:
+                raise self.error(frame, f"Expected 0 arguments but got {arg_count}.")
+            return False
+
+        if type(callee) is NativeFunction:
+            if arg_count != callee.argument_count:
+                raise self.error(
+                    frame,
+                    f"Expected {callee.argument_count} arguments but got {arg_count}.",
+                )
+            arguments = stack[len(stack) - arg_count :]
+            try:
+                result = callee.function(*arguments)
+            except natives.NativeError as e:
+                raise self.error(frame, str(e)) from None
+            del stack[len(stack) - arg_count - 1 :]
+            stack.append(result)
+            return False
+
+        raise self.error(frame, "can only call functions and classes.")
+
+    def push_frame(self, frame: CallFrame, closure: Closure, arg_count: int):
+        if arg_count != closure.function.arity:
+            raise self.error(
+                frame,
+                f"Expected {closure.function.arity} arguments but got {arg_count}.",
+            )
+        self.frames.append(CallFrame(closure, 0, len(self.stack) - arg_count - 1))
+
+    def vector_arithmetic(
+        self,
+        frame: CallFrame,
+        symbol: str,
+        left: object,
+        right: object,
+        message: str = "Operands must be numbers.",
+    ) -> object:
+        """
+        The slow path of + - * /, see Interpreter.vector_arithmetic.
+        """
+        try:
+            result = natives.vector_arithmetic(symbol, left, right)
+        except natives.NativeError as e:
+            raise self.error(frame, str(e)) from None
+        if result is None:
+            raise self.error(frame, message)
+        return result
+
+    def invoke_native(
+        self, frame: CallFrame, receiver: NativeInstance, name: str, arg_count: int
+    ) -> bool:
+        """
+        Calls a method of a native object directly, without binding it first.
+        """
+        method = receiver.methods.get(name)
+        if method is None:
+            raise self.error(frame, f"Undefined property {name}.")
+        if arg_count != method.argument_count:
+            raise self.error(
+                frame,
+                f"Expected {method.argument_count} arguments but got {arg_count}.",
+            )
+        stack = self.stack
+        arguments = stack[len(stack) - arg_count :]
+        try:
+            result = method.function(receiver, *arguments)
+        except natives.NativeError as e:
+            raise self.error(frame, str(e)) from None
+        del stack[len(stack) - arg_count - 1 :]
+        stack.append(result)
+        return False
+
+    def invoke_from_class(
+        self, frame: CallFrame, klass: VMClass, name: str, arg_count: int
+    ) -> bool:
+        method = klass.methods.get(name)
+        if method is None:
+            raise self.error(frame, f"Undefined property {name}.")
+        self.push_frame(frame, method, arg_count)
+        return True
+
+    def run(self):
+        # opcodes are compared as plain ints bound to locals, attribute lookups
+        # on the enum would dominate the dispatch loop otherwise
+        CONSTANT = int(OpCode.CONSTANT)
+        NIL = int(OpCode.NIL)
+        TRUE = int(OpCode.TRUE)
+        FALSE = int(OpCode.FALSE)
+        POP = int(OpCode.POP)
+        GET_LOCAL = int(OpCode.GET_LOCAL)
+        SET_LOCAL = int(OpCode.SET_LOCAL)
+        GET_GLOBAL = int(OpCode.GET_GLOBAL)
+        DEFINE_GLOBAL = int(OpCode.DEFINE_GLOBAL)
+        SET_GLOBAL = int(OpCode.SET_GLOBAL)
+        GET_UPVALUE = int(OpCode.GET_UPVALUE)
+        SET_UPVALUE = int(OpCode.SET_UPVALUE)
+        GET_PROPERTY = int(OpCode.GET_PROPERTY)
+        SET_PROPERTY = int(OpCode.SET_PROPERTY)
+        GET_SUPER = int(OpCode.GET_SUPER)
+        EQUAL = int(OpCode.EQUAL)
+        NOT_EQUAL = int(OpCode.NOT_EQUAL)
+        GREATER = int(OpCode.GREATER)
+        GREATER_EQUAL = int(OpCode.GREATER_EQUAL)
+        LESS = int(OpCode.LESS)
+        LESS_EQUAL = int(OpCode.LESS_EQUAL)
+        ADD = int(OpCode.ADD)
+        SUBTRACT = int(OpCode.SUBTRACT)
+        MULTIPLY = int(OpCode.MULTIPLY)
+        DIVIDE = int(OpCode.DIVIDE)
+        NOT = int(OpCode.NOT)
+        NEGATE = int(OpCode.NEGATE)
+        PRINT = int(OpCode.PRINT)
+        JUMP = int(OpCode.JUMP)
+        JUMP_IF_FALSE = int(OpCode.JUMP_IF_FALSE)
+        LOOP = int(OpCode.LOOP)
+        CALL = int(OpCode.CALL)
+        INVOKE = int(OpCode.INVOKE)
+        SUPER_INVOKE = int(OpCode.SUPER_INVOKE)
+        CLOSURE = int(OpCode.CLOSURE)
+        CLOSE_UPVALUE = int(OpCode.CLOSE_UPVALUE)
+        RETURN = int(OpCode.RETURN)
+        CLASS = int(OpCode.CLASS)
+        INHERIT = int(OpCode.INHERIT)
+        METHOD = int(OpCode.METHOD)
+
+        stack = self.stack
+        frames = self.frames
+        lox_globals = self.lox_globals
+        write_line = self.output.write_line
+        push = stack.append
+        pop = stack.pop
+
+        frame = frames[-1]
+        code = frame.closure.function.chunk.code
+        constants = frame.closure.function.chunk.constants
+        upvalues = frame.closure.upvalues
+        base = frame.base
+        ip = frame.ip
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                push(stack[base + code[ip]])
+                ip += 1
+            elif op == CONSTANT:
+                push(constants[code[ip]])
+                ip += 1
+            elif op == POP:
+                pop()
+            elif op == GET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                try:
+                    push(lox_globals[name])
+                except KeyError:
+                    frame.ip = ip
+                    raise self.error(frame, f"Undefined variable '{name}'")
+            elif op == JUMP_IF_FALSE:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip += code[ip]
+                ip += 1
+            elif op == JUMP:
+                ip += code[ip] + 1
+            elif op == LOOP:
+                ip -= code[ip] - 1
+            elif op == SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+            elif op == GET_UPVALUE:
+                upvalue = upvalues[code[ip]]
+                ip += 1
+                push(stack[upvalue.location] if upvalue.is_open else upvalue.closed)
+            elif op == SET_UPVALUE:
+                upvalue = upvalues[code[ip]]
+                ip += 1
+                if upvalue.is_open:
+                    stack[upvalue.location] = stack[-1]
+                else:
+                    upvalue.closed = stack[-1]
+            elif op == ADD:
+                right = pop()
+                left = stack[-1]
+                if (type(left) is float and type(right) is float) or (
+                    type(left) is str and type(right) is str
+                ):
+                    stack[-1] = left + right
+                else:
+                    frame.ip = ip
+                    stack[-1] = self.vector_arithmetic(
+                        frame,
+                        "+",
+                        left,
+                        right,
+                        "Operatnds must be two numbers or two strings",
+                    )
+            elif op == SUBTRACT or op == MULTIPLY or op == DIVIDE:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    symbol = "-" if op == SUBTRACT else "*" if op == MULTIPLY else "/"
+                    stack[-1] = self.vector_arithmetic(frame, symbol, left, right)
+                elif op == SUBTRACT:
+                    stack[-1] = left - right
+                elif op == MULTIPLY:
+                    stack[-1] = left * right
+                else:
+                    stack[-1] = left / right
+            elif op == LESS or op == LESS_EQUAL or op == GREATER or op == GREATER_EQUAL:
+                right = pop()
+                left = stack[-1]
+                if type(left) is not float or type(right) is not float:
+                    frame.ip = ip
+                    raise self.error(frame, "Operands must be numbers.")
+                if op == LESS:
+                    stack[-1] = left < right
+                elif op == LESS_EQUAL:
+                    stack[-1] = left <= right
+                elif op == GREATER:
+                    stack[-1] = left > right
+                else:
+                    stack[-1] = left >= right
+            elif op == EQUAL:
+                right = pop()
+                stack[-1] = is_equal(stack[-1], right)
+            elif op == NOT_EQUAL:
+                right = pop()
+                stack[-1] = not is_equal(stack[-1], right)
+            elif op == CALL or op == INVOKE or op == SUPER_INVOKE:
+                frame.ip = ip + (1 if op == CALL else 2)
+                if op == CALL:
+                    arg_count = code[ip]
+                    pushed = self.call_value(frame, stack[-arg_count - 1], arg_count)
+                elif op == INVOKE:
+                    name = constants[code[ip]]
+                    arg_count = code[ip + 1]
+                    receiver = stack[-arg_count - 1]
+                    if type(receiver) is not VMInstance:
+                        if not isinstance(receiver, NativeInstance):
+                            raise self.error(frame, "Only instances have properties.")
+                        pushed = self.invoke_native(frame, receiver, name, arg_count)
+                    elif name in receiver.fields:
+                        value = receiver.fields[name]
+                        stack[-arg_count - 1] = value
+                        pushed = self.call_value(frame, value, arg_count)
+                    else:
+                        pushed = self.invoke_from_class(
+                            frame, receiver.klass, name, arg_count
+                        )
+                else:
+                    name = constants[code[ip]]
+                    arg_count = code[ip + 1]
+                    superclass = pop()
+                    pushed = self.invoke_from_class(frame, superclass, name, arg_count)
+
+                if pushed:
+                    if code[frame.ip] == RETURN:
+                        # `return f(x);` the callee takes over the caller's
+                        # slots so tail recursion runs in constant space
+                        callee_frame = frames.pop()
+                        if self.open_upvalues:
+                            self.close_upvalues(base)
+                        del stack[base : callee_frame.base]
+                        callee_frame.base = base
+                        frames[-1] = callee_frame
+                    frame = frames[-1]
+                    closure = frame.closure
+                    code = closure.function.chunk.code
+                    constants = closure.function.chunk.constants
+                    upvalues = closure.upvalues
+                    base = frame.base
+                    ip = 0
+                else:
+                    ip = frame.ip
+            elif op == RETURN:
+                result = pop()
+                if self.open_upvalues:
+                    self.close_upvalues(base)
+                frames.pop()
+                if not frames:
+                    del stack[:]
+                    return
+                del stack[base:]
+                push(result)
+
+                frame = frames[-1]
+                closure = frame.closure
+                code = closure.function.chunk.code
+                constants = closure.function.chunk.constants
+                upvalues = closure.upvalues
+                base = frame.base
+                ip = frame.ip
+            elif op == NOT:
+                stack[-1] = not is_truthy(stack[-1])
+            elif op == NEGATE:
+                value = stack[-1]
+                if type(value) is not float:
+                    frame.ip = ip
+                    raise self.error(frame, "Operand must be a number.")
+                stack[-1] = -value
+            elif op == NIL:
+                push(None)
+            elif op == TRUE:
+                push(True)
+            elif op == FALSE:
+                push(False)
+            elif op == PRINT:
+                write_line(stringify(pop()))
+            elif op == GET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                instance = stack[-1]
+                if type(instance) is not VMInstance:
+                    frame.ip = ip
+                    if not isinstance(instance, NativeInstance):
+                        raise self.error(frame, "Only instances have properties.")
+                    method = instance.methods.get(name)
+                    if method is None:
+                        raise self.error(frame, f"Undefined property {name}.")
+                    stack[-1] = method.bind(instance)
+                elif name in instance.fields:
+                    stack[-1] = instance.fields[name]
+                else:
+                    method = instance.klass.methods.get(name)
+                    if method is None:
+                        frame.ip = ip
+                        raise self.error(frame, f"Undefined property {name}.")
+                    stack[-1] = BoundMethod(instance, method)
+            elif op == SET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                value = pop()
+                instance = stack[-1]
+                if type(instance) is not VMInstance:
+                    frame.ip = ip
+                    raise self.error(frame, "Only instance have fields.")
+                instance.fields[name] = value
+                stack[-1] = value
+            elif op == DEFINE_GLOBAL:
+                lox_globals[constants[code[ip]]] = pop()
+                ip += 1
+            elif op == SET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                if name not in lox_globals:
+                    frame.ip = ip
+                    raise self.error(frame, f"Undefined variable {name}.")
+                lox_globals[name] = stack[-1]
+            elif op == CLOSURE:
+                function = constants[code[ip]]
+                ip += 1
+                captured = []
+                for _ in range(function.upvalue_count):
+                    is_local = code[ip]
+                    index = code[ip + 1]
+                    ip += 2
+                    if is_local:
+                        captured.append(self.capture_upvalue(base + index))
+                    else:
+                        captured.append(upvalues[index])
+                push(Closure(function, captured))
+            elif op == CLOSE_UPVALUE:
+                self.close_upvalues(len(stack) - 1)
+                pop()
+            elif op == GET_SUPER:
+                name = constants[code[ip]]
+                ip += 1
+                superclass = pop()
+                method = superclass.methods.get(name)
+                if method is None:
+                    frame.ip = ip
+                    raise self.error(frame, f"Undefined property {name}.")
+                stack[-1] = BoundMethod(stack[-1], method)
+            elif op == CLASS:
+                push(VMClass(constants[code[ip]]))
+                ip += 1
+            elif op == INHERIT:
+                superclass = stack[-2]
+                if type(superclass) is not VMClass:
+                    frame.ip = ip
+                    raise self.error(frame, "Superclass must be a class")
+                subclass = pop()
+                # copy down inheritance: classes are closed once declared so the
+                # subclass can own a flattened method table
+                subclass.methods.update(superclass.methods)
+            elif op == METHOD:
+                method = pop()
+                stack[-1].methods[constants[code[ip]]] = method
+                ip += 1
+            else:
+                frame.ip = ip
+                raise self.error(frame, f"Unknown opcode {op}.")
+
+
+def interpret(function: FunctionProto, output: Output | None = None) -> None:
+    VM(output).interpret(function)
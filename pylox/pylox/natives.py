@@ -0,0 +1,732 @@
+"""
+Native functions and objects shared by every engine.
+
+native_globals gives what a program starts with: `clock` and the
+constructors of the native objects. Every engine installs them when it is
+created, the Interpreter (and the engines built on it) in its
+GlobalEnvironment, the VM in its globals dict.
+
+Natives have no idea how an engine shows its own values, a Lox function is a
+LoxFunction in one engine and a Python function in another. Anything that
+turns Lox values into text takes the stringify of the engine running it:
+engines print a native object with its text method, and native_globals hands
+the engine's stringify to the StringBuilders it makes.
+
+Native objects are plain Python objects whose methods Lox code can call,
+`array.get(0)` runs LoxArray.get_ directly without any Lox level dispatch.
+The methods exposed to Lox end in `_`. NativeInstance collects them into a
+table keyed by their Lox name, and also makes them class attributes named
+like the properties of the Python backend, `p_get`, so that backend calls
+them the way it calls Lox methods.
+
+Natives raise NativeError for bad arguments. It has no token, every engine
+turns it into a LoxRuntimeError on the line of the call.
+
+Vec and range need NumPy. They are always defined, without NumPy calling
+them is a runtime error.
+"""
+
+from __future__ import annotations
+import typing
+import functools
+import importlib.util
+import mmap
+import operator
+import time
+
+from pylox.output import format_number
+
+# NumPy takes longer to import than most Lox programs take to run, so it is
+# only imported once a program makes a Vec
+HAS_NUMPY: typing.Final[bool] = importlib.util.find_spec("numpy") is not None
+
+
+class NativeError(Exception):
+    pass
+
+
+class NativeFunction:
+    """
+    A Python function callable from Lox. Satisfies the LoxCallable protocol,
+    the VM calls function directly.
+    """
+
+    __slots__ = ("name", "argument_count", "function")
+
+    name: str
+    argument_count: int
+    function: typing.Callable[..., object]
+
+    def __init__(
+        self, name: str, argument_count: int, function: typing.Callable[..., object]
+    ) -> None:
+        self.name = name
+        self.argument_count = argument_count
+        self.function = function
+
+    def arity(self) -> int:
+        return self.argument_count
+
+    def call(self, interpreter: object, arguments: list[object]) -> object:
+        return self.function(*arguments)
+
+    def __repr__(self) -> str:
+        return "<native fn>"
+
+
+class NativeMethod:
+    """
+    A method of a native object, unbound. Has the arity/invoke pair of a
+    LoxFunction so method calls in the Interpreter treat both alike.
+    """
+
+    __slots__ = ("name", "argument_count", "function")
+
+    name: str
+    argument_count: int
+    # takes the receiver first
+    function: typing.Callable[..., object]
+
+    def __init__(self, name: str, function: typing.Callable[..., object]) -> None:
+        self.name = name
+        self.argument_count = function.__code__.co_argcount - 1
+        self.function = function
+
+    def arity(self) -> int:
+        return self.argument_count
+
+    def invoke(
+        self, interpreter: object, this: NativeInstance, arguments: list[object]
+    ) -> object:
+        return self.function(this, *arguments)
+
+    def bind(self, receiver: NativeInstance) -> NativeFunction:
+        return NativeFunction(
+            self.name, self.argument_count, functools.partial(self.function, receiver)
+        )
+
+
+# the Python backend keeps the Lox property `name` in the attribute p_name. A
+# prefix, unlike a suffix, can't turn a Lox name such as `__eq_` into one of
+# Python's own attributes
+PROPERTY_PREFIX: typing.Final[str] = "p_"
+
+
+class NativeInstance:
+    __slots__ = ()
+
+    methods: typing.ClassVar[dict[str, NativeMethod]] = {}
+
+    def text(self, stringify: typing.Callable[[object], str]) -> str:
+        """
+        How print shows the object, stringify formats the Lox values in it.
+        """
+        return str(self)
+
+    def __init_subclass__(cls) -> None:
+        super().__init_subclass__()
+        cls.methods = {
+            name[:-1]: NativeMethod(name[:-1], function)
+            for name, function in vars(cls).items()
+            if name.endswith("_") and not name.startswith("_") and callable(function)
+        }
+        for name in cls.methods:
+            setattr(cls, PROPERTY_PREFIX + name, getattr(cls, name + "_"))
+
+
+def whole_number(value: object, what: str) -> int:
+    if type(value) is not float or not value.is_integer():
+        raise NativeError(f"{what} must be a whole number.")
+    return int(value)
+
+
+def checked_index(value: object, end: int, what: str) -> int:
+    """
+    Checks the index value of a what is a whole number in [0, end).
+    """
+    position = whole_number(value, f"{what} index")
+    if not 0 <= position < end:
+        raise NativeError(f"{what} index {position} out of bounds.")
+    return position
+
+
+class LoxArray(NativeInstance):
+    """
+    A growable array backed by a Python list, created with `Array(length)`.
+    Indexing, length and append are O(1).
+    """
+
+    __slots__ = ("items",)
+
+    items: list[object]
+
+    def __init__(self, items: list[object]) -> None:
+        self.items = items
+
+    def text(self, stringify: typing.Callable[[object], str]) -> str:
+        return "[" + ", ".join(stringify(item) for item in self.items) + "]"
+
+    def get_(self, index: object) -> object:
+        items = self.items
+        if type(index) is float and 0 <= index < len(items):
+            position = int(index)
+            if position == index:
+                return items[position]
+        return items[checked_index(index, len(items), "Array")]
+
+    def set_(self, index: object, value: object) -> object:
+        items = self.items
+        if type(index) is float and 0 <= index < len(items):
+            position = int(index)
+            if position == index:
+                items[position] = value
+                return value
+        items[checked_index(index, len(items), "Array")] = value
+        return value
+
+    def length_(self) -> float:
+        return float(len(self.items))
+
+    def append_(self, value: object) -> None:
+        self.items.append(value)
+
+    def sort_(self) -> None:
+        items = self.items
+        if not items:
+            return
+        first = type(items[0])
+        if first not in (float, str) or any(type(item) is not first for item in items):
+            raise NativeError("Can only sort arrays of numbers or of strings.")
+        items.sort()
+
+    def slice_(self, start: object, end: object) -> LoxArray:
+        """
+        A new array with the items from start up to, not including, end.
+        """
+        items = self.items
+        stop = checked_index(end, len(items) + 1, "Array")
+        return LoxArray(items[checked_index(start, stop + 1, "Array") : stop])
+
+    def fill_(self, value: object) -> None:
+        items = self.items
+        items[:] = [value] * len(items)
+
+
+def array(length: object) -> LoxArray:
+    count = whole_number(length, "Array length")
+    if count < 0:
+        raise NativeError("Array length can't be negative.")
+    return LoxArray([None] * count)
+
+
+class BoolKey:
+    """
+    Stands in for a bool key of a Map. Python has True == 1.0 so the bools
+    can't be keys themselves.
+    """
+
+    __slots__ = ("value",)
+
+    value: bool
+
+    def __init__(self, value: bool) -> None:
+        self.value = value
+
+
+BOOL_KEYS: typing.Final[dict[bool, BoolKey]] = {
+    True: BoolKey(True),
+    False: BoolKey(False),
+}
+
+
+class LoxMap(NativeInstance):
+    """
+    A hash map backed by a Python dict, created with `Map()`. Keys are
+    compared like `==` compares them: strings, numbers, booleans and nil by
+    value, everything else by identity. Getting a missing key gives nil.
+    """
+
+    __slots__ = ("items",)
+
+    # bool keys are stored as their BoolKey
+    items: dict[object, object]
+
+    def __init__(self, items: dict[object, object]) -> None:
+        self.items = items
+
+    def text(self, stringify: typing.Callable[[object], str]) -> str:
+        return (
+            "{"
+            + ", ".join(
+                f"{stringify(lox_key(key))}: {stringify(value)}"
+                for key, value in self.items.items()
+            )
+            + "}"
+        )
+
+    def get_(self, key: object) -> object:
+        if type(key) is bool:
+            key = BOOL_KEYS[key]
+        return self.items.get(key)
+
+    def set_(self, key: object, value: object) -> object:
+        if type(key) is bool:
+            key = BOOL_KEYS[key]
+        self.items[key] = value
+        return value
+
+    def has_(self, key: object) -> bool:
+        if type(key) is bool:
+            key = BOOL_KEYS[key]
+        return key in self.items
+
+    def delete_(self, key: object) -> bool:
+        """
+        Removes key, returns whether it was there.
+        """
+        if type(key) is bool:
+            key = BOOL_KEYS[key]
+        items = self.items
+        if key in items:
+            del items[key]
+            return True
+        return False
+
+    def size_(self) -> float:
+        return float(len(self.items))
+
+    def keys_(self) -> LoxArray:
+        """
+        An Array of the keys, in the order they were first set.
+        """
+        return LoxArray([lox_key(key) for key in self.items])
+
+
+def lox_key(key: object) -> object:
+    if type(key) is BoolKey:
+        return key.value
+    return key
+
+
+def lox_map() -> LoxMap:
+    return LoxMap({})
+
+
+def string(value: object, what: str) -> str:
+    if type(value) is not str:
+        raise NativeError(f"{what} must be a string.")
+    return value
+
+
+def length(text: object) -> float:
+    return float(len(string(text, "Argument")))
+
+
+def substr(text: object, start: object, end: object) -> str:
+    """
+    The characters from start up to, not including, end.
+    """
+    text = string(text, "Argument")
+    stop = checked_index(end, len(text) + 1, "String")
+    return text[checked_index(start, stop + 1, "String") : stop]
+
+
+def char_at(text: object, index: object) -> str:
+    text = string(text, "Argument")
+    if type(index) is float and 0 <= index < len(text):
+        position = int(index)
+        if position == index:
+            return text[position]
+    return text[checked_index(index, len(text), "String")]
+
+
+def index_of(text: object, needle: object) -> float:
+    """
+    Where needle first occurs in text, -1 when it doesn't.
+    """
+    return float(string(text, "Argument").find(string(needle, "Argument")))
+
+
+def split(text: object, separator: object) -> LoxArray:
+    """
+    The Array of the parts of text between separators. The empty separator
+    splits text into its characters.
+    """
+    text = string(text, "Argument")
+    separator = string(separator, "Separator")
+    if not separator:
+        return LoxArray(list(text))
+    return LoxArray(text.split(separator))
+
+
+def join(parts: object, separator: object) -> str:
+    if type(parts) is not LoxArray:
+        raise NativeError("Can only join an array.")
+    separator = string(separator, "Separator")
+    try:
+        return separator.join(typing.cast(list[str], parts.items))
+    except TypeError:
+        raise NativeError("Can only join an array of strings.") from None
+
+
+class StringBuilder(NativeInstance):
+    """
+    Builds a string from pieces, created with `StringBuilder()`. Appending is
+    amortized O(1), the pieces are joined once when the string is asked for.
+    Anything can be appended, it is added the way print would show it.
+    """
+
+    __slots__ = ("stringify", "parts", "length")
+
+    # the stringify of the engine that made the builder
+    stringify: typing.Callable[[object], str]
+    parts: list[str]
+    length: int
+
+    def __init__(self, stringify: typing.Callable[[object], str]) -> None:
+        self.stringify = stringify
+        self.parts = []
+        self.length = 0
+
+    def __str__(self) -> str:
+        return self.toString_()
+
+    def append_(self, value: object) -> StringBuilder:
+        """
+        Returns the builder so appends can be chained.
+        """
+        text = value if type(value) is str else self.stringify(value)
+        self.parts.append(text)
+        self.length += len(text)
+        return self
+
+    def length_(self) -> float:
+        return float(self.length)
+
+    def toString_(self) -> str:
+        parts = self.parts
+        if len(parts) == 1:
+            return parts[0]
+        text = "".join(parts)
+        # the next call doesn't join again
+        self.parts = [text] if text else []
+        return text
+
+
+class Vec(NativeInstance):
+    """
+    A vector of numbers backed by a NumPy float64 array, created with
+    `Vec(length)` (all zeros), `Vec(array)` or `range(start, stop, step)`.
+    The arithmetic operators work elementwise between two Vecs of the same
+    length, or a Vec and a number, see vector_arithmetic.
+    """
+
+    __slots__ = ("values",)
+
+    values: typing.Any
+
+    def __init__(self, values: typing.Any) -> None:
+        self.values = values
+
+    def __str__(self) -> str:
+        return "[" + ", ".join(map(format_number, self.values.tolist())) + "]"
+
+    def get_(self, index: object) -> float:
+        values = self.values
+        return float(values[checked_index(index, len(values), "Vec")])
+
+    def set_(self, index: object, value: object) -> object:
+        values = self.values
+        position = checked_index(index, len(values), "Vec")
+        if type(value) is not float:
+            raise NativeError("Vec values must be numbers.")
+        values[position] = value
+        return value
+
+    def length_(self) -> float:
+        return float(len(self.values))
+
+    def sum_(self) -> float:
+        return float(self.values.sum())
+
+    def min_(self) -> float:
+        return float(self.nonempty("minimum").min())
+
+    def max_(self) -> float:
+        return float(self.nonempty("maximum").max())
+
+    def mean_(self) -> float:
+        return float(self.nonempty("mean").mean())
+
+    def dot_(self, other: object) -> float:
+        return float(self.values.dot(self.same_length(other)))
+
+    def slice_(self, start: object, end: object) -> Vec:
+        """
+        A view of the values from start up to, not including, end. Nothing is
+        copied, setting a value of the slice sets it in this Vec too.
+        """
+        values = self.values
+        stop = checked_index(end, len(values) + 1, "Vec")
+        return Vec(values[checked_index(start, stop + 1, "Vec") : stop])
+
+    def toArray_(self) -> LoxArray:
+        return LoxArray(self.values.tolist())
+
+    def nonempty(self, what: str) -> typing.Any:
+        if not len(self.values):
+            raise NativeError(f"An empty Vec has no {what}.")
+        return self.values
+
+    def same_length(self, other: object) -> typing.Any:
+        if type(other) is not Vec:
+            raise NativeError("Argument must be a Vec.")
+        if len(other.values) != len(self.values):
+            raise NativeError("Vecs must have the same length.")
+        return other.values
+
+
+VECTOR_OPERATORS: typing.Final[dict[str, typing.Callable[[object, object], object]]] = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+}
+
+
+def vector_arithmetic(symbol: str, left: object, right: object) -> Vec | None:
+    """
+    Computes `left symbol right` when one operand is a Vec and the other a Vec
+    or a number, returns None for any other operands. The engines only call
+    this once their own operand checks failed, so plain numbers never pay for
+    it.
+    """
+    if type(left) is Vec:
+        if type(right) is Vec:
+            a, b = left.values, left.same_length(right)
+        elif type(right) is float:
+            a, b = left.values, right
+        else:
+            return None
+    elif type(right) is Vec and type(left) is float:
+        a, b = left, right.values
+    else:
+        return None
+    import numpy
+
+    # elementwise 1/0 and 0/0 give inf and nan, without NumPy's warnings
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return Vec(VECTOR_OPERATORS[symbol](a, b))
+
+
+def require_numpy(name: str) -> None:
+    if not HAS_NUMPY:
+        raise NativeError(f"{name} needs NumPy installed.")
+
+
+def vec(source: object) -> Vec:
+    require_numpy("Vec")
+    import numpy
+
+    if type(source) is LoxArray:
+        if any(type(value) is not float for value in source.items):
+            raise NativeError("Vec values must be numbers.")
+        return Vec(numpy.array(source.items, dtype=numpy.float64))
+    count = whole_number(source, "Vec length")
+    if count < 0:
+        raise NativeError("Vec length can't be negative.")
+    return Vec(numpy.zeros(count))
+
+
+def vector_range(start: object, stop: object, step: object) -> Vec:
+    """
+    The Vec start, start + step, ... up to, not including, stop.
+    """
+    require_numpy("range")
+    if type(start) is not float or type(stop) is not float or type(step) is not float:
+        raise NativeError("Arguments must be numbers.")
+    if step == 0:
+        raise NativeError("Step can't be zero.")
+    import numpy
+
+    return Vec(numpy.arange(start, stop, step, dtype=numpy.float64))
+
+
+class Buffer(NativeInstance):
+    """
+    Read only bytes, the contents of a file made with `mapFile(path)`. The
+    file is memory mapped and never read as a whole, slices and lines are
+    memoryviews of the mapping so nothing is copied until text() decodes
+    some of it.
+    """
+
+    __slots__ = ("data", "view", "start")
+
+    # the whole mapping, searched with its own find
+    data: mmap.mmap | bytes
+    # the bytes of this buffer, data[start : start + len(view)]
+    view: memoryview
+    start: int
+
+    def __init__(self, data: mmap.mmap | bytes, view: memoryview, start: int) -> None:
+        self.data = data
+        self.view = view
+        self.start = start
+
+    def __str__(self) -> str:
+        return f"<buffer {len(self.view)} bytes>"
+
+    def length_(self) -> float:
+        return float(len(self.view))
+
+    def get_(self, index: object) -> float:
+        """
+        The byte at index, as a number.
+        """
+        view = self.view
+        return float(view[checked_index(index, len(view), "Buffer")])
+
+    def slice_(self, start: object, end: object) -> Buffer:
+        view = self.view
+        stop = checked_index(end, len(view) + 1, "Buffer")
+        first = checked_index(start, stop + 1, "Buffer")
+        return Buffer(self.data, view[first:stop], self.start + first)
+
+    def indexOf_(self, needle: object) -> float:
+        """
+        Where the UTF-8 bytes of needle first occur, -1 when they don't.
+        """
+        start = self.start
+        position = self.data.find(
+            string(needle, "Argument").encode(), start, start + len(self.view)
+        )
+        return float(position if position < 0 else position - start)
+
+    def text_(self) -> str:
+        return str(self.view, "utf-8", "replace")
+
+    def lines_(self) -> Lines:
+        """
+        The lines of the buffer, each a Buffer without its line ending.
+        """
+        return Lines(self.buffer_lines())
+
+    def buffer_lines(self) -> typing.Generator[Buffer]:
+        data = self.data
+        view = self.view
+        start = self.start
+        end = start + len(view)
+        position = start
+        while position < end:
+            newline = data.find(b"\n", position, end)
+            if newline < 0:
+                newline = end
+            stop = newline
+            if stop > position and data[stop - 1] == ord("\r"):
+                stop -= 1
+            yield Buffer(data, view[position - start : stop - start], position)
+            position = newline + 1
+
+
+class Lines(NativeInstance):
+    """
+    Reads lines one at a time: `next()` gives the next line, nil once there
+    are none left, so a while loop can scan a file of any size.
+
+        var line = reader.next();
+        while (line != nil) { ... line = reader.next(); }
+    """
+
+    __slots__ = ("lines",)
+
+    lines: typing.Generator[object]
+
+    def __init__(self, lines: typing.Generator[object]) -> None:
+        self.lines = lines
+
+    def __str__(self) -> str:
+        return "<lines>"
+
+    def next_(self) -> object:
+        return next(self.lines, None)
+
+    def close_(self) -> None:
+        """
+        Stops reading early, closing the file being read.
+        """
+        self.lines.close()
+
+
+def path_of(path: object) -> str:
+    path = string(path, "Path")
+    # open() raises ValueError rather than OSError for these
+    if "\0" in path:
+        raise NativeError("Path can't contain a null character.")
+    return path
+
+
+def read_file(path: object) -> str:
+    try:
+        with open(path_of(path), encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError as e:
+        raise NativeError(f"Can't read {path}: {e.strerror}.") from None
+
+
+def map_file(path: object) -> Buffer:
+    try:
+        with open(path_of(path), "rb") as f:
+            try:
+                data: mmap.mmap | bytes = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            except ValueError:
+                # empty files can't be mapped
+                data = b""
+    except OSError as e:
+        raise NativeError(f"Can't read {path}: {e.strerror}.") from None
+    return Buffer(data, memoryview(data), 0)
+
+
+def file_lines(file: typing.TextIO) -> typing.Generator[str]:
+    with file:
+        for line in file:
+            yield line[:-1] if line.endswith("\n") else line
+
+
+def lines(path: object) -> Lines:
+    """
+    The lines of a file, read as they are asked for.
+    """
+    try:
+        file = open(path_of(path), encoding="utf-8", errors="replace")
+    except OSError as e:
+        raise NativeError(f"Can't read {path}: {e.strerror}.") from None
+    return Lines(file_lines(file))
+
+
+def native_globals(
+    stringify: typing.Callable[[object], str],
+) -> dict[str, NativeFunction]:
+    """
+    The natives for an engine that shows values with stringify.
+    """
+    return {
+        "clock": NativeFunction("clock", 0, lambda: float(time.time())),
+        "Array": NativeFunction("Array", 1, array),
+        "Map": NativeFunction("Map", 0, lox_map),
+        "StringBuilder": NativeFunction(
+            "StringBuilder", 0, functools.partial(StringBuilder, stringify)
+        ),
+        "len": NativeFunction("len", 1, length),
+        "substr": NativeFunction("substr", 3, substr),
+        "charAt": NativeFunction("charAt", 2, char_at),
+        "indexOf": NativeFunction("indexOf", 2, index_of),
+        "split": NativeFunction("split", 2, split),
+        "join": NativeFunction("join", 2, join),
+        "readFile": NativeFunction("readFile", 1, read_file),
+        "mapFile": NativeFunction("mapFile", 1, map_file),
+        "lines": NativeFunction("lines", 1, lines),
+        "Vec": NativeFunction("Vec", 1, vec),
+        "range": NativeFunction("range", 3, vector_range),
+    }
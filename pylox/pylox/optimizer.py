@@ -0,0 +1,209 @@
+"""
+AST optimizer, enabled with `lox run-file --optimize`. Runs after the Resolver
+and before any engine.
+
+Expressions whose operands are all literals are folded into a single literal,
+ifs and whiles with a constant condition are pruned. Folding evaluates the
+node with the tree walking Interpreter itself so the folded value is exactly
+what the program would have computed. A node that raises there (`-"a"`,
+`1 + nil`, ...) is left alone so the error still happens at runtime, on the
+same line.
+
+Identities such as `x * 1` or `x + 0` are not simplified: dropping the
+operation would also drop the check that x is a number.
+"""
+
+from __future__ import annotations
+import typing
+import logging
+
+import pylox.error_handling as errors
+import pylox.Expr as Expr
+import pylox.Stmnt as stmnt
+from pylox.interpreter import Interpreter
+from pylox.tokens import TokenType
+
+LOGGER: typing.Final[logging.Logger] = logging.getLogger(__name__)
+
+
+class Optimizer(Expr.Visitor[Expr.Expr], stmnt.Visitor[stmnt.Stmnt | None]):
+    """
+    Every visit returns the node that replaces the one visited. Statements
+    return None when they can be removed altogether.
+    """
+
+    evaluator: Interpreter
+
+    def __init__(self):
+        self.evaluator = Interpreter()
+
+    def optimize(self, statements: list[stmnt.Stmnt]) -> list[stmnt.Stmnt]:
+        optimized = []
+        for statement in statements:
+            statement = self.optimize_stmnt(statement)
+            if statement is not None:
+                optimized.append(statement)
+        return optimized
+
+    def optimize_stmnt(self, statement: stmnt.Stmnt) -> stmnt.Stmnt | None:
+        return statement.accept(self)
+
+    def optimize_branch(self, statement: stmnt.Stmnt) -> stmnt.Stmnt:
+        """
+        Optimizes the body of an if or while, which has to stay a statement.
+        """
+        optimized = self.optimize_stmnt(statement)
+        if optimized is None:
+            return empty_block()
+        return optimized
+
+    def optimize_expr(self, expr: Expr.Expr) -> Expr.Expr:
+        return expr.accept(self)
+
+    def fold(self, expr: Expr.Expr) -> Expr.Expr:
+        """
+        Replaces expr, whose operands are all literals, with the literal it
+        evaluates to. Expressions that fail are kept for the runtime to report.
+        """
+        try:
+            value = self.evaluator.evaluate(expr)
+        except (errors.LoxRuntimeError, ArithmeticError):
+            return expr
+
+        LOGGER.debug("folded %s into %r", expr, value)
+        return Expr.Literal(value)
+
+    # Statements
+
+    def visit_BlockStmnt(self, stmnt: stmnt.Block) -> stmnt.Stmnt | None:
+        stmnt.statements = self.optimize(stmnt.statements)
+        return stmnt
+
+    def visit_ClassStmnt(self, stmnt: stmnt.Class) -> stmnt.Stmnt | None:
+        for method in stmnt.methods:
+            self.visit_FunctionStmnt(method)
+        return stmnt
+
+    def visit_ExpressionStmnt(self, stmnt: stmnt.Expression) -> stmnt.Stmnt | None:
+        stmnt.expression = self.optimize_expr(stmnt.expression)
+        if isinstance(stmnt.expression, Expr.Literal):
+            # a literal on its own does nothing
+            return None
+        return stmnt
+
+    def visit_FunctionStmnt(self, stmnt: stmnt.Function) -> stmnt.Stmnt | None:
+        # the closure engine keys compiled bodies on the list itself
+        stmnt.body[:] = self.optimize(stmnt.body)
+        return stmnt
+
+    def visit_IfStmnt(self, stmnt: stmnt.If) -> stmnt.Stmnt | None:
+        stmnt.condition = self.optimize_expr(stmnt.condition)
+
+        if isinstance(stmnt.condition, Expr.Literal):
+            if self.evaluator.is_truthy(stmnt.condition.value):
+                return self.optimize_stmnt(stmnt.then_branch)
+            if stmnt.else_branch is not None:
+                return self.optimize_stmnt(stmnt.else_branch)
+            return None
+
+        stmnt.then_branch = self.optimize_branch(stmnt.then_branch)
+        if stmnt.else_branch is not None:
+            stmnt.else_branch = self.optimize_branch(stmnt.else_branch)
+        return stmnt
+
+    def visit_PrintStmnt(self, stmnt: stmnt.Print) -> stmnt.Stmnt | None:
+        stmnt.expression = self.optimize_expr(stmnt.expression)
+        return stmnt
+
+    def visit_ReturnStmnt(self, stmnt: stmnt.Return) -> stmnt.Stmnt | None:
+        if stmnt.value is not None:
+            stmnt.value = self.optimize_expr(stmnt.value)
+        return stmnt
+
+    def visit_VarStmnt(self, stmnt: stmnt.Var) -> stmnt.Stmnt | None:
+        if stmnt.initializer is not None:
+            stmnt.initializer = self.optimize_expr(stmnt.initializer)
+        return stmnt
+
+    def visit_WhileStmnt(self, stmnt: stmnt.While) -> stmnt.Stmnt | None:
+        stmnt.condition = self.optimize_expr(stmnt.condition)
+
+        if isinstance(stmnt.condition, Expr.Literal) and not self.evaluator.is_truthy(
+            stmnt.condition.value
+        ):
+            return None
+
+        stmnt.body = self.optimize_branch(stmnt.body)
+        return stmnt
+
+    # Expressions
+
+    def visit_AssignExpr(self, expr: Expr.Assign) -> Expr.Expr:
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def visit_BinaryExpr(self, expr: Expr.Binary) -> Expr.Expr:
+        expr.left = self.optimize_expr(expr.left)
+        expr.right = self.optimize_expr(expr.right)
+
+        if isinstance(expr.left, Expr.Literal) and isinstance(expr.right, Expr.Literal):
+            return self.fold(expr)
+        return expr
+
+    def visit_CallExpr(self, expr: Expr.Call) -> Expr.Expr:
+        expr.callee = self.optimize_expr(expr.callee)
+        expr.arguments = [self.optimize_expr(argument) for argument in expr.arguments]
+        return expr
+
+    def visit_GetExpr(self, expr: Expr.Get) -> Expr.Expr:
+        expr.obj = self.optimize_expr(expr.obj)
+        return expr
+
+    def visit_GroupingExpr(self, expr: Expr.Grouping) -> Expr.Expr:
+        # parentheses only matter to the parser
+        return self.optimize_expr(expr.expression)
+
+    def visit_LiteralExpr(self, expr: Expr.Literal) -> Expr.Expr:
+        return expr
+
+    def visit_LogicalExpr(self, expr: Expr.Logical) -> Expr.Expr:
+        expr.left = self.optimize_expr(expr.left)
+        expr.right = self.optimize_expr(expr.right)
+
+        if isinstance(expr.left, Expr.Literal):
+            left_is_truthy = self.evaluator.is_truthy(expr.left.value)
+            if expr.operator.token_type == TokenType.OR:
+                return expr.left if left_is_truthy else expr.right
+            return expr.right if left_is_truthy else expr.left
+        return expr
+
+    def visit_SetExpr(self, expr: Expr.Set) -> Expr.Expr:
+        expr.obj = self.optimize_expr(expr.obj)
+        expr.value = self.optimize_expr(expr.value)
+        return expr
+
+    def visit_SuperExpr(self, expr: Expr.Super) -> Expr.Expr:
+        return expr
+
+    def visit_ThisExpr(self, expr: Expr.This) -> Expr.Expr:
+        return expr
+
+    def visit_UnaryExpr(self, expr: Expr.Unary) -> Expr.Expr:
+        expr.right = self.optimize_expr(expr.right)
+
+        if isinstance(expr.right, Expr.Literal):
+            return self.fold(expr)
+        return expr
+
+    def visit_VariableExpr(self, expr: Expr.Variable) -> Expr.Expr:
+        return expr
+
+
+def empty_block() -> stmnt.Block:
+    block = stmnt.Block([])
+    block.slot_count = 0
+    return block
+
+
+def optimize(statements: list[stmnt.Stmnt]) -> list[stmnt.Stmnt]:
+    return Optimizer().optimize(statements)
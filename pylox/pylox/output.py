@@ -0,0 +1,73 @@
+"""
+Where `print` goes. Every engine owns an Output and hands it the text of each
+print statement instead of calling Python's print(), so lines are buffered
+and written in large chunks.
+
+The buffer is flushed when it holds buffer_size characters, after every
+flush_lines lines when that is set, and when the engine finishes running a
+program, also when it stops on a runtime error. Output to a terminal is
+flushed after every line by default so it still shows up as it is printed.
+Embedding programs can hand any text stream, a file or an io.StringIO, to
+run() or an engine to collect the output.
+"""
+
+from __future__ import annotations
+import typing
+import sys
+
+# characters buffered before they are written
+BUFFER_SIZE: typing.Final[int] = 64 * 1024
+
+
+class Output:
+    stream: typing.TextIO
+    buffer_size: int
+    # flush after this many lines, None to only flush on size
+    flush_lines: int | None
+    # the lines not written yet
+    parts: list[str]
+    size: int
+
+    def __init__(
+        self,
+        stream: typing.TextIO | None = None,
+        buffer_size: int = BUFFER_SIZE,
+        flush_lines: int | None = None,
+    ) -> None:
+        if stream is None:
+            stream = sys.stdout
+        if flush_lines is None and stream.isatty():
+            flush_lines = 1
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.flush_lines = flush_lines
+        self.parts = []
+        self.size = 0
+
+    def write_line(self, text: str) -> None:
+        parts = self.parts
+        parts.append(text)
+        self.size += len(text) + 1
+        if self.size >= self.buffer_size or len(parts) == self.flush_lines:
+            self.flush()
+
+    def flush(self) -> None:
+        parts = self.parts
+        if not parts:
+            return
+        # the empty part ends the last line
+        parts.append("")
+        self.stream.write("\n".join(parts))
+        self.stream.flush()
+        self.parts = []
+        self.size = 0
+
+
+def format_number(value: float) -> str:
+    """
+    How Lox prints a number: integral values without the ".0", as long as
+    Python would write them without an exponent.
+    """
+    if value.is_integer() and -1e16 < value < 1e16:
+        return str(int(value))
+    return repr(value)
@@ -0,0 +1,248 @@
+"""
+Deterministic profiler for the tree walking interpreter, what `lox profile`
+runs.
+
+The Profiler is a Tracer: every call into a Lox function or class and every
+statement executed is timed, so the report is exact about call counts where
+cProfile would only show visit_CallExpr and accept. Times are kept per
+function (keyed on the name and line of its declaration) and per source line
+(the line a statement starts on):
+
+- self time excludes the calls, or the nested statements, made meanwhile
+- cumulative time includes them, counted once for recursive calls like
+  cProfile does
+
+Only the call and statement events are hooked, variable accesses run the
+untraced Interpreter code. Line numbers are the ones errors report.
+"""
+
+from __future__ import annotations
+import typing
+import json
+import marshal
+import time
+
+import pylox.Stmnt as stmnt
+from pylox.interpreter import LoxCallable, LoxFunction
+from pylox.tracing import Tracer
+
+# name and line of the declaration, classes have no line
+type FunctionKey = tuple[str, int | None]
+
+
+class Timing:
+    __slots__ = ("calls", "primitive_calls", "self_time", "cumulative", "active")
+
+    calls: int
+    # calls that were not made from within another call to the same thing
+    primitive_calls: int
+    self_time: float
+    cumulative: float
+    # how many times this is currently on the stack
+    active: int
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.primitive_calls = 0
+        self.self_time = 0.0
+        self.cumulative = 0.0
+        self.active = 0
+
+    def exit(self, elapsed: float, children: float) -> None:
+        self.active -= 1
+        self.calls += 1
+        self.self_time += elapsed - children
+        if not self.active:
+            self.primitive_calls += 1
+            self.cumulative += elapsed
+
+    def to_json(self) -> dict[str, object]:
+        return {
+            "calls": self.calls,
+            "self_time": self.self_time,
+            "cumulative": self.cumulative,
+        }
+
+
+class Frame:
+    __slots__ = ("key", "timings", "start", "children")
+
+    key: FunctionKey | None
+    timings: tuple[Timing, ...]
+    start: float
+    # time spent in the frames entered from this one
+    children: float
+
+    def __init__(
+        self, key: FunctionKey | None, timings: tuple[Timing, ...], start: float
+    ) -> None:
+        self.key = key
+        self.timings = timings
+        self.start = start
+        self.children = 0.0
+
+
+def function_key(callee: LoxCallable) -> FunctionKey:
+    if isinstance(callee, LoxFunction):
+        name = callee.declaration.name
+        return name.lexeme, name.line
+    return repr(callee), None
+
+
+def function_label(key: FunctionKey) -> str:
+    name, line = key
+    if line is None:
+        return f"{name} (class)"
+    return f"{name} (line {line})"
+
+
+class Profiler(Tracer):
+    clock: typing.Callable[[], float]
+    functions: dict[FunctionKey, Timing]
+    lines: dict[int, Timing]
+    # (caller, callee) pairs, what pstats reports as callers
+    edges: dict[tuple[FunctionKey, FunctionKey], Timing]
+    call_stack: list[Frame]
+    statement_stack: list[Frame]
+
+    def __init__(self, clock: typing.Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.functions = {}
+        self.lines = {}
+        self.edges = {}
+        self.call_stack = []
+        self.statement_stack = []
+
+    def execute(self, statement: stmnt.Stmnt) -> None:
+        line = statement.line
+        if line is None:
+            # built by the optimizer, its time counts for the enclosing line
+            return
+        timing = self.lines.get(line)
+        if timing is None:
+            timing = self.lines[line] = Timing()
+        timing.active += 1
+        self.statement_stack.append(Frame(None, (timing,), self.clock()))
+
+    def executed(self, statement: stmnt.Stmnt) -> None:
+        if statement.line is None:
+            return
+        self.exit(self.statement_stack)
+
+    def call_enter(self, callee: LoxCallable, arguments: list[object]) -> None:
+        key = function_key(callee)
+        timing = self.functions.get(key)
+        if timing is None:
+            timing = self.functions[key] = Timing()
+        timings: tuple[Timing, ...] = (timing,)
+        if self.call_stack:
+            edge = typing.cast(FunctionKey, self.call_stack[-1].key), key
+            edge_timing = self.edges.get(edge)
+            if edge_timing is None:
+                edge_timing = self.edges[edge] = Timing()
+            edge_timing.active += 1
+            timings = (timing, edge_timing)
+        timing.active += 1
+        self.call_stack.append(Frame(key, timings, self.clock()))
+
+    def call_exit(self, callee: LoxCallable, result: object) -> None:
+        self.exit(self.call_stack)
+
+    def exit(self, stack: list[Frame]) -> None:
+        frame = stack.pop()
+        elapsed = self.clock() - frame.start
+        if stack:
+            stack[-1].children += elapsed
+        for timing in frame.timings:
+            timing.exit(elapsed, frame.children)
+
+    # Reports
+
+    def report(
+        self,
+        stream: typing.TextIO,
+        limit: int = 20,
+        source_lines: list[str] | None = None,
+    ) -> None:
+        """
+        Writes the functions and the lines with the most self time as tables.
+        The text of every line is shown when source_lines is given.
+        """
+        stream.write("functions by self time\n")
+        stream.write(f"{'calls':>10} {'self (s)':>10} {'cumul (s)':>10}  function\n")
+        for key, timing in self.by_self_time(self.functions, limit):
+            stream.write(row(timing) + f"  {function_label(key)}\n")
+
+        stream.write("\nlines by self time\n")
+        stream.write(f"{'hits':>10} {'self (s)':>10} {'cumul (s)':>10}  line\n")
+        for line, timing in self.by_self_time(self.lines, limit):
+            text = ""
+            if source_lines is not None and line < len(source_lines):
+                text = "  " + source_lines[line].strip()
+            stream.write(row(timing) + f"  {line:>6}{text}\n")
+
+    @staticmethod
+    def by_self_time[K](timings: dict[K, Timing], limit: int) -> list[tuple[K, Timing]]:
+        ranked = sorted(
+            timings.items(), key=lambda item: item[1].self_time, reverse=True
+        )
+        return ranked[:limit]
+
+    def to_json(self, script: str) -> dict[str, object]:
+        return {
+            "script": script,
+            "functions": [
+                {"name": name, "line": line, **timing.to_json()}
+                for (name, line), timing in self.functions.items()
+            ],
+            "lines": [
+                {"line": line, **timing.to_json()}
+                for line, timing in sorted(self.lines.items())
+            ],
+        }
+
+    def to_pstats(self, script: str) -> dict:
+        """
+        The dictionary cProfile marshals, pstats.Stats, snakeviz and friends
+        read it back.
+        """
+
+        def pstats_key(key: FunctionKey) -> tuple[str, int, str]:
+            name, line = key
+            return script, 0 if line is None else line, name
+
+        stats = {}
+        for key, timing in self.functions.items():
+            callers = {
+                pstats_key(caller): (
+                    edge.primitive_calls,
+                    edge.calls,
+                    edge.self_time,
+                    edge.cumulative,
+                )
+                for (caller, callee), edge in self.edges.items()
+                if callee == key
+            }
+            stats[pstats_key(key)] = (
+                timing.primitive_calls,
+                timing.calls,
+                timing.self_time,
+                timing.cumulative,
+                callers,
+            )
+        return stats
+
+    def dump(self, path: str, script: str) -> None:
+        """
+        Writes JSON when path ends with .json, the pstats format otherwise.
+        """
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump(self.to_json(script), f, indent=2)
+        else:
+            with open(path, "wb") as f:
+                marshal.dump(self.to_pstats(script), f)
+
+
+def row(timing: Timing) -> str:
+    return f"{timing.calls:>10} {timing.self_time:>10.4f} {timing.cumulative:>10.4f}"
@@ -0,0 +1,1255 @@
+"""
+Python backend, selected with `lox run-file --engine=python`.
+
+The resolved AST is lowered to a Python `ast.Module`, compiled with the
+builtin compile() and run, so the program executes as CPython bytecode:
+
+- Lox locals become Python locals with a unique suffix (`a_3`), globals become
+  module globals (`a_g`) so reads are LOAD_GLOBALs and late binding still
+  works. Generated helpers never end in `_g` or `_<digits>` so they can't
+  collide with Lox names.
+- A local captured by a nested function is handed to it as a keyword only
+  default. Locals that are never reassigned are passed by value, the rest
+  live in a one element list "cell" that the function shares with its
+  declaring scope. Both give each loop iteration its own variable, like Lox
+  environments do.
+- Lox classes become Python classes built with type(), methods are plain
+  functions taking `this` first and fields live in the instance __dict__, so
+  fields shadow methods and lookups walk the superclass chain exactly like
+  LoxClass. Property and method names get a `p_` prefix (see property_name)
+  so Lox can't reach Python's own attributes, `__eq_` is `p___eq_`.
+- The operand checks of Interpreter.visit_BinaryExpr are inlined with walrus
+  temporaries so every operand is still evaluated once, in order, before an
+  error is raised.
+
+Runtime errors raised by the generated code carry their Lox token. Undefined
+globals and properties surface as NameError/AttributeError from CPython and are
+mapped back to Lox errors using the line numbers the AST nodes were given.
+"""
+
+from __future__ import annotations
+import ast
+import itertools
+import typing
+import logging
+import types
+
+import pylox.error_handling as errors
+import pylox.Expr as Expr
+import pylox.Stmnt as stmnt
+import pylox.natives as natives
+from pylox.interpreter import Interpreter, LoxCallable
+from pylox.natives import PROPERTY_PREFIX, NativeInstance
+from pylox.output import format_number
+from pylox.tokens import Token, TokenType
+
+LOGGER: typing.Final[logging.Logger] = logging.getLogger(__name__)
+
+# file name given to compile(), used to find Lox frames in tracebacks
+FILENAME: typing.Final[str] = "<lox>"
+
+ARITHMETIC: typing.Final[dict[TokenType, ast.operator]] = {
+    TokenType.MINUS: ast.Sub(),
+    TokenType.SLASH: ast.Div(),
+    TokenType.STAR: ast.Mult(),
+}
+
+COMPARISONS: typing.Final[dict[TokenType, ast.cmpop]] = {
+    TokenType.GREATER: ast.Gt(),
+    TokenType.GREATER_EQUAL: ast.GtE(),
+    TokenType.LESS: ast.Lt(),
+    TokenType.LESS_EQUAL: ast.LtE(),
+}
+
+EQUALITY: typing.Final[set[TokenType]] = {
+    TokenType.EQUAL_EQUAL,
+    TokenType.BANG_EQUAL,
+}
+
+
+# Runtime support, installed in the namespace the generated code runs in
+
+
+class Instance:
+    """
+    Base of every class a Lox program declares.
+    """
+
+    lox_arity: typing.ClassVar[int] = 0
+
+    def __repr__(self) -> str:
+        return type(self).__name__ + " instance"
+
+
+def make_class(
+    name: str, superclass: type[Instance] | None, methods: dict[str, typing.Callable]
+) -> type[Instance]:
+    klass = type(name, (superclass or Instance,), methods)
+
+    if property_name("init") in methods:
+        initializer = methods[property_name("init")]
+
+        def __init__(self, *arguments):
+            initializer(self, *arguments)
+
+        klass.__init__ = __init__
+        klass.lox_arity = initializer.__code__.co_argcount - 1
+
+    return klass
+
+
+def property_name(lexeme: str) -> str:
+    return PROPERTY_PREFIX + lexeme
+
+
+def lox_name(function: types.FunctionType) -> str:
+    # generated functions are named <lox name>_<n> or <lox name>_g
+    return function.__name__.rsplit("_", 1)[0]
+
+
+def stringify(value: object) -> str:
+    if value is None:
+        return "nil"
+
+    value_type = type(value)
+    if value_type is float:
+        return format_number(value)
+    if value_type is types.FunctionType:
+        return f"<fn {lox_name(value)} >"
+    if value_type is types.MethodType:
+        if isinstance(value.__self__, NativeInstance):
+            return "<native fn>"
+        return f"<fn {lox_name(value.__func__)} >"
+    if value_type is type:
+        return value.__name__
+    if isinstance(value, NativeInstance):
+        return value.text(stringify)
+
+    return str(value)
+
+
+def fail(token: Token, message: str) -> typing.NoReturn:
+    raise errors.LoxRuntimeError(token, message)
+
+
+def vector_arithmetic(
+    token: Token, left: object, right: object, message: str
+) -> object:
+    """
+    The slow path of + - * /, see Interpreter.vector_arithmetic.
+    """
+    try:
+        result = natives.vector_arithmetic(token.lexeme, left, right)
+    except natives.NativeError as e:
+        fail(token, str(e))
+    if result is None:
+        fail(token, message)
+    return result
+
+
+def failing_call(token: Token, message: str) -> typing.Callable[..., typing.NoReturn]:
+    """
+    Call errors are raised once the arguments have been evaluated, like the
+    Interpreter does, so the call site gets a function that raises instead.
+    """
+
+    def call(*arguments):
+        fail(token, message)
+
+    return call
+
+
+def check_superclass(superclass: object, token: Token) -> type[Instance]:
+    if type(superclass) is not type:
+        fail(token, "Superclass must be a class")
+    return typing.cast(type[Instance], superclass)
+
+
+def undefined_assignment(value: object, token: Token) -> typing.NoReturn:
+    fail(token, f"Undefined variable {token.lexeme}.")
+
+
+def set_global(namespace: dict, name: str, value: object, token: Token) -> object:
+    if name not in namespace:
+        undefined_assignment(value, token)
+    namespace[name] = value
+    return value
+
+
+def set_cell(cell: list, value: object) -> object:
+    cell[0] = value
+    return value
+
+
+def set_property(instance: Instance, name: str, value: object) -> object:
+    setattr(instance, name, value)
+    return value
+
+
+# Analysis
+
+
+class Local:
+    """
+    A local variable, keyed by the declaration the Resolver gave a slot.
+    """
+
+    __slots__ = ("name", "level", "by_value", "captured", "assigned")
+
+    name: str
+    # how many functions deep it is declared, 0 is the top level
+    level: int
+    # whether closures may copy it, true for declarations that are complete
+    # before any closure can see them
+    by_value: bool
+    captured: bool
+    assigned: bool
+
+    def __init__(self, name: str, level: int, by_value: bool) -> None:
+        self.name = name
+        self.level = level
+        self.by_value = by_value
+        self.captured = False
+        self.assigned = False
+
+    @property
+    def is_cell(self) -> bool:
+        return self.captured and (self.assigned or not self.by_value)
+
+
+class Analyzer(Expr.Visitor[None], stmnt.Visitor[None]):
+    """
+    Replays the Resolver's scopes to give every local a unique Python name and
+    to find which locals nested functions capture.
+    """
+
+    names: typing.Iterator[int]
+    scopes: list[list[Local]]
+    functions: list[stmnt.Function | None]
+    # id of a declaring node (Var, Function, Class, parameter Token, or the
+    # params/methods lists for "this"/"super") or
+    # of a use (Variable, Assign, This, Super) -> the Local it refers to
+    locals: dict[int, Local]
+    # id of a Function -> "this" for methods
+    this_locals: dict[int, Local]
+    # id of a Class -> "super"
+    super_locals: dict[int, Local]
+    # id of a Super expression -> the "this" it binds to
+    super_this: dict[int, Local]
+    # id of a Function -> locals it needs from enclosing functions, in order
+    free: dict[int, dict[Local, None]]
+
+    def __init__(self, names: typing.Iterator[int]):
+        self.names = names
+        self.scopes = []
+        self.functions = [None]
+        self.locals = {}
+        self.this_locals = {}
+        self.super_locals = {}
+        self.super_this = {}
+        self.free = {}
+
+    def analyze(self, statements: list[stmnt.Stmnt]):
+        for statement in statements:
+            statement.accept(self)
+
+    def declare(self, key: int, name: str, by_value: bool) -> Local | None:
+        if len(self.scopes) == 0:
+            return None
+        local = Local(f"{name}_{next(self.names)}", len(self.functions) - 1, by_value)
+        self.scopes[-1].append(local)
+        self.locals[key] = local
+        return local
+
+    def use(self, key: int, depth: int | None, slot: int | None) -> Local | None:
+        if depth is None:
+            return None
+        local = self.scopes[-1 - depth][typing.cast(int, slot)]
+        self.locals[key] = local
+        self.capture(local)
+        return local
+
+    def capture(self, local: Local):
+        if local.level == len(self.functions) - 1:
+            return
+        local.captured = True
+        for function in self.functions[local.level + 1 :]:
+            self.free[id(function)][local] = None
+
+    def function(self, declaration: stmnt.Function, is_method: bool):
+        self.functions.append(declaration)
+        self.free[id(declaration)] = {}
+        self.scopes.append([])
+        if is_method:
+            self.this_locals[id(declaration)] = typing.cast(
+                Local, self.declare(id(declaration.params), "this", True)
+            )
+        for param in declaration.params:
+            self.declare(id(param), param.lexeme, True)
+        self.analyze(declaration.body)
+        self.scopes.pop()
+        self.functions.pop()
+
+    # Statements
+
+    def visit_BlockStmnt(self, stmnt: stmnt.Block) -> None:
+        self.scopes.append([])
+        self.analyze(stmnt.statements)
+        self.scopes.pop()
+
+    def visit_ClassStmnt(self, stmnt: stmnt.Class) -> None:
+        self.declare(id(stmnt), stmnt.name.lexeme, False)
+        if stmnt.superclass is not None:
+            stmnt.superclass.accept(self)
+            self.scopes.append([])
+            self.super_locals[id(stmnt)] = typing.cast(
+                Local, self.declare(id(stmnt.methods), "super", True)
+            )
+        for method in stmnt.methods:
+            self.function(method, is_method=True)
+        if stmnt.superclass is not None:
+            self.scopes.pop()
+
+    def visit_ExpressionStmnt(self, stmnt: stmnt.Expression) -> None:
+        stmnt.expression.accept(self)
+
+    def visit_FunctionStmnt(self, stmnt: stmnt.Function) -> None:
+        self.declare(id(stmnt), stmnt.name.lexeme, False)
+        self.function(stmnt, is_method=False)
+
+    def visit_IfStmnt(self, stmnt: stmnt.If) -> None:
+        stmnt.condition.accept(self)
+        stmnt.then_branch.accept(self)
+        if stmnt.else_branch is not None:
+            stmnt.else_branch.accept(self)
+
+    def visit_PrintStmnt(self, stmnt: stmnt.Print) -> None:
+        stmnt.expression.accept(self)
+
+    def visit_ReturnStmnt(self, stmnt: stmnt.Return) -> None:
+        if stmnt.value is not None:
+            stmnt.value.accept(self)
+
+    def visit_VarStmnt(self, stmnt: stmnt.Var) -> None:
+        if stmnt.initializer is not None:
+            stmnt.initializer.accept(self)
+        self.declare(id(stmnt), stmnt.name.lexeme, True)
+
+    def visit_WhileStmnt(self, stmnt: stmnt.While) -> None:
+        stmnt.condition.accept(self)
+        stmnt.body.accept(self)
+
+    # Expressions
+
+    def visit_AssignExpr(self, expr: Expr.Assign) -> None:
+        expr.value.accept(self)
+        local = self.use(id(expr), expr.depth, expr.slot)
+        if local is not None:
+            local.assigned = True
+
+    def visit_BinaryExpr(self, expr: Expr.Binary) -> None:
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_CallExpr(self, expr: Expr.Call) -> None:
+        expr.callee.accept(self)
+        for argument in expr.arguments:
+            argument.accept(self)
+
+    def visit_GetExpr(self, expr: Expr.Get) -> None:
+        expr.obj.accept(self)
+
+    def visit_GroupingExpr(self, expr: Expr.Grouping) -> None:
+        expr.expression.accept(self)
+
+    def visit_LiteralExpr(self, expr: Expr.Literal) -> None:
+        return None
+
+    def visit_LogicalExpr(self, expr: Expr.Logical) -> None:
+        expr.left.accept(self)
+        expr.right.accept(self)
+
+    def visit_SetExpr(self, expr: Expr.Set) -> None:
+        expr.obj.accept(self)
+        expr.value.accept(self)
+
+    def visit_SuperExpr(self, expr: Expr.Super) -> None:
+        self.use(id(expr), expr.depth, expr.slot)
+        # "this" is slot 0 of the method scope just inside "super"
+        depth = typing.cast(int, expr.depth)
+        this = self.scopes[-depth][0]
+        self.super_this[id(expr)] = this
+        self.capture(this)
+
+    def visit_ThisExpr(self, expr: Expr.This) -> None:
+        self.use(id(expr), expr.depth, expr.slot)
+
+    def visit_UnaryExpr(self, expr: Expr.Unary) -> None:
+        expr.right.accept(self)
+
+    def visit_VariableExpr(self, expr: Expr.Variable) -> None:
+        self.use(id(expr), expr.depth, expr.slot)
+
+
+# Code generation
+
+
+def located[N: ast.AST](node: N, token: Token) -> N:
+    """
+    Puts node on the (one based) Python line matching token's Lox line.
+    """
+    node.lineno = node.end_lineno = token.line + 1
+    node.col_offset = node.end_col_offset = 0
+    return node
+
+
+def load(name: str) -> ast.Name:
+    return ast.Name(name, ast.Load())
+
+
+def store(name: str) -> ast.Name:
+    return ast.Name(name, ast.Store())
+
+
+def walrus(name: str, value: ast.expr) -> ast.NamedExpr:
+    return ast.NamedExpr(store(name), value)
+
+
+def call(function: str | ast.expr, *arguments: ast.expr) -> ast.Call:
+    if isinstance(function, str):
+        function = load(function)
+    return ast.Call(function, list(arguments), [])
+
+
+def attribute(value: ast.expr, name: str) -> ast.Attribute:
+    return ast.Attribute(value, name, ast.Load())
+
+
+def compare(left: ast.expr, op: ast.cmpop, right: ast.expr) -> ast.Compare:
+    return ast.Compare(left, [op], [right])
+
+
+def is_float(value: ast.expr) -> ast.Compare:
+    return compare(call("type", value), ast.Is(), load("float"))
+
+
+def all_of(*checks: ast.expr) -> ast.expr:
+    """
+    Combines checks with `&` rather than `and` so every check, and the operand
+    it evaluates, runs even when an earlier one fails.
+    """
+    combined = checks[0]
+    for check in checks[1:]:
+        combined = ast.BinOp(combined, ast.BitAnd(), check)
+    return combined
+
+
+def is_truthy(value: ast.expr, reference: ast.expr | None = None) -> ast.expr:
+    """
+    Lox truthiness of value. value is evaluated first and reference reads the
+    result again, it defaults to value for expressions that are safe to
+    evaluate twice.
+    """
+    if isinstance(value, ast.Constant):
+        return ast.Constant(value.value is not None and value.value is not False)
+    return ast.BoolOp(
+        ast.And(),
+        [
+            compare(value, ast.IsNot(), ast.Constant(None)),
+            compare(reference or value, ast.IsNot(), ast.Constant(False)),
+        ],
+    )
+
+
+def is_pure(expr: Expr.Expr) -> bool:
+    """
+    Whether expr can be evaluated again without side effects.
+    """
+    if isinstance(expr, Expr.Grouping):
+        return is_pure(expr.expression)
+    return isinstance(expr, (Expr.Literal, Expr.Variable, Expr.This))
+
+
+def is_boolean(expr: Expr.Expr) -> bool:
+    """
+    Whether expr always produces a bool, so Python's truthiness matches Lox's.
+    """
+    match expr:
+        case Expr.Grouping():
+            return is_boolean(expr.expression)
+        case Expr.Literal():
+            return type(expr.value) is bool
+        case Expr.Unary():
+            return expr.operator.token_type == TokenType.BANG
+        case Expr.Binary():
+            token_type = expr.operator.token_type
+            return token_type in COMPARISONS or token_type in EQUALITY
+        case Expr.Logical():
+            return is_boolean(expr.left) and is_boolean(expr.right)
+    return False
+
+
+class FunctionContext:
+    """
+    Per Python function state while its body is generated.
+    """
+
+    __slots__ = ("global_names", "this", "is_initializer")
+
+    # module globals the function assigns, they need a `global` statement
+    global_names: set[str]
+    this: Local | None
+    is_initializer: bool
+
+    def __init__(self, this: Local | None = None, is_initializer: bool = False):
+        self.global_names = set()
+        self.this = this
+        self.is_initializer = is_initializer
+
+
+class PythonCompiler(Expr.Visitor[ast.expr], stmnt.Visitor[list[ast.stmt]]):
+    names: typing.Iterator[int]
+    analyzer: Analyzer
+    # tokens that runtime errors are raised with, indexed by the generated code
+    tokens: list[Token]
+    token_indexes: dict[int, int]
+    context: FunctionContext
+
+    def __init__(self):
+        self.names = itertools.count()
+        self.analyzer = Analyzer(self.names)
+        self.tokens = []
+        self.token_indexes = {}
+        self.context = FunctionContext()
+
+    def compile(self, statements: list[stmnt.Stmnt]) -> ast.Module:
+        """
+        Returns a module defining main(), which runs the program.
+        """
+        self.analyzer.analyze(statements)
+        body = self.compile_body(statements)
+        main = ast.FunctionDef(
+            "main",
+            ast.arguments([], [], None, [], [], None, []),
+            self.with_globals(body),
+            [],
+            None,
+            None,
+            [],
+        )
+        module = ast.Module([main], [])
+        ast.fix_missing_locations(module)
+        return module
+
+    def compile_body(self, statements: list[stmnt.Stmnt]) -> list[ast.stmt]:
+        body = []
+        for statement in statements:
+            body.extend(statement.accept(self))
+        return body
+
+    def compile_block(self, statement: stmnt.Stmnt) -> list[ast.stmt]:
+        # Python blocks can't be empty
+        return statement.accept(self) or [ast.Pass()]
+
+    def compile_expr(self, expr: Expr.Expr) -> ast.expr:
+        return expr.accept(self)
+
+    def with_globals(self, body: list[ast.stmt]) -> list[ast.stmt]:
+        if self.context.global_names:
+            body.insert(0, ast.Global(sorted(self.context.global_names)))
+        return body or [ast.Pass()]
+
+    def temp(self) -> str:
+        return f"t_{next(self.names)}"
+
+    def token(self, token: Token) -> ast.expr:
+        """
+        Returns an expression that loads token at runtime.
+        """
+        index = self.token_indexes.get(id(token))
+        if index is None:
+            index = self.token_indexes[id(token)] = len(self.tokens)
+            self.tokens.append(token)
+        return ast.Subscript(load("TOKENS"), ast.Constant(index), ast.Load())
+
+    def fail(self, token: Token, message: str) -> ast.expr:
+        return call("fail", self.token(token), ast.Constant(message))
+
+    def operand(self, expr: Expr.Expr, pure: bool) -> tuple[ast.expr, ast.expr]:
+        """
+        Returns (evaluate, reference) for a binary operand: evaluate runs it
+        once and reference reads the result afterwards. Operands that may be
+        read again (pure) are used directly, others go through a temporary.
+        Literals are always used directly.
+        """
+        value = self.compile_expr(expr)
+        if pure or isinstance(value, ast.Constant):
+            return value, value
+        temp = self.temp()
+        return walrus(temp, value), load(temp)
+
+    def condition(self, expr: Expr.Expr) -> ast.expr:
+        if is_boolean(expr):
+            return self.compile_expr(expr)
+        return is_truthy(*self.operand(expr, is_pure(expr)))
+
+    def read_local(self, local: Local) -> ast.expr:
+        if local.is_cell:
+            return ast.Subscript(load(local.name), ast.Constant(0), ast.Load())
+        return load(local.name)
+
+    def this(self) -> ast.expr:
+        return self.read_local(typing.cast(Local, self.context.this))
+
+    def bind(self, local: Local | None, name: Token, value: ast.expr) -> list[ast.stmt]:
+        """
+        Statements that declare name, a local or a global, with value.
+        """
+        if local is None:
+            global_name = name.lexeme + "_g"
+            self.context.global_names.add(global_name)
+            return [located(ast.Assign([store(global_name)], value), name)]
+        if local.is_cell:
+            value = ast.List([value], ast.Load())
+        return [located(ast.Assign([store(local.name)], value), name)]
+
+    def function(
+        self,
+        declaration: stmnt.Function,
+        name: str,
+        this: Local | None = None,
+        is_initializer: bool = False,
+    ) -> ast.FunctionDef:
+        analyzer = self.analyzer
+        enclosing = self.context
+        self.context = FunctionContext(this, is_initializer)
+
+        parameters = [analyzer.locals[id(param)] for param in declaration.params]
+        if this is not None:
+            parameters.insert(0, this)
+
+        body: list[ast.stmt] = []
+        for parameter in parameters:
+            if parameter.is_cell:
+                body.append(
+                    ast.Assign(
+                        [store(parameter.name)],
+                        ast.List([load(parameter.name)], ast.Load()),
+                    )
+                )
+        body.extend(self.compile_body(declaration.body))
+        if is_initializer:
+            body.append(ast.Return(self.this()))
+        body = self.with_globals(body)
+        self.context = enclosing
+
+        free = list(analyzer.free[id(declaration)])
+        arguments = ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(parameter.name) for parameter in parameters],
+            vararg=None,
+            kwonlyargs=[ast.arg(local.name) for local in free],
+            kw_defaults=[load(local.name) for local in free],
+            kwarg=None,
+            defaults=[],
+        )
+        return located(
+            ast.FunctionDef(name, arguments, body, [], None, None, []),
+            declaration.name,
+        )
+
+    # Statements
+
+    def visit_BlockStmnt(self, stmnt: stmnt.Block) -> list[ast.stmt]:
+        # every local has its own name so blocks need no scope of their own
+        return self.compile_body(stmnt.statements)
+
+    def visit_ClassStmnt(self, stmnt: stmnt.Class) -> list[ast.stmt]:
+        analyzer = self.analyzer
+        local = analyzer.locals.get(id(stmnt))
+        body = []
+
+        superclass: ast.expr = ast.Constant(None)
+        if stmnt.superclass is not None:
+            super_local = analyzer.super_locals[id(stmnt)]
+            checked = call(
+                "check_superclass",
+                self.compile_expr(stmnt.superclass),
+                self.token(stmnt.superclass.name),
+            )
+            body.extend(self.bind(super_local, stmnt.superclass.name, checked))
+            superclass = self.read_local(super_local)
+
+        body.extend(self.bind(local, stmnt.name, ast.Constant(None)))
+
+        methods = {}
+        for method in stmnt.methods:
+            python_name = f"{method.name.lexeme}_{next(self.names)}"
+            body.append(
+                self.function(
+                    method,
+                    python_name,
+                    this=analyzer.this_locals[id(method)],
+                    is_initializer=method.name.lexeme == "init",
+                )
+            )
+            methods[property_name(method.name.lexeme)] = python_name
+
+        klass = call(
+            "make_class",
+            ast.Constant(stmnt.name.lexeme),
+            superclass,
+            ast.Dict(
+                [ast.Constant(key) for key in methods],
+                [load(value) for value in methods.values()],
+            ),
+        )
+        if local is not None and local.is_cell:
+            body.extend(self.assign(local, stmnt.name, klass))
+        else:
+            body.extend(self.bind(local, stmnt.name, klass))
+        return body
+
+    def visit_ExpressionStmnt(self, stmnt: stmnt.Expression) -> list[ast.stmt]:
+        expression = stmnt.expression
+        # assignments used as statements can be Python assignments
+        if isinstance(expression, Expr.Assign):
+            local = self.analyzer.locals.get(id(expression))
+            return self.assign(
+                local, expression.name, self.compile_expr(expression.value)
+            )
+        if isinstance(expression, Expr.Set):
+            return self.set_property(expression)
+
+        return [ast.Expr(self.compile_expr(expression))]
+
+    def visit_FunctionStmnt(self, stmnt: stmnt.Function) -> list[ast.stmt]:
+        local = self.analyzer.locals.get(id(stmnt))
+        if local is None:
+            global_name = stmnt.name.lexeme + "_g"
+            self.context.global_names.add(global_name)
+            return [self.function(stmnt, global_name)]
+        if not local.is_cell:
+            return [self.function(stmnt, local.name)]
+
+        # the function can see its own cell, so the cell exists before it
+        python_name = f"{stmnt.name.lexeme}_{next(self.names)}"
+        return [
+            *self.bind(local, stmnt.name, ast.Constant(None)),
+            self.function(stmnt, python_name),
+            *self.assign(local, stmnt.name, load(python_name)),
+        ]
+
+    def visit_IfStmnt(self, stmnt: stmnt.If) -> list[ast.stmt]:
+        orelse = []
+        if stmnt.else_branch is not None:
+            orelse = self.compile_block(stmnt.else_branch)
+        return [
+            ast.If(
+                self.condition(stmnt.condition),
+                self.compile_block(stmnt.then_branch),
+                orelse,
+            )
+        ]
+
+    def visit_PrintStmnt(self, stmnt: stmnt.Print) -> list[ast.stmt]:
+        value = call("stringify", self.compile_expr(stmnt.expression))
+        return [ast.Expr(call("write_line", value))]
+
+    def visit_ReturnStmnt(self, stmnt: stmnt.Return) -> list[ast.stmt]:
+        if self.context.is_initializer:
+            return [located(ast.Return(self.this()), stmnt.keyword)]
+        if stmnt.value is None:
+            return [located(ast.Return(None), stmnt.keyword)]
+        return [located(ast.Return(self.compile_expr(stmnt.value)), stmnt.keyword)]
+
+    def visit_VarStmnt(self, stmnt: stmnt.Var) -> list[ast.stmt]:
+        value: ast.expr = ast.Constant(None)
+        if stmnt.initializer is not None:
+            value = self.compile_expr(stmnt.initializer)
+        return self.bind(self.analyzer.locals.get(id(stmnt)), stmnt.name, value)
+
+    def visit_WhileStmnt(self, stmnt: stmnt.While) -> list[ast.stmt]:
+        return [
+            ast.While(
+                self.condition(stmnt.condition), self.compile_block(stmnt.body), []
+            )
+        ]
+
+    def assign(
+        self, local: Local | None, name: Token, value: ast.expr
+    ) -> list[ast.stmt]:
+        """
+        Statements that assign value to an existing variable.
+        """
+        if local is None:
+            global_name = name.lexeme + "_g"
+            self.context.global_names.add(global_name)
+            return [
+                located(
+                    ast.If(
+                        compare(ast.Constant(global_name), ast.In(), load("NAMESPACE")),
+                        [ast.Assign([store(global_name)], value)],
+                        [
+                            ast.Expr(
+                                call("undefined_assignment", value, self.token(name))
+                            )
+                        ],
+                    ),
+                    name,
+                )
+            ]
+        if local.is_cell:
+            target = ast.Subscript(load(local.name), ast.Constant(0), ast.Store())
+            return [located(ast.Assign([target], value), name)]
+        return [located(ast.Assign([store(local.name)], value), name)]
+
+    def set_property(self, expr: Expr.Set) -> list[ast.stmt]:
+        body = []
+        if isinstance(expr.obj, Expr.This):
+            obj = self.compile_expr(expr.obj)
+        else:
+            obj, reference = self.operand(expr.obj, is_pure(expr.obj))
+            check = call("isinstance", obj, load("Instance"))
+            body.append(
+                located(
+                    ast.If(
+                        ast.UnaryOp(ast.Not(), check),
+                        [ast.Expr(self.fail(expr.name, "Only instance have fields."))],
+                        [],
+                    ),
+                    expr.name,
+                )
+            )
+            obj = reference
+        target = ast.Attribute(obj, property_name(expr.name.lexeme), ast.Store())
+        body.append(
+            located(ast.Assign([target], self.compile_expr(expr.value)), expr.name)
+        )
+        return body
+
+    # Expressions
+
+    def visit_AssignExpr(self, expr: Expr.Assign) -> ast.expr:
+        local = self.analyzer.locals.get(id(expr))
+        value = self.compile_expr(expr.value)
+        if local is None:
+            global_name = expr.name.lexeme + "_g"
+            return located(
+                call(
+                    "set_global",
+                    load("NAMESPACE"),
+                    ast.Constant(global_name),
+                    value,
+                    self.token(expr.name),
+                ),
+                expr.name,
+            )
+        if local.is_cell:
+            return call("set_cell", load(local.name), value)
+        return walrus(local.name, value)
+
+    def visit_BinaryExpr(self, expr: Expr.Binary) -> ast.expr:
+        token_type = expr.operator.token_type
+        left_expr = expr.left
+        right_expr = expr.right
+
+        if token_type in EQUALITY:
+            return self.equality(expr)
+
+        # the left operand is read again after the right one ran, so it can
+        # only skip its temporary when the right one has no side effects
+        left, left_value = self.operand(
+            left_expr, is_pure(left_expr) and is_pure(right_expr)
+        )
+        right, right_value = self.operand(right_expr, is_pure(right_expr))
+
+        if token_type == TokenType.PLUS:
+            result: ast.expr = ast.BinOp(left_value, ast.Add(), right_value)
+            check = self.plus_check(left_expr, left, right_expr, right)
+            message = "Operatnds must be two numbers or two strings"
+        else:
+            if token_type in ARITHMETIC:
+                result = ast.BinOp(left_value, ARITHMETIC[token_type], right_value)
+            else:
+                result = compare(left_value, COMPARISONS[token_type], right_value)
+            checks = [
+                is_float(evaluate)
+                for operand, evaluate in ((left_expr, left), (right_expr, right))
+                if not (
+                    isinstance(operand, Expr.Literal) and type(operand.value) is float
+                )
+            ]
+            check = all_of(*checks) if checks else None
+            message = "Operands must be numbers."
+
+        if check is None:
+            return located(result, expr.operator)
+        if token_type == TokenType.PLUS or token_type in ARITHMETIC:
+            otherwise = call(
+                "vector_arithmetic",
+                self.token(expr.operator),
+                left_value,
+                right_value,
+                ast.Constant(message),
+            )
+        else:
+            otherwise = self.fail(expr.operator, message)
+        return located(ast.IfExp(check, result, otherwise), expr.operator)
+
+    def plus_check(
+        self,
+        left_expr: Expr.Expr,
+        left: ast.expr,
+        right_expr: Expr.Expr,
+        right: ast.expr,
+    ) -> ast.expr | None:
+        literal_types = (float, str)
+        left_type = (
+            type(left_expr.value) if isinstance(left_expr, Expr.Literal) else None
+        )
+        right_type = (
+            type(right_expr.value) if isinstance(right_expr, Expr.Literal) else None
+        )
+
+        if left_type in literal_types and right_type is left_type:
+            return None
+        if left_type in literal_types:
+            return compare(call("type", right), ast.Is(), load(left_type.__name__))
+        if right_type in literal_types:
+            return compare(call("type", left), ast.Is(), load(right_type.__name__))
+
+        # same type, and that type is float or str
+        left_type_name = self.temp()
+        return ast.BoolOp(
+            ast.And(),
+            [
+                compare(
+                    walrus(left_type_name, call("type", left)),
+                    ast.Is(),
+                    call("type", right),
+                ),
+                ast.BoolOp(
+                    ast.Or(),
+                    [
+                        compare(load(left_type_name), ast.Is(), load("float")),
+                        compare(load(left_type_name), ast.Is(), load("str")),
+                    ],
+                ),
+            ],
+        )
+
+    def equality(self, expr: Expr.Binary) -> ast.expr:
+        left = self.compile_expr(expr.left)
+        right = self.compile_expr(expr.right)
+
+        if isinstance(expr.left, Expr.Literal) or isinstance(expr.right, Expr.Literal):
+            # a literal compares the same in Python and Lox
+            equal: ast.expr = compare(left, ast.Eq(), right)
+        else:
+            # bound methods are only equal to themselves in Lox, each `obj.m`
+            # is a new one, while Python compares what they wrap
+            left_name = self.temp()
+            right_name = self.temp()
+            equal = ast.BoolOp(
+                ast.And(),
+                [
+                    compare(
+                        walrus(left_name, left), ast.Eq(), walrus(right_name, right)
+                    ),
+                    ast.BoolOp(
+                        ast.Or(),
+                        [
+                            compare(
+                                call("type", load(left_name)),
+                                ast.IsNot(),
+                                load("MethodType"),
+                            ),
+                            compare(load(left_name), ast.Is(), load(right_name)),
+                        ],
+                    ),
+                ],
+            )
+
+        if expr.operator.token_type == TokenType.BANG_EQUAL:
+            return ast.UnaryOp(ast.Not(), equal)
+        return equal
+
+    def visit_CallExpr(self, expr: Expr.Call) -> ast.expr:
+        callee = self.compile_expr(expr.callee)
+        arguments = [self.compile_expr(argument) for argument in expr.arguments]
+        count = len(arguments)
+        function = self.temp()
+        function_type = self.temp()
+
+        def arity_is(code: ast.expr, arity: int) -> ast.expr:
+            return compare(
+                attribute(code, "co_argcount"), ast.Eq(), ast.Constant(arity)
+            )
+
+        # Lox functions, bound methods and classes with the right arity are
+        # called directly, anything else goes through call_target
+        direct = ast.BoolOp(
+            ast.Or(),
+            [
+                ast.BoolOp(
+                    ast.And(),
+                    [
+                        compare(
+                            walrus(
+                                function_type, call("type", walrus(function, callee))
+                            ),
+                            ast.Is(),
+                            load("FunctionType"),
+                        ),
+                        arity_is(attribute(load(function), "__code__"), count),
+                    ],
+                ),
+                ast.BoolOp(
+                    ast.And(),
+                    [
+                        compare(load(function_type), ast.Is(), load("MethodType")),
+                        arity_is(
+                            attribute(
+                                attribute(load(function), "__func__"), "__code__"
+                            ),
+                            count + 1,
+                        ),
+                    ],
+                ),
+                ast.BoolOp(
+                    ast.And(),
+                    [
+                        compare(load(function_type), ast.Is(), load("type")),
+                        compare(
+                            attribute(load(function), "lox_arity"),
+                            ast.Eq(),
+                            ast.Constant(count),
+                        ),
+                    ],
+                ),
+            ],
+        )
+        target = ast.IfExp(
+            direct,
+            load(function),
+            call(
+                "call_target",
+                load(function),
+                ast.Constant(count),
+                self.token(expr.paren),
+            ),
+        )
+        return located(ast.Call(target, arguments, []), expr.paren)
+
+    def visit_GetExpr(self, expr: Expr.Get) -> ast.expr:
+        name = property_name(expr.name.lexeme)
+        if isinstance(expr.obj, Expr.This):
+            return located(attribute(self.compile_expr(expr.obj), name), expr.name)
+
+        # a native object's methods are its Python methods, `array.get` is
+        # LoxArray.get_ bound to it and called directly like a Lox method
+        obj, reference = self.operand(expr.obj, is_pure(expr.obj))
+        return ast.IfExp(
+            call(
+                "isinstance",
+                obj,
+                ast.Tuple([load("Instance"), load("NativeInstance")], ast.Load()),
+            ),
+            located(attribute(reference, name), expr.name),
+            self.fail(expr.name, "Only instances have properties."),
+        )
+
+    def visit_GroupingExpr(self, expr: Expr.Grouping) -> ast.expr:
+        return self.compile_expr(expr.expression)
+
+    def visit_LiteralExpr(self, expr: Expr.Literal) -> ast.expr:
+        return ast.Constant(expr.value)
+
+    def visit_LogicalExpr(self, expr: Expr.Logical) -> ast.expr:
+        is_or = expr.operator.token_type == TokenType.OR
+        right = self.compile_expr(expr.right)
+
+        if is_boolean(expr.left):
+            # Python's and/or agree with Lox when the left side is a bool
+            op = ast.Or() if is_or else ast.And()
+            return ast.BoolOp(op, [self.compile_expr(expr.left), right])
+
+        left, reference = self.operand(expr.left, is_pure(expr.left))
+        truthy = is_truthy(left, reference)
+        if is_or:
+            return ast.IfExp(truthy, reference, right)
+        return ast.IfExp(truthy, right, reference)
+
+    def visit_SetExpr(self, expr: Expr.Set) -> ast.expr:
+        name = ast.Constant(property_name(expr.name.lexeme))
+        if isinstance(expr.obj, Expr.This):
+            obj = self.compile_expr(expr.obj)
+        else:
+            evaluate, reference = self.operand(expr.obj, is_pure(expr.obj))
+            obj = ast.IfExp(
+                call("isinstance", evaluate, load("Instance")),
+                reference,
+                self.fail(expr.name, "Only instance have fields."),
+            )
+        return call("set_property", obj, name, self.compile_expr(expr.value))
+
+    def visit_SuperExpr(self, expr: Expr.Super) -> ast.expr:
+        analyzer = self.analyzer
+        superclass = self.read_local(analyzer.locals[id(expr)])
+        this = self.read_local(analyzer.super_this[id(expr)])
+        method = located(
+            attribute(superclass, property_name(expr.method.lexeme)), expr.method
+        )
+        return call("MethodType", method, this)
+
+    def visit_ThisExpr(self, expr: Expr.This) -> ast.expr:
+        return self.read_local(self.analyzer.locals[id(expr)])
+
+    def visit_UnaryExpr(self, expr: Expr.Unary) -> ast.expr:
+        if expr.operator.token_type == TokenType.BANG:
+            if is_boolean(expr.right):
+                return ast.UnaryOp(ast.Not(), self.compile_expr(expr.right))
+            value, reference = self.operand(expr.right, is_pure(expr.right))
+            return ast.UnaryOp(ast.Not(), is_truthy(value, reference))
+
+        value, reference = self.operand(expr.right, is_pure(expr.right))
+        return located(
+            ast.IfExp(
+                is_float(value),
+                ast.UnaryOp(ast.USub(), reference),
+                self.fail(expr.operator, "Operand must be a number."),
+            ),
+            expr.operator,
+        )
+
+    def visit_VariableExpr(self, expr: Expr.Variable) -> ast.expr:
+        local = self.analyzer.locals.get(id(expr))
+        if local is None:
+            return located(load(expr.name.lexeme + "_g"), expr.name)
+        return self.read_local(local)
+
+
+class PythonEngine(Interpreter):
+    """
+    Runs programs compiled by PythonCompiler. Natives come from the
+    Interpreter's globals.
+    """
+
+    def stringify(self, obj: object) -> str:
+        # the natives show values the way this backend prints them
+        return stringify(obj)
+
+    def call_target(
+        self, callee: object, arity: int, token: Token
+    ) -> typing.Callable[..., object]:
+        """
+        Slow path of a call: returns what to call with the Lox arguments, or
+        a function raising the error the call should produce.
+        """
+        callee_type = type(callee)
+        target = callee
+        if callee_type is types.FunctionType:
+            expected = callee.__code__.co_argcount
+        elif callee_type is types.MethodType:
+            expected = callee.__func__.__code__.co_argcount - 1
+        elif callee_type is type:
+            expected = typing.cast(type[Instance], callee).lox_arity
+        elif isinstance(callee, LoxCallable):
+            native = callee
+            expected = native.arity()
+
+            def target(*arguments):
+                return native.call(self, list(arguments))
+        else:
+            return failing_call(token, "can only call functions and classes.")
+
+        if arity != expected:
+            return failing_call(
+                token, f"Expected {expected} arguments but got {arity}."
+            )
+        return typing.cast(typing.Callable[..., object], target)
+
+    def interpret(self, statements: list[stmnt.Stmnt]) -> None:
+        compiler = PythonCompiler()
+        module = compiler.compile(statements)
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug("python:\n%s", ast.unparse(module))
+        code = compile(module, FILENAME, "exec")
+
+        namespace: dict[str, object] = {
+            "TOKENS": compiler.tokens,
+            "Instance": Instance,
+            "NativeInstance": NativeInstance,
+            "FunctionType": types.FunctionType,
+            "MethodType": types.MethodType,
+            "call_target": self.call_target,
+            "check_superclass": check_superclass,
+            "fail": fail,
+            "make_class": make_class,
+            "set_cell": set_cell,
+            "set_global": set_global,
+            "set_property": set_property,
+            "stringify": stringify,
+            "undefined_assignment": undefined_assignment,
+            "vector_arithmetic": vector_arithmetic,
+            "write_line": self.output.write_line,
+        }
+        namespace["NAMESPACE"] = namespace
+        for name, value in self.lox_globals.values.items():
+            namespace[name + "_g"] = value
+
+        exec(code, namespace)
+        try:
+            typing.cast(typing.Callable[[], None], namespace["main"])()
+        except errors.LoxRuntimeError as e:
+            self.output.flush()
+            errors.runtime_error(e)
+        except Exception as e:
+            self.output.flush()
+            errors.runtime_error(lox_error(e))
+        finally:
+            self.output.flush()
+
+
+def lox_line(error: Exception) -> int | None:
+    """
+    The line of the innermost Lox frame error went through.
+    """
+    line = None
+    traceback = error.__traceback__
+    while traceback is not None:
+        if traceback.tb_frame.f_code.co_filename == FILENAME:
+            line = traceback.tb_lineno - 1
+        traceback = traceback.tb_next
+    return line
+
+
+def lox_error(error: Exception) -> errors.LoxRuntimeError:
+    """
+    Turns an exception raised by the generated code into a Lox runtime error
+    on the line of the innermost Lox frame. CPython's errors for an undefined
+    global or property become the Lox ones, natives already have a Lox
+    message and anything else is reported as the Python error it is. An
+    exception raised outside any Lox frame is a bug and is re-raised.
+    """
+    line = lox_line(error)
+    if line is None:
+        raise error
+
+    lexeme = ""
+    name = getattr(error, "name", None) or ""
+    if isinstance(error, natives.NativeError):
+        message = str(error)
+    elif type(error) is NameError and name.endswith("_g"):
+        lexeme = name[:-2]
+        message = f"Undefined variable '{lexeme}'"
+    elif type(error) is AttributeError and name.startswith(PROPERTY_PREFIX):
+        lexeme = name.removeprefix(PROPERTY_PREFIX)
+        message = f"Undefined property {lexeme}."
+    else:
+        message = f"{type(error).__name__}: {error}"
+
+    return errors.LoxRuntimeError(
+        Token(TokenType.IDENTIFIER, lexeme, None, line), message
+    )
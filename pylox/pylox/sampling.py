@@ -0,0 +1,149 @@
+"""
+Sampling profiler for the tree walking interpreter, enabled with
+`lox run-file --sample-profile out.folded`.
+
+Unlike the Profiler (see profiler.py) nothing is hooked into the interpreter.
+A timer signal interrupts the program every millisecond and the handler
+rebuilds the Lox call stack from the Python frames it is handed: every
+LoxFunction.invoke frame is a Lox call and the innermost Interpreter.execute
+frame below it holds the statement that call is running. The samples are
+written in the collapsed stack format flamegraph.pl, speedscope and inferno
+read, one line per distinct stack:
+
+    <script> (fib.lox:14);fib (fib.lox:8);fib (fib.lox:7) 42
+
+Walking a deep stack on every sample would cost more than the program being
+sampled, so the stack is kept as a linked list of (declaration, line) pairs
+and the invoke frames on it are remembered until the next sample. A frame
+still running then has the same callers as before, so a sample only walks
+down to the first call it has already seen.
+
+Line numbers are the ones errors report. ITIMER_PROF would only count CPU time
+but it ticks at the kernel's scheduler rate (often 250Hz), so the wall clock
+timer is used. Only available where the platform has setitimer.
+"""
+
+from __future__ import annotations
+import typing
+import collections
+import signal
+import types
+
+import pylox.Stmnt as stmnt
+from pylox.interpreter import Interpreter, LoxFunction
+
+INTERVAL: typing.Final[float] = 0.001
+
+INVOKE_CODE: typing.Final[types.CodeType] = LoxFunction.invoke.__code__
+EXECUTE_CODE: typing.Final[types.CodeType] = Interpreter.execute.__code__
+
+# the innermost call first, the script itself has no declaration
+type Entry = tuple[stmnt.Function | None, int | None]
+type Stack = tuple[Entry, Stack] | tuple[()]
+
+
+class Sampler:
+    script: str
+    interval: float
+    # stack to the number of samples it was seen in
+    stacks: collections.Counter[Stack]
+    # the invoke frames on the stack at the last sample, outermost first, with
+    # the declaration each runs and the stack of its caller
+    call_frames: list[tuple[types.FrameType, stmnt.Function, Stack]]
+    # index of every frame in call_frames
+    depths: dict[types.FrameType, int]
+    # the handler runs between bytecodes and can be interrupted by the next
+    # signal itself
+    sampling: bool
+    previous_handler: typing.Any
+
+    def __init__(self, script: str, interval: float = INTERVAL) -> None:
+        self.script = script
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.call_frames = []
+        self.depths = {}
+        self.sampling = False
+        self.previous_handler = None
+
+    def __enter__(self) -> Sampler:
+        self.previous_handler = signal.signal(signal.SIGALRM, self.sample)
+        signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self.previous_handler)
+        self.call_frames.clear()
+        self.depths.clear()
+
+    def sample(self, signum: int, frame: types.FrameType | None) -> None:
+        if self.sampling:
+            return
+        self.sampling = True
+        try:
+            self.stacks[self.lox_stack(frame)] += 1
+        finally:
+            self.sampling = False
+
+    def lox_stack(self, frame: types.FrameType | None) -> Stack:
+        call_frames = self.call_frames
+        depths = self.depths
+        # the invoke frames not seen before, innermost first
+        walked = []
+        line = None
+        while frame is not None:
+            code = frame.f_code
+            if code is EXECUTE_CODE:
+                if line is None:
+                    line = frame.f_locals["statement"].line
+            elif code is INVOKE_CODE:
+                depth = depths.get(frame)
+                if depth is not None:
+                    # still running, so are all its callers
+                    for returned, _, _ in call_frames[depth + 1 :]:
+                        del depths[returned]
+                    del call_frames[depth + 1 :]
+                    _, declaration, stack = call_frames[depth]
+                    stack = ((declaration, line), stack)
+                    break
+                walked.append((frame, frame.f_locals["self"].declaration, line))
+                line = None
+            frame = frame.f_back
+        else:
+            depths.clear()
+            call_frames.clear()
+            stack = ((None, line), ())
+
+        for frame, declaration, line in reversed(walked):
+            depths[frame] = len(call_frames)
+            call_frames.append((frame, declaration, stack))
+            stack = ((declaration, line), stack)
+        return stack
+
+    def label(self, entry: Entry) -> str:
+        declaration, line = entry
+        if declaration is None:
+            if line is None:
+                # scanning, parsing and resolving
+                return f"<script> ({self.script})"
+            return f"<script> ({self.script}:{line})"
+        if line is None:
+            # sampled before the call ran a statement or after its last one
+            line = declaration.name.line
+        return f"{declaration.name.lexeme} ({self.script}:{line})"
+
+    def collapsed(self, stack: Stack) -> str:
+        labels = []
+        while stack:
+            entry, stack = stack
+            labels.append(self.label(entry))
+        labels.reverse()
+        return ";".join(labels)
+
+    def write(self, stream: typing.TextIO) -> None:
+        folded = collections.Counter()
+        for stack, count in self.stacks.items():
+            folded[self.collapsed(stack)] += count
+        for stack, count in sorted(folded.items()):
+            stream.write(f"{stack} {count}\n")
@@ -59,6 +59,8 @@ class TokenType(enum.Enum):
 
 
 class Token:
+    __slots__ = ("token_type", "lexeme", "literal", "line")
+
     token_type: TokenType
     lexeme: str
     literal: typing.Any | None
@@ -0,0 +1,176 @@
+"""
+Instrumentation for the tree walking interpreter.
+
+A Tracer receives an event for every statement executed, every call into a
+Lox function or class, every variable read and write and every instance
+created. Tracers are only ever attached to a TracingInterpreter: it overrides
+the handful of Interpreter methods those events come from and declares traced
+LoxFunction and LoxClass subclasses. The plain Interpreter has no hooks at
+all, so running without a tracer costs nothing, and the hooks for events a
+tracer doesn't override are left out too (see TracingInterpreter).
+
+    run(source, tracer=StreamTracer(sys.stderr))
+"""
+
+from __future__ import annotations
+import typing
+
+import pylox.Expr as Expr
+import pylox.Stmnt as stmnt
+from pylox.interpreter import (
+    Completion,
+    Interpreter,
+    LoxCallable,
+    LoxClass,
+    LoxFunction,
+    LoxInstance,
+)
+from pylox.output import Output
+from pylox.tokens import Token
+
+
+class Tracer:
+    """
+    Base class for tracers, every event is ignored. Subclasses override the
+    events they care about.
+    """
+
+    def execute(self, statement: stmnt.Stmnt) -> None:
+        pass
+
+    def executed(self, statement: stmnt.Stmnt) -> None:
+        """
+        Always paired with execute, also called when the statement raised.
+        """
+
+    def call_enter(self, callee: LoxCallable, arguments: list[object]) -> None:
+        pass
+
+    def call_exit(self, callee: LoxCallable, result: object) -> None:
+        """
+        Always paired with call_enter, result is None when the call raised.
+        """
+
+    def variable_read(self, name: Token, value: object) -> None:
+        pass
+
+    def variable_write(self, name: Token, value: object) -> None:
+        pass
+
+    def instance_created(self, instance: LoxInstance) -> None:
+        pass
+
+
+class StreamTracer(Tracer):
+    """
+    Writes one line per event to a text stream, what `lox run-file --trace`
+    attaches.
+    """
+
+    stream: typing.TextIO
+
+    def __init__(self, stream: typing.TextIO) -> None:
+        self.stream = stream
+
+    def write(self, line: str):
+        self.stream.write(line + "\n")
+
+    def execute(self, statement: stmnt.Stmnt) -> None:
+        self.write(f"[line {statement.line}] execute {type(statement).__name__}")
+
+    def call_enter(self, callee: LoxCallable, arguments: list[object]) -> None:
+        self.write(f"call {callee!r} with {arguments!r}")
+
+    def call_exit(self, callee: LoxCallable, result: object) -> None:
+        self.write(f"return {result!r} from {callee!r}")
+
+    def variable_read(self, name: Token, value: object) -> None:
+        self.write(f"[line {name.line}] read {name.lexeme} = {value!r}")
+
+    def variable_write(self, name: Token, value: object) -> None:
+        self.write(f"[line {name.line}] write {name.lexeme} = {value!r}")
+
+    def instance_created(self, instance: LoxInstance) -> None:
+        self.write(f"new {instance!r}")
+
+
+class TracedLoxFunction(LoxFunction):
+    def invoke(
+        self,
+        interpreter: Interpreter,
+        this: LoxInstance | None,
+        arguments: list[object],
+    ) -> None | object:
+        tracer = typing.cast(TracingInterpreter, interpreter).tracer
+        tracer.call_enter(self, arguments)
+        result = None
+        try:
+            result = super().invoke(interpreter, this, arguments)
+            return result
+        finally:
+            tracer.call_exit(self, result)
+
+
+class TracedLoxClass(LoxClass):
+    def call(self, interpreter: Interpreter, arguments: list[object]) -> None | object:
+        tracer = typing.cast(TracingInterpreter, interpreter).tracer
+        tracer.call_enter(self, arguments)
+        instance = None
+        try:
+            instance = super().call(interpreter, arguments)
+            tracer.instance_created(typing.cast(LoxInstance, instance))
+            return instance
+        finally:
+            tracer.call_exit(self, instance)
+
+
+def overrides(tracer: Tracer, *events: str) -> bool:
+    return any(
+        getattr(type(tracer), event) is not getattr(Tracer, event) for event in events
+    )
+
+
+class TracingInterpreter(Interpreter):
+    """
+    Statements and variable accesses are far more frequent than calls, when
+    the tracer ignores them the untraced Interpreter methods are put back on
+    the instance so they cost nothing either.
+    """
+
+    tracer: Tracer
+    lox_function = TracedLoxFunction
+    lox_class = TracedLoxClass
+
+    def __init__(self, tracer: Tracer, output: Output | None = None):
+        super().__init__(output)
+        self.tracer = tracer
+        untraced = super()
+        if not overrides(tracer, "execute", "executed"):
+            self.execute = untraced.execute
+        if not overrides(tracer, "variable_read"):
+            self.lookup_variable = untraced.lookup_variable
+        if not overrides(tracer, "variable_write"):
+            self.visit_AssignExpr = untraced.visit_AssignExpr
+            self.define = untraced.define
+
+    def execute(self, statement: stmnt.Stmnt) -> Completion | None:
+        tracer = self.tracer
+        tracer.execute(statement)
+        try:
+            return statement.accept(self)
+        finally:
+            tracer.executed(statement)
+
+    def lookup_variable(self, name: Token, expr: Expr.Variable | Expr.This):
+        value = super().lookup_variable(name, expr)
+        self.tracer.variable_read(name, value)
+        return value
+
+    def visit_AssignExpr(self, expr: Expr.Assign) -> object:
+        value = super().visit_AssignExpr(expr)
+        self.tracer.variable_write(expr.name, value)
+        return value
+
+    def define(self, name: Token, slot: int | None, value: object):
+        super().define(name, slot, value)
+        self.tracer.variable_write(name, value)
@@ -0,0 +1,36 @@
+import pylox.error_handling  # noqa: F401 (imported first to settle the import cycle)
+import pylox.Expr as Expr
+import pylox.Stmnt as stmnt
+import pylox.lox_parser as lox_parser
+import pylox.lox_scanner as lox_scanner
+
+
+def node_classes(module) -> list[type]:
+    return [
+        value
+        for value in vars(module).values()
+        if isinstance(value, type)
+        and value.__module__ == module.__name__
+        and hasattr(value, "__match_args__")
+    ]
+
+
+def test_nodes_have_slots_and_kinds():
+    for module in (Expr, stmnt):
+        classes = node_classes(module)
+        assert classes
+        assert sorted(cls.kind for cls in classes) == list(range(len(classes)))
+        for cls in classes:
+            assert "__dict__" not in dir(cls), cls
+            assert set(cls.__match_args__) <= set(cls.__slots__)
+
+
+def test_match_on_parsed_nodes():
+    tokens = lox_scanner.Scanner("var a = b.c + 1;").scan_tokens()
+    (declaration,) = lox_parser.Parser(tokens).parse()
+    match declaration:
+        case stmnt.Var(name, Expr.Binary(Expr.Get(_, field), _, Expr.Literal(value))):
+            assert (name.lexeme, field.lexeme, value) == ("a", "c", 1.0)
+        case _:
+            raise AssertionError(declaration)
+    assert declaration.slot is None
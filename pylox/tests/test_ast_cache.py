@@ -0,0 +1,107 @@
+import threading
+
+from click.testing import CliRunner
+
+import pylox.__main__ as lox
+import pylox.ast_cache as ast_cache
+import pylox.error_handling as errors
+import pylox.lox_parser as lox_parser
+
+SOURCE = """
+fun make(n) {
+  var seen = n;
+  fun get() { return seen; }
+  return get;
+}
+class A { init(x) { this.x = x; } sum(y) { return this.x + y; } }
+print make(3)();
+print A(1).sum(2);
+"""
+
+
+def run_script(script, capsys, engine="interpreter") -> tuple[str, str]:
+    errors.had_error = False
+    lox.run(script.read_text(), engine=engine, script=script)
+    captured = capsys.readouterr()
+    errors.had_error = False
+    return captured.out, captured.err
+
+
+def test_cache_hit_skips_the_front_end(tmp_path, capsys, monkeypatch):
+    script = tmp_path / "script.lox"
+    script.write_text(SOURCE)
+    assert run_script(script, capsys) == ("3\n3\n", "")
+    assert ast_cache.cache_path(script).exists()
+
+    def parse(self):
+        raise AssertionError("the cached program should have been used")
+
+    monkeypatch.setattr(lox_parser.Parser, "parse", parse)
+    for engine in lox.ENGINES:
+        assert run_script(script, capsys, engine) == ("3\n3\n", ""), engine
+
+
+def test_changed_or_damaged_entries_are_rebuilt(tmp_path, capsys):
+    script = tmp_path / "script.lox"
+    script.write_text(SOURCE)
+    run_script(script, capsys)
+
+    script.write_text(SOURCE + 'print "more";\n')
+    assert ast_cache.load(script, script.read_text()) is None
+    assert run_script(script, capsys) == ("3\n3\nmore\n", "")
+    assert ast_cache.load(script, script.read_text()) is not None
+
+    path = ast_cache.cache_path(script)
+    path.write_bytes(path.read_bytes()[:100])
+    assert ast_cache.load(script, script.read_text()) is None
+    assert run_script(script, capsys) == ("3\n3\nmore\n", "")
+
+
+def test_programs_with_errors_are_not_cached(tmp_path, capsys):
+    script = tmp_path / "script.lox"
+    script.write_text("fun f() { return x }")
+    run_script(script, capsys)
+    assert not ast_cache.cache_path(script).exists()
+
+
+def test_concurrent_writers(tmp_path):
+    script = tmp_path / "script.lox"
+    script.write_text(SOURCE)
+    statements = lox_parser.Parser(lox.scan.Scanner(SOURCE).scan_tokens()).parse()
+    failures = []
+
+    def writer():
+        for _ in range(20):
+            ast_cache.store(script, SOURCE, statements)
+
+    def reader():
+        for _ in range(20):
+            loaded = ast_cache.load(script, SOURCE)
+            if loaded is not None and len(loaded) != len(statements):
+                failures.append(loaded)
+
+    threads = [threading.Thread(target=writer) for _ in range(4)]
+    threads += [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    assert ast_cache.load(script, SOURCE) is not None
+    assert list(ast_cache.cache_path(script).parent.iterdir()) == [
+        ast_cache.cache_path(script)
+    ]
+
+
+def test_run_file_streams_the_mapped_file(tmp_path):
+    script = tmp_path / "script.lox"
+    script.write_text(SOURCE + 'print "é";\n')
+    empty = tmp_path / "empty.lox"
+    empty.write_text("")
+    runner = CliRunner()
+    for arguments in (["--no-cache"], [], []):
+        result = runner.invoke(lox.lox, ["run-file", *arguments, str(script)])
+        assert result.output == "3\n3\né\n"
+    result = runner.invoke(lox.lox, ["run-file", str(empty)])
+    assert (result.exit_code, result.output) == (0, "")
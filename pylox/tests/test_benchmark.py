@@ -0,0 +1,68 @@
+import json
+
+from click.testing import CliRunner
+
+import pylox.__main__ as lox
+import pylox.benchmark as benchmark
+
+
+def test_every_benchmark_has_a_script():
+    scripts = {path.stem for path in benchmark.SCRIPTS_DIR.glob("*.lox")}
+    assert scripts == set(benchmark.BENCHMARKS)
+
+
+def test_summarize_and_compare():
+    summary = benchmark.summarize([0.5, 0.1, 0.2, 0.3, 0.4])
+    assert summary["median"] == 0.3
+    assert summary["p10"] < summary["median"] < summary["p90"]
+    assert benchmark.summarize([0.2])["p90"] == 0.2
+
+    baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}}
+    current = {
+        "a": {"median": 1.05},
+        "b": {"median": 1.5},
+        "new": {"median": 9.0},
+    }
+    assert benchmark.regressions(current, baseline, threshold=0.1) == ["b"]
+    assert benchmark.regressions(current, baseline, threshold=0.6) == []
+
+
+def test_bench_command_saves_and_compares(tmp_path):
+    runner = CliRunner()
+    saved = tmp_path / "base.json"
+    result = runner.invoke(
+        lox.lox,
+        ["bench", "fib", "equality", "--runs", "2", "--warmup", "0", "-o", saved],
+    )
+    assert result.exit_code == 0, result.output
+    assert result.stdout.splitlines()[0].split() == [
+        "benchmark",
+        "median",
+        "p10",
+        "p90",
+    ]
+
+    results = json.loads(saved.read_text())
+    assert results["engine"] == "interpreter"
+    assert list(results["benchmarks"]) == ["fib", "equality"]
+    assert len(results["benchmarks"]["fib"]["times"]) == 2
+
+    result = runner.invoke(
+        lox.lox, ["bench", "fib", "--runs", "1", "--baseline", saved]
+    )
+    assert "change" in result.stdout
+    # a baseline ten times slower can't be missed by this much
+    results["benchmarks"]["fib"]["median"] *= 10
+    saved.write_text(json.dumps(results))
+    result = runner.invoke(
+        lox.lox, ["bench", "fib", "--runs", "1", "--baseline", saved]
+    )
+    assert result.exit_code == 0, result.output
+
+    results["benchmarks"]["fib"]["median"] /= 1000
+    saved.write_text(json.dumps(results))
+    result = runner.invoke(
+        lox.lox, ["bench", "fib", "--runs", "1", "--baseline", saved]
+    )
+    assert result.exit_code == 1
+    assert "slower than the baseline by more than 10%: fib" in result.output
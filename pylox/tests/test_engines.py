@@ -0,0 +1,397 @@
+import pathlib
+
+import pylox.__main__ as lox
+import pylox.error_handling as errors
+import pylox.lox_compiler as lox_compiler
+import pylox.lox_parser as lox_parser
+import pylox.lox_scanner as lox_scanner
+import pylox.lox_vm as lox_vm
+from pylox.interpreter import Resolver
+
+SCRIPTS = pathlib.Path(__file__).parent.parent / "lox_scripts"
+
+# time_fib prints wall clock time so its output is never stable
+SKIPPED_SCRIPTS = {"time_fib.lox"}
+
+
+def run_with(engine: str, source: str, capsys) -> tuple[str, str]:
+    errors.had_error = False
+    lox.run(source, engine=engine)
+    captured = capsys.readouterr()
+    errors.had_error = False
+    return captured.out, captured.err
+
+
+def assert_same_output(source: str, capsys):
+    expected = run_with("interpreter", source, capsys)
+    for engine in lox.ENGINES:
+        assert run_with(engine, source, capsys) == expected, engine
+
+
+def test_lox_scripts_match_interpreter(capsys):
+    for script in sorted(SCRIPTS.glob("*.lox")):
+        if script.name in SKIPPED_SCRIPTS:
+            continue
+        assert_same_output(script.read_text(), capsys)
+
+
+def test_closures_capture_per_iteration(capsys):
+    source = """
+fun make() {
+  var first = nil;
+  for (var i = 0; i < 3; i = i + 1) {
+    var j = i;
+    fun show() { print j; }
+    if (first == nil) first = show; else show();
+  }
+  return first;
+}
+make()();
+"""
+    assert run_with("vm", source, capsys)[0] == "1\n2\n0\n"
+    assert_same_output(source, capsys)
+
+
+def test_classes_and_super(capsys):
+    source = """
+class A {
+  init(x) { this.x = x; }
+  get() { return this.x; }
+}
+class B < A {
+  init(x) { super.init(x * 2); }
+  get() { return super.get() + 1; }
+}
+var b = B(5);
+print b.get();
+var m = b.get;
+print m();
+print m;
+print B;
+print b;
+print B(1).init(4).x;
+"""
+    assert run_with("vm", source, capsys)[0] == (
+        "11\n11\n<fn get >\nB\nB instance\n8\n"
+    )
+    assert_same_output(source, capsys)
+
+
+def test_logic_and_equality(capsys):
+    source = """
+print true and false;
+print nil or "x";
+print "y" or nil;
+print !true;
+print !nil;
+print 1 == 1;
+print nil == false;
+print "a" != "b";
+print 10 / 4;
+print -(3);
+"""
+    assert run_with("vm", source, capsys)[0] == (
+        "False\nx\ny\nFalse\nTrue\nTrue\nFalse\nTrue\n2.5\n-3\n"
+    )
+    assert_same_output(source, capsys)
+
+
+def test_runtime_errors(capsys):
+    for source in [
+        'print 1 + "a";',
+        "print -nil;",
+        "print undefined;",
+        "undefined = 1;",
+        "var a = 1; a();",
+        "fun f(a) {} f();",
+        "class A {} A(1);",
+        "class A {} print A().missing;",
+        "var a = 1; a.b = 2;",
+        "var NotAClass = 1; class A < NotAClass {}",
+    ]:
+        out, err = run_with("vm", source, capsys)
+        assert err != ""
+        assert_same_output(source, capsys)
+
+
+def test_deeply_nested_scopes(capsys):
+    source = """
+fun outer() {
+  var a = "a";
+  {
+    var b = "b";
+    {
+      var c = "c";
+      {
+        a = a + b + c;
+        fun inner() { return a + b + c; }
+        print inner();
+      }
+    }
+  }
+  return a;
+}
+print outer();
+"""
+    assert run_with("closure", source, capsys)[0] == "abcbc\nabc\n"
+    assert_same_output(source, capsys)
+
+
+def test_return_unwinds_loops_and_blocks(capsys):
+    source = """
+fun find(limit) {
+  for (var i = 0; i < 10; i = i + 1) {
+    {
+      while (true) {
+        if (i == limit) return i;
+        break_out();
+      }
+    }
+  }
+  return nil;
+}
+fun break_out() {}
+print find(0);
+fun early() { if (true) { return "early"; } print "unreachable"; }
+print early();
+fun none() { return; }
+print none();
+"""
+    assert run_with("interpreter", source, capsys)[0] == "0\nearly\nnil\n"
+    assert_same_output(source, capsys)
+
+
+def test_property_access_across_shapes(capsys):
+    source = """
+class Point {
+  init(x, y) { this.x = x; this.y = y; }
+  sum() { return this.x + this.y; }
+}
+class Other {}
+fun show(obj) { print obj.x; }
+var a = Point(1, 2);
+var b = Other();
+b.y = "y first";
+b.x = "x second";
+var c = Other();
+c.x = "only x";
+var d = Other();
+d.sum = "field shadows nothing";
+d.x = 4;
+var e = Point(5, 6);
+e.sum = "field shadows method";
+var f = Other();
+f.z = 1;
+f.x = 6;
+for (var i = 0; i < 2; i = i + 1) {
+  show(a); show(b); show(c); show(d); show(e); show(f);
+}
+print a.sum();
+print e.sum;
+a.x = 10;
+print a.sum();
+print Other().x;
+"""
+    assert run_with("interpreter", source, capsys)[0].startswith(
+        "1\nx second\nonly x\n4\n5\n6\n"
+    )
+    assert_same_output(source, capsys)
+
+
+def test_deep_inheritance(capsys):
+    source = """
+class A {
+  init(name) { this.name = name; }
+  who() { return "A " + this.name; }
+  greet() { return "hi from " + this.who(); }
+}
+class B < A { who() { return "B " + super.who(); } }
+class C < B {}
+class D < C { who() { return "D " + super.who(); } }
+var d = D("d");
+print d.greet();
+print d.who();
+print C("c").greet();
+print D;
+D(1, 2);
+"""
+    assert run_with("interpreter", source, capsys)[0] == (
+        "hi from D B A d\nD B A d\nhi from B A c\nD\n"
+    )
+    assert_same_output(source, capsys)
+
+
+def test_method_calls_and_bound_methods(capsys):
+    source = """
+fun twice(x) { return x * 2; }
+class Box {
+  init(v) { this.v = v; this.fn = twice; }
+  add(n) { return this.v + n; }
+  adder() { return this.add; }
+}
+var box = Box(1);
+print box.add(2);
+var add = box.adder();
+print add(3);
+print box.fn(4);
+var init = box.init;
+print init(7).v;
+print box.add(1);
+box.v = "not callable";
+box.v();
+"""
+    assert run_with("interpreter", source, capsys)[0] == "3\n4\n8\n7\n8\n"
+    assert_same_output(source, capsys)
+    assert_same_output("class A { m(a) {} } A().m(1, 2);", capsys)
+    assert_same_output("class A {} A().missing(1);", capsys)
+
+
+def test_captured_variables_and_bound_methods(capsys):
+    source = """
+fun counter() {
+  var n = 0;
+  fun inc() { n = n + 1; return n; }
+  return inc;
+}
+var c = counter();
+c();
+print c();
+fun params(a, b) { fun f() { a = a + b; return a; } return f; }
+var p = params(1, 2);
+p();
+print p();
+{
+  fun rec(k) { if (k > 0) return rec(k - 1); return "done"; }
+  print rec(3);
+  class Node {
+    init(v) { this.v = v; }
+    make(v) { return Node(v); }
+    outer() { fun inner() { return this.v; } return inner; }
+  }
+  print Node(1).make(2).v;
+  print Node(5).outer()();
+}
+class A { m() { return "A.m"; } }
+class B < A { m() { fun f() { return super.m(); } return f(); } }
+var b = B();
+print b.m();
+print b.m == b.m;
+var m = b.m;
+print m == m;
+print m;
+print clock;
+"""
+    assert run_with("python", source, capsys)[0] == (
+        "2\n5\ndone\n2\n5\nA.m\nFalse\nTrue\n<fn m >\n<native fn>\n"
+    )
+    assert_same_output(source, capsys)
+
+
+def test_python_engine_maps_errors_to_lox_lines(capsys):
+    source = """
+fun f() {
+  return
+    missing;
+}
+print "before";
+f();
+"""
+    out, err = run_with("python", source, capsys)
+    assert out == "before\n"
+    assert err == "Undefined variable 'missing'\n[line 3]\n"
+    assert_same_output(source, capsys)
+
+
+def test_python_engine_maps_any_error_to_lox_lines(capsys):
+    source = """
+fun f() {
+  return 1 /
+    0;
+}
+print "before";
+f();
+"""
+    out, err = run_with("python", source, capsys)
+    assert out == "before\n"
+    assert err == "ZeroDivisionError: float division by zero\n[line 2]\n"
+
+
+def test_property_names_cant_reach_python_attributes(capsys):
+    for source in [
+        "class B { __eq_(o) { return true; } } print B() == 1;",
+        "class A { init() { this.__class_ = 1; } } A(); print A().__class_;",
+        "class A {} var a = A(); print a.__dict_;",
+        "class A { __init_() { return 1; } } print A().__init_();",
+    ]:
+        out, err = run_with("interpreter", source, capsys)
+        assert "Traceback" not in err
+        assert_same_output(source, capsys)
+
+
+def test_vm_recursion_is_not_limited_by_python(capsys):
+    source = """
+fun count(n) {
+  if (n == 0) return 0;
+  return 1 + count(n - 1);
+}
+print count(100000);
+"""
+    assert run_with("vm", source, capsys) == ("100000\n", "")
+
+
+def test_vm_tail_calls_run_in_constant_space(capsys):
+    source = """
+fun loop(n, acc) {
+  if (n == 0) return acc;
+  return loop(n - 1, acc + 1);
+}
+class Counter {
+  init(limit) { this.limit = limit; }
+  down(n) {
+    if (n == 0) return depth();
+    return this.down(n - 1);
+  }
+}
+fun make(n) {
+  fun inner() { return n; }
+  if (n == 0) return inner;
+  return make(n - 1);
+}
+print loop(10000, 0);
+print Counter(5).down(10000);
+print make(100)();
+"""
+    vm = lox_vm.VM()
+    vm.lox_globals["depth"] = lox_vm.NativeFunction(
+        "depth", 0, lambda: float(len(vm.frames))
+    )
+    statements = lox_parser.Parser(lox_scanner.Scanner(source).scan_tokens()).parse()
+    Resolver().resolve(statements)
+    vm.interpret(lox_compiler.compile_program(statements))
+    # only the script frame and one frame for Counter.down are left
+    assert capsys.readouterr() == ("10000\n2\n0\n", "")
+
+
+def test_addition_chains(capsys):
+    source = """
+fun show(value) {
+  print value;
+  return value;
+}
+print "a" + show("b") + "c" + show("d");
+print 1 + show(2) + 3;
+var s = "";
+for (var i = 0; i < 3; i = i + 1) s = s + i + ",";
+"""
+    assert run_with("interpreter", source, capsys) == (
+        "b\nd\nabcd\n2\n6\n",
+        "Operatnds must be two numbers or two strings\n[line 8]\n",
+    )
+    assert_same_output(source, capsys)
+    for source in [
+        'print "a" + "b" + show(1) + "c";',
+        'print 1 + 2 + show("a");',
+        'print "a" + (1 + 2) + "b";',
+    ]:
+        source = "fun show(value) { print value; return value; }\n" + source
+        assert_same_output(source, capsys)
@@ -0,0 +1,417 @@
+import pytest
+
+import pylox.__main__ as lox
+import pylox.natives as natives
+from tests.test_engines import assert_same_output, run_with
+
+
+def test_array(capsys):
+    source = """
+var a = Array(3);
+print a;
+a.set(0, 3);
+a.set(1, 1);
+print a.set(2, 2);
+a.append(10);
+print a.length();
+a.sort();
+print a;
+print a.get(3);
+var s = a.slice(1, 3);
+s.fill("x");
+print s;
+print a;
+print a.slice(4, 4);
+var get = a.get;
+print get;
+print get(0);
+print clock;
+var words = Array(0);
+words.append("b");
+words.append("a");
+words.sort();
+print words;
+"""
+    out, err = run_with("interpreter", source, capsys)
+    assert err == ""
+    assert out.splitlines() == [
+        "[nil, nil, nil]",
+        "2",
+        "4",
+        "[1, 2, 3, 10]",
+        "10",
+        "[x, x]",
+        "[1, 2, 3, 10]",
+        "[]",
+        "<native fn>",
+        "1",
+        "<native fn>",
+        "[a, b]",
+    ]
+    assert_same_output(source, capsys)
+
+
+def test_array_errors(capsys):
+    for source in [
+        "Array(-1);",
+        "Array(1.5);",
+        'Array("a");',
+        "Array(2).get(2);",
+        "Array(2).get(-1);",
+        "Array(2).set(0.5, 1);",
+        "Array(2).slice(1, 0);",
+        "Array(2).slice(0, 3);",
+        "Array(2).missing();",
+        "print Array(2).missing;",
+        "Array(2).get();",
+        "var get = Array(2).get; get(1, 2);",
+        'var a = Array(2); a.set(0, "a"); a.set(1, 2); a.sort();',
+        "var a = Array(1); a.sort();",
+        "Array(1).x = 1;",
+        "fun f(a) {\n  return a.get(5);\n}\nf(Array(1));",
+    ]:
+        out, err = run_with("interpreter", source, capsys)
+        assert err != "", source
+        assert_same_output(source, capsys)
+
+
+def test_native_methods_are_collected():
+    assert set(natives.LoxArray.methods) == {
+        "get",
+        "set",
+        "length",
+        "append",
+        "sort",
+        "slice",
+        "fill",
+    }
+    assert natives.LoxArray.methods["set"].arity() == 2
+    with pytest.raises(natives.NativeError, match="out of bounds"):
+        natives.array(1.0).get_(1.0)
+
+
+def test_map(capsys):
+    source = """
+class A {}
+var a = A();
+var m = Map();
+m.set("x", 1);
+m.set(1, "one");
+m.set(true, "yes");
+m.set(nil, "nothing");
+print m.set(a, "a");
+print m.get(1);
+print m.get(true);
+print m.get(nil);
+print m.get(a);
+print m.get(A());
+print m.has(false);
+print m.size();
+print m.delete("x");
+print m.delete("x");
+print m.keys();
+print m;
+var n = Map();
+n.set("k", n.get("k"));
+print n.has("k");
+"""
+    out, err = run_with("interpreter", source, capsys)
+    assert err == ""
+    assert out.splitlines() == [
+        "a",
+        "one",
+        "yes",
+        "nothing",
+        "a",
+        "nil",
+        "False",
+        "5",
+        "True",
+        "False",
+        "[1, True, nil, A instance]",
+        "{1: one, True: yes, nil: nothing, A instance: a}",
+        "True",
+    ]
+    assert_same_output(source, capsys)
+
+
+def test_map_keeps_bools_apart_from_numbers():
+    m = natives.lox_map()
+    m.set_(1.0, "one")
+    m.set_(True, "true")
+    m.set_(0.0, "zero")
+    assert m.get_(1.0) == "one"
+    assert m.get_(True) == "true"
+    assert m.get_(False) is None
+    assert m.keys_().items == [1.0, True, 0.0]
+
+
+def test_map_errors(capsys):
+    for source in [
+        "Map(1);",
+        "Map().get();",
+        "Map().missing(1);",
+    ]:
+        out, err = run_with("interpreter", source, capsys)
+        assert err != "", source
+        assert_same_output(source, capsys)
+
+
+def test_strings(capsys):
+    source = """
+var s = "hello, lox world";
+print len(s);
+print substr(s, 7, 10);
+print substr(s, 16, 16);
+print charAt(s, 0);
+print indexOf(s, "lox");
+print indexOf(s, "nope");
+var words = split(s, " ");
+print words;
+print join(words, "-");
+print split("abc", "");
+print join(Array(0), ",");
+"""
+    out, err = run_with("interpreter", source, capsys)
+    assert err == ""
+    assert out.splitlines() == [
+        "16",
+        "lox",
+        "",
+        "h",
+        "7",
+        "-1",
+        "[hello,, lox, world]",
+        "hello,-lox-world",
+        "[a, b, c]",
+        "",
+    ]
+    assert_same_output(source, capsys)
+
+
+def test_string_builder(capsys):
+    source = """
+var b = StringBuilder();
+print b.toString() == "";
+for (var i = 0; i < 3; i = i + 1) b.append(i).append(",");
+b.append(nil).append(true);
+print b.length();
+print b.toString();
+print b.toString();
+print b.append("!");
+"""
+    out, err = run_with("interpreter", source, capsys)
+    assert err == ""
+    assert out.splitlines() == [
+        "True",
+        "13",
+        "0,1,2,nilTrue",
+        "0,1,2,nilTrue",
+        "0,1,2,nilTrue!",
+    ]
+    assert_same_output(source, capsys)
+
+
+@pytest.mark.parametrize("engine", lox.ENGINES)
+def test_natives_show_values_like_the_engine(engine, capsys):
+    source = """
+fun f() {}
+class A {}
+var a = Array(3);
+a.set(0, f);
+a.set(1, A);
+a.set(2, clock);
+print a;
+var m = Map();
+m.set(f, A);
+print m;
+print StringBuilder().append(f).append(A).append(1).toString();
+"""
+    out, err = run_with(engine, source, capsys)
+    assert err == ""
+    assert out.splitlines() == [
+        "[<fn f >, A, <native fn>]",
+        "{<fn f >: A}",
+        "<fn f >A1",
+    ]
+
+
+def test_string_errors(capsys):
+    for source in [
+        "len(1);",
+        'substr("abc", 2, 1);',
+        'substr("abc", 0, 4);',
+        'charAt("abc", 3);',
+        'charAt("abc", 0.5);',
+        'indexOf("abc", nil);',
+        'split("a b", 1);',
+        'join("a", ",");',
+        'var a = Array(1); a.set(0, 1); join(a, ",");',
+    ]:
+        out, err = run_with("interpreter", source, capsys)
+        assert err != "", source
+        assert_same_output(source, capsys)
+
+
+requires_numpy = pytest.mark.skipif(not natives.HAS_NUMPY, reason="needs NumPy")
+
+
+@requires_numpy
+def test_vec(capsys):
+    source = """
+var v = range(0, 5, 1);
+var w = Vec(5);
+w.set(0, 10);
+print v + w;
+print v * 2;
+print 1 - v;
+print v / v;
+print v + 1 + 2 + w;
+print v.sum();
+print v.min();
+print v.max();
+print v.mean();
+print v.dot(v);
+var s = v.slice(1, 3);
+s.set(0, 100);
+print v;
+print s.length();
+print v.get(1) + 1;
+var a = Array(2);
+a.set(0, 1.5);
+a.set(1, 2);
+print Vec(a);
+print Vec(a).toArray();
+print v == v;
+"""
+    out, err = run_with("interpreter", source, capsys)
+    assert err == ""
+    assert out.splitlines() == [
+        "[10, 1, 2, 3, 4]",
+        "[0, 2, 4, 6, 8]",
+        "[1, 0, -1, -2, -3]",
+        "[nan, 1, 1, 1, 1]",
+        "[13, 4, 5, 6, 7]",
+        "10",
+        "0",
+        "4",
+        "2",
+        "30",
+        "[0, 100, 2, 3, 4]",
+        "2",
+        "101",
+        "[1.5, 2]",
+        "[1.5, 2]",
+        "True",
+    ]
+    assert_same_output(source, capsys)
+
+
+@requires_numpy
+def test_vec_errors(capsys):
+    for source in [
+        "print Vec(2) + Vec(3);",
+        'print "a" + Vec(1);',
+        "print Vec(1) < 1;",
+        "print -Vec(1);",
+        'print Vec("x");',
+        "range(0, 1, 0);",
+        "Vec(0).min();",
+        'Vec(1).set(0, "a");',
+        "print Vec(1) + nil;",
+        'print Vec(1) + 1 + "a";',
+        "print Vec(2).dot(Vec(3));",
+    ]:
+        out, err = run_with("interpreter", source, capsys)
+        assert err != "", source
+        assert_same_output(source, capsys)
+
+
+@pytest.mark.parametrize("engine", lox.ENGINES)
+def test_vec_without_numpy(engine, monkeypatch, capsys):
+    monkeypatch.setattr(natives, "HAS_NUMPY", False)
+    for source, name in [("Vec(1);", "Vec"), ("range(0, 1, 1);", "range")]:
+        out, err = run_with(engine, source, capsys)
+        assert err.startswith(f"{name} needs NumPy installed.\n"), source
+
+
+def test_files(tmp_path, capsys):
+    data = tmp_path / "data.txt"
+    data.write_bytes("first line\r\nsecond, with é\n\nlast".encode())
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    source = f"""
+print len(readFile("{data}"));
+var b = mapFile("{data}");
+print b;
+print b.get(0);
+print b.slice(0, 5).text();
+print b.indexOf("second");
+var s = b.slice(12, 30);
+print s.indexOf("with");
+print s.lines().next().text();
+var reader = b.lines();
+var line = reader.next();
+while (line != nil) {{
+  print line.text() + "|";
+  line = reader.next();
+}}
+var r = lines("{data}");
+var l = r.next();
+while (l != nil) {{
+  print l + "|";
+  l = r.next();
+}}
+print r.next();
+print mapFile("{empty}").length();
+print lines("{empty}").next();
+"""
+    out, err = run_with("interpreter", source, capsys)
+    assert err == ""
+    assert out.splitlines() == [
+        "31",
+        "<buffer 33 bytes>",
+        "102",
+        "first",
+        "12",
+        "8",
+        "second, with é",
+        "first line|",
+        "second, with é|",
+        "|",
+        "last|",
+        "first line|",
+        "second, with é|",
+        "|",
+        "last|",
+        "nil",
+        "0",
+        "nil",
+    ]
+    assert_same_output(source, capsys)
+
+
+def test_lines_close_the_file(tmp_path):
+    data = tmp_path / "data.txt"
+    data.write_text("a\nb\n")
+    reader = natives.lines(str(data))
+    assert reader.next_() == "a"
+    reader.close_()
+    assert reader.next_() is None
+
+
+def test_file_errors(tmp_path, capsys):
+    missing = tmp_path / "missing.txt"
+    for source in [
+        f'readFile("{missing}");',
+        f'mapFile("{missing}");',
+        f'lines("{missing}");',
+        "readFile(1);",
+        f'mapFile("{tmp_path}").get(0);',
+        'readFile("a\0b");',
+        'mapFile("a\0b");',
+        'lines("a\0b");',
+    ]:
+        out, err = run_with("interpreter", source, capsys)
+        assert err != "", source
+        assert_same_output(source, capsys)
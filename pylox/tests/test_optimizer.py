@@ -0,0 +1,101 @@
+import pylox.__main__ as lox
+import pylox.Expr as Expr
+import pylox.Stmnt as stmnt
+import pylox.error_handling as errors
+import pylox.lox_parser as lox_parser
+import pylox.lox_scanner as lox_scanner
+from pylox.interpreter import Resolver
+from pylox.optimizer import optimize
+from tests.test_engines import SCRIPTS, SKIPPED_SCRIPTS
+
+
+def optimized(source: str) -> list[stmnt.Stmnt]:
+    errors.had_error = False
+    tokens = lox_scanner.Scanner(source).scan_tokens()
+    statements = lox_parser.Parser(tokens).parse()
+    Resolver().resolve(statements)
+    assert not errors.had_error
+    return optimize(statements)
+
+
+def run_optimized(engine: str, source: str, capsys) -> tuple[str, str]:
+    errors.had_error = False
+    lox.run(source, engine=engine, optimize=True)
+    captured = capsys.readouterr()
+    errors.had_error = False
+    return captured.out, captured.err
+
+
+def test_folds_constant_expressions():
+    statements = optimized("""
+print 1 + 2 * 3;
+print "a" + "b";
+print !true;
+print -(4);
+print (1 < 2) == true;
+print nil or "x";
+print false and undefined;
+""")
+    values = [statement.expression for statement in statements]
+    assert all(isinstance(value, Expr.Literal) for value in values)
+    assert [value.value for value in values] == [
+        7.0,
+        "ab",
+        False,
+        -4.0,
+        True,
+        "x",
+        False,
+    ]
+
+
+def test_keeps_expressions_that_fail_at_runtime():
+    for source in ['print 1 + "a";', "print -nil;", "print 1 / 0;"]:
+        (print_statement,) = optimized(source)
+        assert not isinstance(print_statement.expression, Expr.Literal)
+
+
+def test_prunes_constant_branches():
+    if_then, if_else, loop = optimized("""
+if (1 < 2) print "then"; else print "else";
+if (nil) print "then"; else print "else";
+while (false) print "never";
+while (1 > 2) print "never";
+if (false) print "never";
+{
+  while (true and nil) print "never";
+}
+""")
+    assert if_then.expression.value == "then"
+    assert if_else.expression.value == "else"
+    assert isinstance(loop, stmnt.Block)
+    assert loop.statements == []
+
+
+def test_optimized_scripts_match_interpreter(capsys):
+    for script in sorted(SCRIPTS.glob("*.lox")):
+        if script.name in SKIPPED_SCRIPTS:
+            continue
+        source = script.read_text()
+        lox.run(source)
+        expected = capsys.readouterr()
+        for engine in lox.ENGINES:
+            assert run_optimized(engine, source, capsys) == (
+                expected.out,
+                expected.err,
+            ), engine
+
+
+def test_runtime_errors_survive_folding(capsys):
+    source = """
+print "before";
+print 2 * (3 + "x");
+"""
+    lox.run(source)
+    expected = capsys.readouterr()
+    assert expected.err != ""
+    for engine in lox.ENGINES:
+        assert run_optimized(engine, source, capsys) == (
+            expected.out,
+            expected.err,
+        ), engine
@@ -0,0 +1,90 @@
+import io
+
+from click.testing import CliRunner
+
+import pylox.__main__ as lox
+import pylox.error_handling as errors
+from pylox.output import Output, format_number
+
+
+class Writes(io.StringIO):
+    """
+    Remembers what every write to the stream was.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, text):
+        self.writes.append(text)
+        return super().write(text)
+
+
+def test_flushes_on_size_lines_and_exit():
+    stream = Writes()
+    output = Output(stream, buffer_size=10)
+    output.write_line("abc")
+    output.write_line("def")
+    assert stream.writes == []
+    output.write_line("ghi")
+    assert stream.writes == ["abc\ndef\nghi\n"]
+    output.write_line("j")
+    output.flush()
+    output.flush()
+    assert stream.getvalue() == "abc\ndef\nghi\nj\n"
+    assert len(stream.writes) == 2
+
+    stream = Writes()
+    output = Output(stream, flush_lines=2)
+    for line in "abcde":
+        output.write_line(line)
+    assert stream.writes == ["a\nb\n", "c\nd\n"]
+
+
+def test_every_engine_prints_to_the_output(capsys):
+    source = "print 1; print 2.5; print nil; print -0; print 10000000000000000;"
+    for engine in lox.ENGINES:
+        sink = io.StringIO()
+        lox.run(source, engine=engine, output=Output(sink))
+        assert sink.getvalue() == "1\n2.5\nnil\n0\n1e+16\n", engine
+    assert capsys.readouterr() == ("", "")
+
+
+def test_output_is_flushed_before_a_runtime_error(capsys):
+    for engine in lox.ENGINES:
+        stream = Writes()
+        lox.run('print "before"; print -nil;', engine=engine, output=Output(stream))
+        assert stream.writes == ["before\n"], engine
+        errors.had_error = False
+    capsys.readouterr()
+
+
+def test_format_number():
+    for value, text in [
+        (0.0, "0"),
+        (-0.0, "0"),
+        (3.0, "3"),
+        (-12.0, "-12"),
+        (2.5, "2.5"),
+        (9999999999999998.0, "9999999999999998"),
+        (1e16, "1e+16"),
+        (1e20, "1e+20"),
+        (1e-7, "1e-07"),
+        (float("inf"), "inf"),
+    ]:
+        assert format_number(value) == text
+
+
+def test_print_to_a_file(tmp_path):
+    script = tmp_path / "print.lox"
+    script.write_text("for (var i = 0; i < 3; i = i + 1) print i;")
+    printed = tmp_path / "out.txt"
+    runner = CliRunner()
+    result = runner.invoke(
+        lox.lox,
+        ["run-file", str(script), "--print-to", str(printed), "--flush-lines", "1"],
+    )
+    assert result.exit_code == 0, result.output
+    assert result.stdout == ""
+    assert printed.read_text() == "0\n1\n2\n"
@@ -0,0 +1,76 @@
+import random
+
+import pylox.error_handling as errors
+from pylox.lox_parser import Parser, PrattParser
+from pylox.lox_scanner import RegexScanner
+from pylox.tokens import Token
+from tests.test_engines import SCRIPTS
+
+
+def shape(node: object) -> object:
+    """
+    A comparable view of an AST: nodes become tuples of their fields and
+    tokens their type, lexeme and line.
+    """
+    if isinstance(node, list):
+        return [shape(item) for item in node]
+    if isinstance(node, Token):
+        return (node.token_type, node.lexeme, node.line)
+    if hasattr(node, "__match_args__"):
+        return (type(node).__name__,) + tuple(
+            shape(getattr(node, name)) for name in node.__match_args__
+        )
+    return node
+
+
+def parse(parser: type[Parser], source: str, capsys) -> tuple[object, str]:
+    errors.had_error = False
+    statements = parser(RegexScanner(source).iter_tokens()).parse()
+    reported = capsys.readouterr().out
+    errors.had_error = False
+    return shape(statements), reported
+
+
+def assert_same_ast(source: str, capsys):
+    assert parse(PrattParser, source, capsys) == parse(Parser, source, capsys), source
+
+
+def test_pratt_parser_matches_parser_on_scripts(capsys):
+    for script in sorted(SCRIPTS.glob("*.lox")):
+        assert_same_ast(script.read_text(), capsys)
+
+
+def test_pratt_parser_matches_parser_on_errors(capsys):
+    for source in [
+        "a + b = c;",
+        "x = a + b = c + d;",
+        "-a = 1;",
+        "(a) = 1;",
+        "a.b.c = d = e;",
+        "print 1 +;",
+        "print (1;",
+        "print super;",
+        "print super.;",
+        "print a.;",
+        "f(1, 2;",
+        "1 + 2",
+        "var x = ;\nprint x;",
+    ]:
+        assert_same_ast(source, capsys)
+
+
+def test_pratt_parser_matches_parser_on_random_expressions(capsys):
+    operands = ["a", "b.c", "f(x, y)", "1", '"s"', "nil", "this.d", "super.m", "(a)"]
+    operators = ["+", "-", "*", "/", "==", "!=", "<", "<=", ">", ">=", "and", "or", "="]
+    generator = random.Random(7)
+
+    def expression(depth: int) -> str:
+        if depth == 0 or generator.random() < 0.3:
+            return generator.choice(["", "-", "!", "!-"]) + generator.choice(operands)
+        left, right = expression(depth - 1), expression(depth - 1)
+        if generator.random() < 0.2:
+            return f"({left} {generator.choice(operators)} {right})"
+        return f"{left} {generator.choice(operators)} {right}"
+
+    for _ in range(500):
+        assert_same_ast(f"print {expression(4)};", capsys)
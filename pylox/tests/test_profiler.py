@@ -0,0 +1,86 @@
+import itertools
+import json
+import pstats
+
+from click.testing import CliRunner
+
+import pylox.__main__ as lox
+from pylox.profiler import Profiler
+
+SOURCE = """fun fib(n) {
+  if (n < 2) return n;
+  return fib(n - 1) + fib(n - 2);
+}
+class A {
+  init() { this.n = fib(3); }
+}
+print fib(5);
+print A().n;
+"""
+
+
+def profiled(source: str, capsys) -> Profiler:
+    # every reading of the clock advances it by one
+    profile = Profiler(clock=itertools.count().__next__)
+    lox.run(source, tracer=profile)
+    capsys.readouterr()
+    return profile
+
+
+def test_counts_calls_and_lines(capsys):
+    profile = profiled(SOURCE, capsys)
+    functions = {key: timing.calls for key, timing in profile.functions.items()}
+    assert functions == {("fib", 0): 15 + 5, ("init", 5): 1, ("A", None): 1}
+    assert profile.lines[7].calls == 1
+    # the if and the return it guards both start on line 1
+    assert profile.lines[1].calls == 20 + 11
+    assert profile.lines[2].calls == 7 + 2
+    assert profile.call_stack == [] and profile.statement_stack == []
+
+
+def test_self_and_cumulative_times_add_up(capsys):
+    profile = profiled(SOURCE, capsys)
+    fib = profile.functions["fib", 0]
+    init = profile.functions["init", 5]
+    klass = profile.functions["A", None]
+    # recursive calls are only counted once in the cumulative time
+    assert fib.primitive_calls == 2
+    assert 0 < fib.self_time <= fib.cumulative
+    assert klass.cumulative == klass.self_time + init.cumulative
+    assert init.cumulative > init.self_time
+
+    total = sum(timing.self_time for timing in profile.lines.values())
+    top_level = sum(profile.lines[line].cumulative for line in (0, 4, 7, 8))
+    assert total == top_level
+
+
+def test_pstats_and_json_files(tmp_path, capsys):
+    profile = profiled(SOURCE, capsys)
+    prof = tmp_path / "out.prof"
+    profile.dump(str(prof), "script.lox")
+    stats = pstats.Stats(str(prof)).stats
+    primitive, calls, _, _, callers = stats["script.lox", 0, "fib"]
+    assert (primitive, calls) == (2, 20)
+    assert set(callers) == {("script.lox", 0, "fib"), ("script.lox", 5, "init")}
+
+    out = tmp_path / "out.json"
+    profile.dump(str(out), "script.lox")
+    report = json.loads(out.read_text())
+    assert {function["name"] for function in report["functions"]} == {
+        "fib",
+        "init",
+        "A",
+    }
+    assert [line["line"] for line in report["lines"]] == [0, 1, 2, 4, 5, 7, 8]
+
+
+def test_profile_command(tmp_path):
+    script = tmp_path / "script.lox"
+    script.write_text(SOURCE)
+    out = tmp_path / "out.json"
+    result = CliRunner().invoke(lox.lox, ["profile", str(script), "--output", str(out)])
+    assert result.exit_code == 0, result.output
+    assert result.stdout == "5\n2\n"
+    assert "fib (line 0)" in result.stderr
+    assert "return fib(n - 1) + fib(n - 2);" in result.stderr
+    assert json.loads(out.read_text())["script"] == str(script)
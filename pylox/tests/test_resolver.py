@@ -0,0 +1,70 @@
+import pylox.Expr as Expr
+import pylox.Stmnt as stmnt
+import pylox.error_handling as errors
+import pylox.lox_parser as lox_parser
+import pylox.lox_scanner as lox_scanner
+from pylox.interpreter import Resolver
+
+
+def resolve(source: str) -> list[stmnt.Stmnt]:
+    errors.had_error = False
+    tokens = lox_scanner.Scanner(source).scan_tokens()
+    statements = lox_parser.Parser(tokens).parse()
+    Resolver().resolve(statements)
+    assert not errors.had_error
+    return statements
+
+
+def test_locals_get_depth_and_slot():
+    (function,) = resolve("""
+fun f(a, b) {
+  var c = a;
+  {
+    var d = b;
+    print c;
+  }
+}
+""")
+    assert function.slot is None
+    # a, b and c share the function scope
+    assert function.slot_count == 3
+
+    var_c, block = function.body
+    assert var_c.slot == 2
+    assert isinstance(var_c.initializer, Expr.Variable)
+    assert (var_c.initializer.depth, var_c.initializer.slot) == (0, 0)
+
+    assert block.slot_count == 1
+    var_d, print_c = block.statements
+    assert var_d.slot == 0
+    assert (var_d.initializer.depth, var_d.initializer.slot) == (1, 1)
+    assert (print_c.expression.depth, print_c.expression.slot) == (1, 2)
+
+
+def test_globals_stay_unresolved():
+    var_a, print_a = resolve("var a = 1; print a;")
+    assert var_a.slot is None
+    assert print_a.expression.depth is None
+    assert print_a.expression.slot is None
+
+
+def test_this_and_super_slots():
+    _, class_b = resolve("""
+class A { m() {} }
+class B < A {
+  m(a) {
+    super.m();
+    print a;
+    return this;
+  }
+}
+""")
+    (method,) = class_b.methods
+    call_super, print_a, return_this = method.body
+    # "this" takes slot 0 of the method scope, ahead of the parameters
+    assert method.slot_count == 2
+    assert (print_a.expression.depth, print_a.expression.slot) == (0, 1)
+    assert (return_this.value.depth, return_this.value.slot) == (0, 0)
+    # method scope -> "super" scope
+    super_expr = call_super.expression.callee
+    assert (super_expr.depth, super_expr.slot) == (1, 0)
@@ -0,0 +1,109 @@
+import re
+import signal
+import sys
+
+from click.testing import CliRunner
+
+import pylox.__main__ as lox
+import pylox.lox_parser as lox_parser
+import pylox.lox_scanner as lox_scanner
+from pylox.interpreter import Interpreter, LoxCallable, Resolver
+from pylox.sampling import Sampler
+
+SOURCE = """fun down(n) {
+  sample();
+  if (n == 0) {
+    return 0;
+  }
+  down(n - 1);
+  sample();
+}
+class A {
+  run() {
+    down(2);
+  }
+}
+A().run();
+sample();
+"""
+
+
+class Sample(LoxCallable):
+    """
+    Takes a sample where it is called, as if the timer had fired there.
+    """
+
+    def __init__(self, sampler: Sampler):
+        self.sampler = sampler
+        self.stacks = []
+
+    def arity(self):
+        return 0
+
+    def call(self, interpreter, arguments):
+        frame = sys._getframe()
+        self.sampler.sample(signal.SIGALRM, frame)
+        # a sampler without anything remembered has to agree
+        fresh = Sampler(self.sampler.script)
+        self.stacks.append(
+            (
+                self.sampler.collapsed(self.sampler.lox_stack(frame)),
+                fresh.collapsed(fresh.lox_stack(frame)),
+            )
+        )
+
+
+def test_rebuilds_the_lox_stack():
+    sampler = Sampler("s.lox")
+    native = Sample(sampler)
+    interpreter = Interpreter()
+    interpreter.lox_globals.define("sample", native)
+    statements = lox_parser.PrattParser(
+        lox_scanner.RegexScanner(SOURCE).iter_tokens()
+    ).parse()
+    Resolver().resolve(statements)
+    interpreter.interpret(statements)
+
+    run = "<script> (s.lox:13);run (s.lox:10)"
+    expected = [
+        f"{run};down (s.lox:1)",
+        f"{run};down (s.lox:5);down (s.lox:1)",
+        f"{run};down (s.lox:5);down (s.lox:5);down (s.lox:1)",
+        f"{run};down (s.lox:5);down (s.lox:6)",
+        f"{run};down (s.lox:6)",
+        "<script> (s.lox:14)",
+    ]
+    assert [cached for cached, _ in native.stacks] == expected
+    assert [fresh for _, fresh in native.stacks] == expected
+    assert sum(sampler.stacks.values()) == len(expected)
+    assert sampler.call_frames == [] and sampler.depths == {}
+
+
+def test_run_file_writes_collapsed_stacks(tmp_path):
+    script = tmp_path / "fib.lox"
+    script.write_text("""fun fib(n) {
+  if (n < 2) return n;
+  return fib(n - 1) + fib(n - 2);
+}
+print fib(17);
+""")
+    folded = tmp_path / "out.folded"
+    runner = CliRunner()
+    result = runner.invoke(
+        lox.lox, ["run-file", str(script), "--sample-profile", str(folded)]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.stdout == "1597\n"
+    lines = folded.read_text().splitlines()
+    assert lines
+    for line in lines:
+        assert re.fullmatch(
+            r"<script> \(fib\.lox(:4)?\)(;fib \(fib\.lox:[012]\))* \d+", line
+        ), line
+    assert signal.getsignal(signal.SIGALRM) is signal.SIG_DFL
+
+    result = runner.invoke(
+        lox.lox,
+        ["run-file", str(script), "--engine", "vm", "--sample-profile", str(folded)],
+    )
+    assert result.exit_code == 2
@@ -0,0 +1,77 @@
+import random
+
+import pylox.error_handling as errors
+import pylox.lox_parser as lox_parser
+from pylox.lox_scanner import RegexScanner, Scanner
+from tests.test_engines import SCRIPTS
+
+
+def scan(scanner: type[Scanner], source: str, capsys) -> tuple[list[tuple], str]:
+    errors.had_error = False
+    tokens = scanner(source).scan_tokens()
+    reported = capsys.readouterr().out
+    errors.had_error = False
+    return [
+        (token.token_type, token.lexeme, token.literal, token.line) for token in tokens
+    ], reported
+
+
+def assert_same_tokens(source: str, capsys):
+    assert scan(RegexScanner, source, capsys) == scan(Scanner, source, capsys), source
+
+
+def test_regex_scanner_matches_scanner_on_scripts(capsys):
+    for script in sorted(SCRIPTS.glob("*.lox")):
+        assert_same_tokens(script.read_text(), capsys)
+
+
+def test_regex_scanner_matches_scanner_on_edge_cases(capsys):
+    for source in [
+        "",
+        "1.",
+        ".5",
+        "1.2.3",
+        "a//comment\nb",
+        "/ /",
+        "!= == <= >= ! = < >",
+        '"multi\nline" x',
+        '"unterminated\n',
+        "@ # é",
+        "classy class _x x_1 1x",
+        "\t\r \n\n",
+    ]:
+        assert_same_tokens(source, capsys)
+
+
+def test_regex_scanner_matches_scanner_on_random_input(capsys):
+    pieces = list('az_Z09 .\t\r\n"/=!<>(){},;+-*#é') + ["var", "or", "//", "1.5"]
+    generator = random.Random(13)
+    for _ in range(2000):
+        length = generator.randint(0, 30)
+        assert_same_tokens(
+            "".join(generator.choice(pieces) for _ in range(length)), capsys
+        )
+
+
+def test_bytes_are_scanned_like_text(capsys):
+    sources = [script.read_text() for script in sorted(SCRIPTS.glob("*.lox"))]
+    sources += ['print "é" + "x";\n@ é\n"open', "", "a\n\n"]
+    for source in sources:
+        expected = scan(RegexScanner, source, capsys)
+        assert scan(RegexScanner, source.encode(), capsys) == expected, source
+
+
+def test_parser_reads_tokens_lazily():
+    consumed = []
+
+    def tokens():
+        for token in RegexScanner("print 1;\nprint 2;\nprint 3;").iter_tokens():
+            consumed.append(token)
+            yield token
+
+    parser = lox_parser.Parser(tokens())
+    first = parser.declaration()
+    assert first.expression.value == 1.0
+    # the statement and one token of lookahead
+    assert [token.lexeme for token in consumed] == ["print", "1", ";", "print"]
+    assert len(parser.parse()) == 2
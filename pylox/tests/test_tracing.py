@@ -0,0 +1,95 @@
+import io
+
+import pytest
+
+import pylox.__main__ as lox
+import pylox.error_handling as errors
+from pylox.interpreter import Interpreter, LoxFunction
+from pylox.tracing import StreamTracer, Tracer, TracingInterpreter
+
+SOURCE = """
+class A {
+  init(x) { this.x = x; }
+  get() { return this.x; }
+}
+fun f(n) {
+  var y = n + 1;
+  return y;
+}
+var a = A(2);
+print f(a.get());
+"""
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.events = []
+
+    def call_enter(self, callee, arguments):
+        self.events.append(("enter", repr(callee), arguments))
+
+    def call_exit(self, callee, result):
+        self.events.append(("exit", repr(callee), repr(result)))
+
+    def variable_write(self, name, value):
+        self.events.append(("write", name.lexeme, repr(value)))
+
+    def instance_created(self, instance):
+        self.events.append(("new", repr(instance)))
+
+
+def test_tracer_sees_calls_writes_and_allocations(capsys):
+    tracer = RecordingTracer()
+    lox.run(SOURCE, tracer=tracer)
+    assert capsys.readouterr().out == "3\n"
+    assert tracer.events == [
+        ("write", "A", "None"),
+        ("write", "A", "A"),
+        ("write", "f", "<fn f >"),
+        ("enter", "A", [2.0]),
+        ("enter", "<fn init >", [2.0]),
+        ("exit", "<fn init >", "A instance"),
+        ("new", "A instance"),
+        ("exit", "A", "A instance"),
+        ("write", "a", "A instance"),
+        ("enter", "<fn get >", []),
+        ("exit", "<fn get >", "2.0"),
+        ("enter", "<fn f >", [2.0]),
+        ("write", "y", "3.0"),
+        ("exit", "<fn f >", "3.0"),
+    ]
+
+
+def test_calls_exit_when_a_runtime_error_unwinds(capsys):
+    tracer = RecordingTracer()
+    lox.run('fun f() { return 1 + "a"; }\nf();', tracer=tracer)
+    assert "Operatnds must be two numbers or two strings" in capsys.readouterr().err
+    errors.had_error = False
+    assert tracer.events[-2:] == [
+        ("enter", "<fn f >", []),
+        ("exit", "<fn f >", "None"),
+    ]
+
+
+def test_traced_program_prints_the_same(capsys):
+    lox.run(SOURCE)
+    expected = capsys.readouterr().out
+    stream = io.StringIO()
+    lox.run(SOURCE, tracer=StreamTracer(stream))
+    assert capsys.readouterr().out == expected
+    assert "[line 6] write y = 3.0" in stream.getvalue().splitlines()
+
+
+def test_untraced_interpreter_has_no_hooks():
+    assert Interpreter.lox_function is LoxFunction
+    assert not hasattr(Interpreter(), "tracer")
+    assert isinstance(TracingInterpreter(Tracer()), Interpreter)
+    with pytest.raises(ValueError):
+        lox.run("print 1;", engine="vm", tracer=Tracer())
+
+
+def test_ignored_events_are_not_hooked():
+    interpreter = TracingInterpreter(RecordingTracer())
+    assert interpreter.execute.__func__ is Interpreter.execute
+    assert interpreter.lookup_variable.__func__ is Interpreter.lookup_variable
+    assert interpreter.define.__func__ is TracingInterpreter.define